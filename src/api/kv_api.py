@@ -1,11 +1,22 @@
+import json
+import math
 import threading
 
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
-from src.datastore.kv_store_interface import KeyValueStoreInterface
+from src.cluster.node import ClusterNode
+from src.datastore.kv_store_interface import INTEGER, KeyValueStoreInterface, Record
 from src.datastore.key_value_store import KeyValueStore
+from src.datastore.pubsub import PubSub
+from src.datastore.sorted_index import prefix_end
+from src.metrics.metrics import METRICS, instrumented
 
-from src.model.response import Response
+from src.model.response import OK, Response
+
+SCAN_LIMIT = 100  # default page size of SCAN and PREFIX
+MAX_SCAN_LIMIT = 10_000  # the store stays locked while a page is collected
+DUMP_LIMIT = 1000  # default records per DUMP chunk
+MAX_EXPIRE_SECONDS = 100 * 365 * 24 * 3600  # past that it's a mistake, and deadlines would lose precision
 
 class KeyValueAPI:
     _instance = None
@@ -17,47 +28,363 @@ class KeyValueAPI:
                 if cls._instance is None:
                     cls._instance = super().__new__(cls)
                     cls._instance.store: KeyValueStoreInterface = KeyValueStore()
+                    cls._instance.cluster: Optional[ClusterNode] = None  # set in cluster mode
+                    cls._instance.pubsub: Optional[PubSub] = PubSub(cls._instance.store)
         return cls._instance
 
+    @classmethod
+    def configure(cls, store: KeyValueStoreInterface) -> "KeyValueAPI":
+        """Swaps the datastore behind the singleton, meant to be called before serving clients."""
+        api = cls()
+        api.store = store
+        api.cluster = None
+        api.pubsub = PubSub(store) if hasattr(store, "add_listener") else None  # only KeyValueStore notifies its writes
+        return api
+
+    @classmethod
+    def configure_cluster(cls, cluster: Optional[ClusterNode]) -> "KeyValueAPI":
+        """Only serves the keys cluster owns, the others are answered with a Moved response."""
+        api = cls()
+        api.cluster = cluster
+        return api
+
+    @instrumented
     def delete(self, key: str) -> Response:
         try:
+            if self.cluster is not None and (moved := self._moved([key])):
+                return moved
             result = self.store.delete(key)
             return Response("Ok" if result else "Error", str(result))
         except Exception as e:
             return Response("Error", mesg=str(e))
 
+    @instrumented
     def get(self, key: str) -> Response:
         try:
+            if self.cluster is not None and (moved := self._moved([key])):
+                return moved
             result = self.store.get(key)
             return Response("Ok", result if result else f"{key} was not found.")
         except Exception as e:
             return Response("Error", mesg=str(e))
 
+    @instrumented
     def put(self, key: str, value: str) -> Response:
         try:
+            if self.cluster is not None and (moved := self._moved([key])):
+                return moved
             self.store.put(key, value)
-            return Response("Ok")
+            return OK
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def put_ex(self, key: str, value: str, seconds: Any) -> Response:
+        try:
+            if self.cluster is not None and (moved := self._moved([key])):
+                return moved
+            self.store.put_ex(key, value, self._seconds(seconds))
+            return OK
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def expire(self, key: str, seconds: Any) -> Response:
+        try:
+            if self.cluster is not None and (moved := self._moved([key])):
+                return moved
+            result = self.store.expire(key, self._seconds(seconds))
+            return Response("Ok" if result else "Error", str(result))
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def ttl(self, key: str) -> Response:
+        try:
+            if self.cluster is not None and (moved := self._moved([key])):
+                return moved
+            return Response("Ok", str(self.store.ttl(key)))  # -1 never expires, -2 not found
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def cas(self, key: str, expected: str, value: str) -> Response:
+        try:
+            if self.cluster is not None and (moved := self._moved([key])):
+                return moved
+            result = self.store.cas(key, expected, value)
+            return Response("Ok" if result else "Error", str(result))
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def incr(self, key: str, amount: Any = 1) -> Response:
+        try:
+            if self.cluster is not None and (moved := self._moved([key])):
+                return moved
+            return Response("Ok", str(self.store.incr(key, self._amount(amount))))
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def decr(self, key: str, amount: Any = 1) -> Response:
+        try:
+            if self.cluster is not None and (moved := self._moved([key])):
+                return moved
+            return Response("Ok", str(self.store.incr(key, -self._amount(amount))))
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def watch(self, keys: List[str]) -> Response:
+        try:
+            if self.cluster is not None and (moved := self._moved(keys)):
+                return moved
+            self.store.watch(keys)
+            return OK
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def unwatch(self) -> Response:
+        try:
+            self.store.unwatch()
+            return OK
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def subscribe(self, patterns: List[str]) -> Response:
+        try:
+            if self.pubsub is None:
+                raise RuntimeError("SUBSCRIBE needs the dict store, without --workers.")
+            return Response("Ok", str(self.pubsub.subscribe(patterns)))  # only keys this node owns are ever pushed
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def unsubscribe(self, patterns: Optional[List[str]] = None) -> Response:
+        try:
+            if self.pubsub is None:
+                raise RuntimeError("SUBSCRIBE needs the dict store, without --workers.")
+            return Response("Ok", str(self.pubsub.unsubscribe(patterns)))
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def mget(self, keys: List[str]) -> Response:
+        try:
+            if self.cluster is not None and (moved := self._moved(keys)):
+                return moved
+            return Response("Ok", self.store.mget(keys))  # null for keys that were not found
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def mput(self, items: Dict[str, str]) -> Response:
+        try:
+            if self.cluster is not None and (moved := self._moved(list(items))):
+                return moved
+            self.store.mput(items)
+            return OK
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def mdelete(self, keys: List[str]) -> Response:
+        try:
+            if self.cluster is not None and (moved := self._moved(keys)):
+                return moved
+            return Response("Ok", str(self.store.mdelete(keys)))
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def scan(self, start: str, end: str, limit: Any = SCAN_LIMIT) -> Response:
+        """Keys from start (included, - for the first key) to end (excluded, + for past the last key)."""
+        try:
+            entries, cursor = self.store.scan(None if start == "-" else start, None if end == "+" else end, self._limit(limit))
+            return Response("Ok", [cursor, [list(entry) for entry in entries]])  # SCAN <cursor> <end> for the next page
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def prefix(self, prefix: str, limit: Any = SCAN_LIMIT, cursor: Optional[str] = None) -> Response:
+        try:
+            start = cursor if cursor and cursor > prefix else prefix
+            entries, cursor = self.store.scan(start, prefix_end(prefix), self._limit(limit))
+            return Response("Ok", [cursor, [list(entry) for entry in entries]])
         except Exception as e:
             return Response("Error", mesg=str(e))
 
+    @instrumented
+    def load(self, records: Any) -> Response:
+        """Stores a chunk of [key, value, deadline] records (JSON text from the text protocol), as DUMP answers them."""
+        try:
+            records = self._records(records)
+            if self.cluster is not None and (moved := self._moved([key for key, _, _ in records])):
+                return moved
+            return Response("Ok", str(self.store.load(records)))
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def dump(self, cursor: str = "-", limit: Any = DUMP_LIMIT) -> Response:
+        """Records from cursor (- for the first key), DUMP <cursor> for the next chunk, with expiry deadlines as unix times."""
+        try:
+            records, cursor = self.store.dump(None if cursor == "-" else cursor, self._limit(limit))
+            return Response("Ok", [cursor, [list(record) for record in records]])
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
     def start(self) -> Response:
         try:
             self.store.start()
-            return Response("Ok")
+            return OK
         except Exception as e:
             return Response("Error", mesg=str(e))
 
+    @instrumented
     def commit(self) -> Response:
         try:
             self.store.commit()
-            return Response("Ok")
+            return OK
         except Exception as e:
             return Response("Error", mesg=str(e))
 
+    @instrumented
     def rollback(self) -> Response:
         try:
             self.store.rollback()
-            return Response("Ok")
+            return OK
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def cluster_info(self) -> Response:
+        try:
+            return Response("Ok", self._cluster().info())
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def cluster_set_ring(self, epoch: Any, nodes: List[str]) -> Response:
+        try:
+            self._cluster().set_ring(self._epoch(epoch), nodes)
+            return OK
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def cluster_take(self, epoch: Any, node: str, cursor: str, count: Any) -> Response:
+        """Hands over the keys node gained among the next count keys, see ClusterNode.take."""
+        try:
+            cursor, entries = self._cluster().take(self._epoch(epoch), node, None if cursor == "-" else cursor, self._limit(count))
+            return Response("Ok", [cursor, entries])
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def cluster_take_keys(self, epoch: Any, keys: List[str]) -> Response:
+        try:
+            return Response("Ok", self._cluster().take_keys(self._epoch(epoch), keys))
+        except Exception as e:
+            return Response("Error", mesg=str(e))
+
+    @instrumented
+    def cluster_forget(self, epoch: Any, keys: List[str]) -> Response:
+        """Deletes keys handed over by cluster_take(_keys) once their new owner stored them."""
+        try:
+            return Response("Ok", str(self._cluster().forget(self._epoch(epoch), keys)))
         except Exception as e:
             return Response("Error", mesg=str(e))
 
+    def stats(self) -> Response:
+        """Metrics of this process, plus whatever the datastore reports about itself."""
+        stats = METRICS.snapshot()
+        store_stats = getattr(self.store, "stats", None)
+        if store_stats is not None:
+            stats["store"] = store_stats()
+        return Response("Ok", stats)
+
+    def _moved(self, keys: List[str]) -> Optional[Response]:
+        """Redirects the client when this node doesn't own every key of the command."""
+        owners = self.cluster.route(keys)
+        if owners == {self.cluster.address}:
+            return None
+        if len(owners) == 1:
+            owner = owners.pop()
+            return Response("Moved", owner, mesg=f"Owned by {owner}.")
+        return Response("Moved", mesg="The keys of one command must all belong to the same node.")
+
+    def _cluster(self) -> ClusterNode:
+        if self.cluster is None:
+            raise RuntimeError("Cluster mode is off, start the server with --cluster.")
+        return self.cluster
+
+    @staticmethod
+    def _limit(limit: Any) -> int:
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise ValueError(f"LIMIT must be a whole number, got '{limit}'.")
+        if limit < 1:
+            raise ValueError("LIMIT must be at least 1.")
+        return min(limit, MAX_SCAN_LIMIT)
+
+    @staticmethod
+    def _records(records: Any) -> List[Record]:
+        """Records as [key, value] or [key, value, deadline], a deadline of null (or "" in the binary protocol) never expires."""
+        if isinstance(records, str):
+            try:
+                records = json.loads(records)
+            except ValueError:
+                records = None
+        if not isinstance(records, list):
+            raise ValueError("LOAD takes a JSON list of [key, value, deadline] records.")
+        parsed: List[Record] = []
+        for record in records:
+            if not isinstance(record, list) or len(record) not in (2, 3) or not all(isinstance(item, str) for item in record[:2]):
+                raise ValueError(f"Records are [key, value, deadline], got {json.dumps(record)}.")
+            if not record[0] or any(char.isspace() for char in record[0]):  # DUMP couldn't page past them
+                raise ValueError(f"Keys can't be empty or contain whitespace, got {json.dumps(record[0])}.")
+            deadline = record[2] if len(record) == 3 else None
+            try:
+                expires = None if deadline in (None, "") else float(deadline)
+            except (TypeError, ValueError):
+                expires = math.nan
+            if expires is not None and not math.isfinite(expires):  # "inf" and "nan" parse, but aren't times
+                raise ValueError(f"Deadlines are unix times or null, got {json.dumps(deadline)}.")
+            parsed.append((record[0], record[1], expires))
+        return parsed
+
+    @staticmethod
+    def _seconds(seconds: Any) -> int:
+        """Expire times come in as text from the protocols."""
+        try:
+            number = int(seconds)
+        except (TypeError, ValueError):
+            raise ValueError(f"Expire time must be a whole number of seconds, got '{seconds}'.")
+        if number > MAX_EXPIRE_SECONDS:
+            raise ValueError(f"Expire time must be at most {MAX_EXPIRE_SECONDS} seconds, got '{seconds}'.")
+        return number
+
+    @staticmethod
+    def _amount(amount: Any) -> int:
+        """Plain digits only, int() alone would also take " 5", "+5" or "1_000"."""
+        if type(amount) is int:
+            return amount
+        try:
+            if isinstance(amount, str) and INTEGER.fullmatch(amount):
+                return int(amount)
+        except ValueError:
+            pass  # more digits than int() converts
+        raise ValueError(f"Increment must be a whole number, got '{amount}'.")
+
+    @staticmethod
+    def _epoch(epoch: Any) -> int:
+        try:
+            return int(epoch)
+        except (TypeError, ValueError):
+            raise ValueError(f"Ring epoch must be a whole number, got '{epoch}'.")
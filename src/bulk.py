@@ -0,0 +1,115 @@
+import argparse
+import json
+import math
+import struct
+import sys
+
+from typing import BinaryIO, Iterator, List, Optional, TextIO, Union
+
+from src.client.client import Client
+from src.client.commands import Record, chunks
+from src.handler.binary_protocol import LENGTH, to_bytes, to_str
+
+FORMATS = ["jsonl", "binary"]
+
+DEADLINE = struct.Struct(">d")  # NaN when the key never expires
+
+# jsonl:  one [key, value, deadline] JSON array per line, deadline null (or left out) when the key never expires
+# binary: u32 length + key, u32 length + value, f64 deadline, per record, big endian
+
+def read_records(stream: Union[TextIO, BinaryIO], format: str) -> Iterator[Record]:
+    if format == "jsonl":
+        for number, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if not isinstance(record, list) or len(record) not in (2, 3):
+                    raise ValueError(f"Line {number} is not a [key, value] or [key, value, deadline] record: {line.strip()[:100]}")
+                yield record[0], record[1], record[2] if len(record) == 3 else None
+        return
+    while True:
+        header = stream.read(LENGTH.size)
+        if not header:
+            return
+        key = stream.read(LENGTH.unpack(header)[0])
+        value = stream.read(LENGTH.unpack(stream.read(LENGTH.size))[0])
+        (deadline,) = DEADLINE.unpack(stream.read(DEADLINE.size))
+        yield to_str(key), to_str(value), None if math.isnan(deadline) else deadline
+
+def write_records(stream: Union[TextIO, BinaryIO], records: List[Record], format: str) -> None:
+    if format == "jsonl":
+        stream.write("".join(json.dumps(list(record)) + "\n" for record in records))
+        return
+    parts: List[bytes] = []
+    for key, value, deadline in records:
+        data, payload = to_bytes(key), to_bytes(value)
+        parts += [LENGTH.pack(len(data)), data, LENGTH.pack(len(payload)), payload, DEADLINE.pack(math.nan if deadline is None else deadline)]
+    stream.write(b"".join(parts))
+
+def load(client: Client, stream: Union[TextIO, BinaryIO], format: str = "jsonl", chunk_size: int = 1000, window: int = 8) -> int:
+    """Sends the records of stream as LOAD commands of chunk_size records, window of them pipelined at once.
+
+    Every chunk is stored atomically and takes the store lock once, the file is never read
+    further ahead than window chunks. Returns how many records were stored.
+    """
+    stored = 0
+    pipeline = client.pipeline()
+    pending: List[Record] = []
+    for record in read_records(stream, format):
+        pending.append(record)
+        if len(pending) == chunk_size * window:
+            for part in chunks(pending, chunk_size):
+                pipeline.load(part)
+            stored += sum(pipeline.execute())
+            pending = []
+    for part in chunks(pending, chunk_size):
+        pipeline.load(part)
+    return stored + sum(pipeline.execute())
+
+def dump(client: Client, stream: Union[TextIO, BinaryIO], format: str = "jsonl", chunk_size: int = 1000) -> int:
+    """Writes every record of the server to stream, one DUMP chunk at a time, returns how many.
+
+    The server only holds its lock while a chunk is collected, writes in between land in the
+    dump if they're past its cursor: it's consistent per chunk, not a point in time snapshot.
+    """
+    written = 0
+    cursor: Optional[str] = None
+    while True:
+        records, cursor = client.dump(cursor, chunk_size)
+        write_records(stream, records, format)
+        written += len(records)
+        if cursor is None:
+            return written
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk load records into a running server, or dump them out of it.")
+    parser.add_argument("action", choices=["load", "dump"])
+    parser.add_argument("file", help="File to load from or dump to, - for stdin/stdout.")
+    parser.add_argument("--server", default="127.0.0.1:4000", metavar="HOST:PORT", help="Server to talk to.")
+    parser.add_argument("--format", choices=FORMATS, default="jsonl", help="jsonl: one [key, value, deadline] per line. binary: length prefixed records.")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Records per LOAD or DUMP command (at most 10000 for DUMP).")
+    parser.add_argument("--window", type=int, default=8, help="LOAD commands in flight at once.")
+    args = parser.parse_args()
+
+    binary = args.format == "binary"
+    mode = ("r" if args.action == "load" else "w") + ("b" if binary else "")
+    if args.file == "-":
+        stream = sys.stdin if args.action == "load" else sys.stdout
+        stream = stream.buffer if binary else stream
+    else:
+        stream = open(args.file, mode, **({} if binary else {"encoding": "utf-8"}))
+
+    with Client(args.server, pool_size=1, timeout=None) as client, stream:
+        if args.action == "load":
+            try:
+                count = load(client, stream, args.format, args.chunk_size, args.window)
+            except ValueError as e:
+                sys.exit(f"load: {e} (the chunks before it were stored)")
+        else:
+            count = dump(client, stream, args.format, args.chunk_size)
+    print(f"{args.action}: {count} records", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
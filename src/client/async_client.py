@@ -0,0 +1,213 @@
+import asyncio
+import json
+
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from src.client.client import BATCH_SIZE
+from src.client.commands import Command, Commands, check, chunks, keeps_connection, key_arg, results_of
+from src.client.connection import parse_address
+
+class AsyncConnection:
+    """One text protocol connection for asyncio code."""
+
+    def __init__(self, address: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.address: str = address
+        self._reader: asyncio.StreamReader = reader
+        self._writer: asyncio.StreamWriter = writer
+
+    @classmethod
+    async def open(cls, address: str, timeout: Optional[float] = 5.0) -> "AsyncConnection":
+        host, port = parse_address(address)
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port, limit=16 * 1024 * 1024), timeout)
+        return cls(address, reader, writer)
+
+    async def call(self, command: str) -> Dict[str, Any]:
+        return (await self.call_many([command]))[0]
+
+    async def call_many(self, commands: List[str]) -> List[Dict[str, Any]]:
+        """Pipelines commands: one write for all of them, then their responses in order."""
+        self._writer.write(b"".join(command.encode("utf-8", errors="surrogateescape") + b"\n" for command in commands))
+        await self._writer.drain()
+        responses = []
+        for _ in commands:
+            line = await self._reader.readline()
+            if not line:
+                raise ConnectionError(f"{self.address} closed the connection.")
+            responses.append(json.loads(line))
+        return responses
+
+    async def close(self) -> None:
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except OSError:
+            pass  # already gone
+
+class AsyncConnectionPool:
+    """ConnectionPool for asyncio: tasks wait for a free connection instead of threads."""
+
+    def __init__(self, address: str, size: int = 10, timeout: Optional[float] = 5.0) -> None:
+        self.address: str = address
+        self.size: int = size
+        self.timeout: Optional[float] = timeout
+        self._idle: List[AsyncConnection] = []  # most recently returned last
+        self._available = asyncio.Condition()  # notified when a connection is returned or a slot freed
+        self._opened: int = 0
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[AsyncConnection]:
+        connection = await self._acquire()
+        try:
+            yield connection
+        except BaseException:
+            await self._discard(connection)
+            raise
+        await self._release(connection)
+
+    async def close(self) -> None:
+        async with self._available:
+            idle, self._idle = self._idle, []
+            self._opened -= len(idle)
+            self._available.notify_all()
+        for connection in idle:
+            await connection.close()
+
+    async def _acquire(self) -> AsyncConnection:
+        async with self._available:
+            try:
+                await asyncio.wait_for(self._available.wait_for(lambda: self._idle or self._opened < self.size), self.timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"No connection to {self.address} available after {self.timeout}s, every one of the {self.size} is in use.")
+            if self._idle:
+                return self._idle.pop()
+            self._opened += 1
+        try:
+            return await AsyncConnection.open(self.address, self.timeout)
+        except BaseException:
+            await self._free_slot()
+            raise
+
+    async def _release(self, connection: AsyncConnection) -> None:
+        async with self._available:
+            self._idle.append(connection)
+            self._available.notify()
+
+    async def _discard(self, connection: AsyncConnection) -> None:
+        await self._free_slot()
+        await connection.close()
+
+    async def _free_slot(self) -> None:
+        async with self._available:
+            self._opened -= 1
+            self._available.notify()
+
+class AsyncClient(Commands):
+    """Client for asyncio code, same commands as Client, awaited.
+
+        client = AsyncClient("127.0.0.1:4000")
+        await client.put("key1", "value1")
+        async with client.transaction() as txn:
+            await txn.put("key2", await txn.get("key1"))
+        results = await client.pipeline().get("key1").get("key2").execute()
+    """
+
+    def __init__(self, address: str = "127.0.0.1:4000", pool_size: int = 10, timeout: Optional[float] = 5.0, batch_size: int = BATCH_SIZE) -> None:
+        self.pool: AsyncConnectionPool = AsyncConnectionPool(address, pool_size, timeout)
+        self.batch_size: int = batch_size
+
+    def pipeline(self) -> "AsyncPipeline":
+        return AsyncPipeline(self)
+
+    @asynccontextmanager
+    async def transaction(self, watch: Optional[List[str]] = None) -> AsyncIterator["AsyncTransaction"]:
+        """START on one connection, COMMIT when the block ends, ROLLBACK if it raises.
+
+        With watch, the commit raises "Transaction conflict" if another client wrote one of
+        those keys since the block started.
+        """
+        failure: Optional[BaseException] = None  # raised once the connection, still usable, is back in the pool
+        async with self.pool.connection() as connection:
+            if watch:
+                check(await connection.call("WATCH " + " ".join(map(key_arg, watch))))
+            check(await connection.call("START"))
+            try:
+                yield AsyncTransaction(connection)
+            except BaseException as e:
+                if not keeps_connection(e):
+                    raise  # a response may be half read (a cancelled call), the connection is closed
+                check(await connection.call("ROLLBACK"))
+                failure = e
+            else:
+                committed = await connection.call("COMMIT")
+        if failure is not None:
+            raise failure
+        check(committed)  # a conflict is a complete response, the connection was kept
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Optional[str]]:
+        """Values of any number of keys, fetched batch_size at a time over one connection."""
+        pipeline = self.pipeline()
+        for part in chunks(keys, self.batch_size):
+            pipeline.mget(part)
+        values: Dict[str, Optional[str]] = {}
+        for part, result in zip(chunks(keys, self.batch_size), await pipeline.execute()):
+            values.update(zip(part, result))
+        return values
+
+    async def put_many(self, items: Dict[str, str]) -> None:
+        """Sets any number of keys, batch_size per MPUT, every batch atomic on its own."""
+        pipeline = self.pipeline()
+        for part in chunks(list(items.items()), self.batch_size):
+            pipeline.mput(dict(part))
+        await pipeline.execute()
+
+    async def delete_many(self, keys: List[str]) -> int:
+        pipeline = self.pipeline()
+        for part in chunks(keys, self.batch_size):
+            pipeline.mdelete(part)
+        return sum(await pipeline.execute())
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+    async def __aenter__(self) -> "AsyncClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def _execute(self, command: Command) -> Any:
+        text, decode, statuses = command
+        async with self.pool.connection() as connection:
+            response = await connection.call(text)
+        return decode(check(response, statuses))
+
+class AsyncPipeline(Commands):
+    """Pipeline for asyncio code, only execute() is awaited."""
+
+    def __init__(self, client: AsyncClient) -> None:
+        self.client: AsyncClient = client
+        self.commands: List[Command] = []
+
+    async def execute(self, raise_on_error: bool = True) -> List[Any]:
+        """Results in the order commands were queued. With raise_on_error off, failed ones are their RuntimeError."""
+        commands, self.commands = self.commands, []
+        if not commands:
+            return []
+        async with self.client.pool.connection() as connection:
+            responses = await connection.call_many([text for text, _, _ in commands])
+        return results_of(commands, responses, raise_on_error)
+
+    def _execute(self, command: Command) -> "AsyncPipeline":
+        self.commands.append(command)
+        return self
+
+class AsyncTransaction(Commands):
+    """Commands of a transaction, run right away on its connection so reads see its own writes."""
+
+    def __init__(self, connection: AsyncConnection) -> None:
+        self.connection: AsyncConnection = connection
+
+    async def _execute(self, command: Command) -> Any:
+        text, decode, statuses = command
+        return decode(check(await self.connection.call(text), statuses))
@@ -0,0 +1,248 @@
+import threading
+
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from src.client.commands import Command, Commands, check, chunks, keeps_connection, key_arg, results_of
+from src.client.connection import Connection
+
+BATCH_SIZE = 1000  # keys per MGET/MPUT/MDEL sent by the *_many helpers
+
+class ConnectionPool:
+    """Keeps up to size connections open and hands them out one caller at a time.
+
+    Connections are reused most recent first, so a quiet client ends up using (and keeping
+    warm) only as many as it needs. A connection that failed is closed instead of returned,
+    which frees its slot: callers waiting for a connection then open a new one.
+    """
+
+    def __init__(self, address: str, size: int = 10, timeout: Optional[float] = 5.0) -> None:
+        self.address: str = address
+        self.size: int = size
+        self.timeout: Optional[float] = timeout
+        self._idle: List[Connection] = []  # most recently returned last
+        self._available = threading.Condition()  # notified when a connection is returned or a slot freed
+        self._opened: int = 0
+
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        connection = self._acquire()
+        try:
+            yield connection
+        except BaseException:
+            self._discard(connection)  # it may be halfway through a response
+            raise
+        self._release(connection)
+
+    def close(self) -> None:
+        with self._available:
+            idle, self._idle = self._idle, []
+            self._opened -= len(idle)
+            self._available.notify_all()
+        for connection in idle:
+            connection.close()
+
+    def _acquire(self) -> Connection:
+        with self._available:
+            if not self._available.wait_for(lambda: self._idle or self._opened < self.size, self.timeout):
+                raise TimeoutError(f"No connection to {self.address} available after {self.timeout}s, every one of the {self.size} is in use.")
+            if self._idle:
+                return self._idle.pop()
+            self._opened += 1
+        try:
+            return Connection(self.address, self.timeout)
+        except BaseException:
+            self._free_slot()
+            raise
+
+    def _release(self, connection: Connection) -> None:
+        with self._available:
+            self._idle.append(connection)
+            self._available.notify()
+
+    def _discard(self, connection: Connection) -> None:
+        self._free_slot()
+        connection.close()
+
+    def _free_slot(self) -> None:
+        with self._available:
+            self._opened -= 1
+            self._available.notify()
+
+class Client(Commands):
+    """Thread safe client of one server, every call borrows a connection from the pool.
+
+        client = Client("127.0.0.1:4000")
+        client.put("key1", "value1")
+        with client.transaction() as txn:
+            txn.put("key2", txn.get("key1"))
+        results = client.pipeline().get("key1").get("key2").execute()
+    """
+
+    def __init__(self, address: str = "127.0.0.1:4000", pool_size: int = 10, timeout: Optional[float] = 5.0, batch_size: int = BATCH_SIZE) -> None:
+        self.pool: ConnectionPool = ConnectionPool(address, pool_size, timeout)
+        self.batch_size: int = batch_size
+
+    def pipeline(self) -> "Pipeline":
+        return Pipeline(self)
+
+    @contextmanager
+    def transaction(self, watch: Optional[List[str]] = None) -> Iterator["Transaction"]:
+        """START on one connection, COMMIT when the block ends, ROLLBACK if it raises.
+
+        With watch, the commit raises "Transaction conflict" if another client wrote one of
+        those keys since the block started, read-modify-write loops retry on it:
+
+            while True:
+                try:
+                    with client.transaction(watch=["balance"]) as txn:
+                        txn.put("balance", str(int(txn.get("balance")) - 10))
+                    break
+                except RuntimeError as e:
+                    if "conflict" not in str(e):
+                        raise
+        """
+        failure: Optional[BaseException] = None  # raised once the connection, still usable, is back in the pool
+        with self.pool.connection() as connection:
+            if watch:
+                check(connection.call("WATCH " + " ".join(map(key_arg, watch))))
+            check(connection.call("START"))
+            try:
+                yield Transaction(connection)
+            except BaseException as e:
+                if not keeps_connection(e):
+                    raise  # a response may be half read, the connection is closed and the server drops the transaction
+                check(connection.call("ROLLBACK"))
+                failure = e
+            else:
+                committed = connection.call("COMMIT")
+        if failure is not None:
+            raise failure
+        check(committed)  # a conflict is a complete response, the connection was kept
+
+    def get_many(self, keys: List[str]) -> Dict[str, Optional[str]]:
+        """Values of any number of keys, fetched batch_size at a time over one connection."""
+        pipeline = self.pipeline()
+        for part in chunks(keys, self.batch_size):
+            pipeline.mget(part)
+        values: Dict[str, Optional[str]] = {}
+        for part, result in zip(chunks(keys, self.batch_size), pipeline.execute()):
+            values.update(zip(part, result))
+        return values
+
+    def put_many(self, items: Dict[str, str]) -> None:
+        """Sets any number of keys, batch_size per MPUT, every batch atomic on its own."""
+        pipeline = self.pipeline()
+        for part in chunks(list(items.items()), self.batch_size):
+            pipeline.mput(dict(part))
+        pipeline.execute()
+
+    def delete_many(self, keys: List[str]) -> int:
+        pipeline = self.pipeline()
+        for part in chunks(keys, self.batch_size):
+            pipeline.mdelete(part)
+        return sum(pipeline.execute())
+
+    def subscribe(self, patterns: List[str], timeout: Optional[float] = None) -> "Subscriber":
+        """Changes of the keys matching patterns (a key, or a prefix ending with *), on a connection of their own.
+
+            with client.subscribe(["config", "user:*"]) as subscriber:
+                for changes in subscriber:  # {key: new value, or None once deleted}
+                    cache.update(changes)
+
+        A transaction committing several matching keys is one change set. A subscriber reading
+        too slowly is disconnected by the server, its next read raises ConnectionError.
+        """
+        return Subscriber(self.pool.address, patterns, timeout)
+
+    def close(self) -> None:
+        self.pool.close()
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _execute(self, command: Command) -> Any:
+        text, decode, statuses = command
+        with self.pool.connection() as connection:
+            response = connection.call(text)
+        return decode(check(response, statuses))
+
+class Pipeline(Commands):
+    """Queues commands, execute() sends them in one write and returns their results in order."""
+
+    def __init__(self, client: Client) -> None:
+        self.client: Client = client
+        self.commands: List[Command] = []
+
+    def execute(self, raise_on_error: bool = True) -> List[Any]:
+        """Results in the order commands were queued. With raise_on_error off, failed ones are their RuntimeError."""
+        commands, self.commands = self.commands, []
+        if not commands:
+            return []
+        with self.client.pool.connection() as connection:
+            responses = connection.call_many([text for text, _, _ in commands])
+        return results_of(commands, responses, raise_on_error)
+
+    def _execute(self, command: Command) -> "Pipeline":
+        self.commands.append(command)
+        return self
+
+class Transaction(Commands):
+    """Commands of a transaction, run right away on its connection so reads see its own writes."""
+
+    def __init__(self, connection: Connection) -> None:
+        self.connection: Connection = connection
+
+    def _execute(self, command: Command) -> Any:
+        text, decode, statuses = command
+        return decode(check(self.connection.call(text), statuses))
+
+class Subscriber:
+    """A connection receiving the change sets of its subscriptions, see Client.subscribe."""
+
+    def __init__(self, address: str, patterns: List[str], timeout: Optional[float] = None) -> None:
+        self.connection: Connection = Connection(address, timeout)
+        self._events: Deque[Dict[str, Optional[str]]] = deque()  # arrived before a command's response
+        self.subscribe(patterns)
+
+    def subscribe(self, patterns: List[str]) -> int:
+        """Adds patterns, returns how many this subscriber has."""
+        return int(self._command("SUBSCRIBE " + " ".join(map(key_arg, patterns))))
+
+    def unsubscribe(self, patterns: Optional[List[str]] = None) -> int:
+        """Removes patterns, or every one of them, returns how many are left."""
+        return int(self._command(" ".join(["UNSUBSCRIBE", *map(key_arg, patterns or [])])))
+
+    def get(self) -> Dict[str, Optional[str]]:
+        """The next change set, waits for it (socket.timeout past the subscriber's timeout)."""
+        if self._events:
+            return self._events.popleft()
+        while True:
+            response = self.connection.receive()
+            if response["status"] == "Event":
+                return response["result"]
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __iter__(self) -> Iterator[Dict[str, Optional[str]]]:
+        while True:
+            yield self.get()
+
+    def __enter__(self) -> "Subscriber":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _command(self, text: str) -> Any:
+        self.connection.send(text)
+        while True:
+            response = self.connection.receive()
+            if response["status"] != "Event":
+                return check(response)
+            self._events.append(response["result"])
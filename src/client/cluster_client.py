@@ -0,0 +1,144 @@
+import time
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.client.commands import check, key_arg, value_arg
+from src.client.connection import Connection
+from src.cluster.hash_ring import HashRing
+
+class ClusterClient:
+    """Sends every command straight to the node owning its keys.
+
+    The client keeps its own copy of the ring, asked from any node it knows of, so a key costs
+    no extra hop. A node answering Moved means the ring changed: the copy is refreshed and the
+    command sent again. Batch commands are split per node, each part is atomic on its node but
+    the batch as a whole isn't.
+    """
+
+    def __init__(self, nodes: List[str], max_redirects: int = 5, timeout: Optional[float] = 5.0) -> None:
+        self.seeds: List[str] = list(nodes)
+        self.max_redirects: int = max_redirects
+        self.timeout: Optional[float] = timeout
+        self.epoch: int = -1
+        self.ring: Optional[HashRing] = None
+        self._connections: Dict[str, Connection] = {}
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Fetches the newest ring any known node has."""
+        errors = []
+        for node in dict.fromkeys([*(self.ring.nodes if self.ring else []), *self.seeds]):
+            try:
+                info = check(self._call(node, "CLUSTER INFO"))
+            except (OSError, RuntimeError) as e:
+                errors.append(f"{node}: {e}")
+                continue
+            if info["epoch"] > self.epoch:
+                self.epoch, self.ring = info["epoch"], HashRing(info["nodes"])
+        if self.ring is None:
+            raise ConnectionError(f"No cluster node answered: {'; '.join(errors)}")
+
+    def get(self, key: str) -> Optional[str]:
+        return self.mget([key])[0]  # MGET answers null for a missing key, GET answers a message
+
+    def put(self, key: str, value: str, ex: Optional[int] = None) -> None:
+        key, value = key_arg(key), value_arg(value)
+        self._result(key, f"PUT {key} {value}" if ex is None else f"PUTEX {key} {int(ex)} {value}")
+
+    def delete(self, key: str) -> bool:
+        return self.mdelete([key]) == 1
+
+    def expire(self, key: str, seconds: int) -> bool:
+        return self._result(key, f"EXPIRE {key_arg(key)} {int(seconds)}", ("Ok", "Error")) == "True"
+
+    def ttl(self, key: str) -> int:
+        return int(self._result(key, f"TTL {key_arg(key)}"))
+
+    def mget(self, keys: List[str]) -> List[Optional[str]]:
+        values: Dict[str, Optional[str]] = {}
+        for part, result in self._per_node(list(map(key_arg, keys)), lambda part: "MGET " + " ".join(part)):
+            values.update(zip(part, result))
+        return [values[key] for key in keys]
+
+    def mput(self, items: Dict[str, str]) -> None:
+        for key, value in items.items():
+            key_arg(key), value_arg(value, spaces=False)  # every token is an argument
+        self._per_node(list(items), lambda part: "MPUT " + " ".join(f"{key} {items[key]}" for key in part))
+
+    def mdelete(self, keys: List[str]) -> int:
+        return sum(int(result) for _, result in self._per_node(list(map(key_arg, keys)), lambda part: "MDEL " + " ".join(part)))
+
+    def add_node(self, node: str) -> None:
+        """Grows the cluster by node, a running server started with --cluster, and rebalances."""
+        self.refresh()
+        if node not in self.ring:
+            self._set_ring([*self.ring.nodes, node], first=node)
+
+    def remove_node(self, node: str) -> None:
+        """Moves node's keys to the other nodes, the server can be stopped once wait_rebalanced() returned."""
+        self.refresh()
+        if node in self.ring:
+            self._set_ring([other for other in self.ring.nodes if other != node])
+
+    def wait_rebalanced(self, timeout: float = 60.0, nodes: Optional[List[str]] = None) -> None:
+        """Waits until no node (of the ring or nodes) is still importing keys."""
+        deadline = time.monotonic() + timeout
+        for node in nodes or self.ring.nodes:
+            while check(self._call(node, "CLUSTER INFO"))["importing"]:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"{node} is still importing keys.")
+                time.sleep(0.05)
+
+    def close(self) -> None:
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
+
+    def _set_ring(self, nodes: List[str], first: Optional[str] = None) -> None:
+        """Sends every node the new ring, the node gaining keys first so it's ready when the others redirect to it."""
+        epoch = self.epoch + 1
+        command = f"CLUSTER SETRING {epoch} {' '.join(nodes)}"
+        for node in sorted(set(nodes) | set(self.ring.nodes), key=lambda node: node != first):
+            check(self._call(node, command))
+        self.epoch, self.ring = epoch, HashRing(nodes)
+
+    def _per_node(self, keys: List[str], command: Callable[[List[str]], str], statuses: Any = ("Ok",)) -> List[Tuple[List[str], Any]]:
+        """Runs command once per node for its share of keys, returns (share, result) pairs.
+
+        Shares answered with Moved are split again along the refreshed ring and sent again.
+        """
+        results: List[Tuple[List[str], Any]] = []
+        pending = list(dict.fromkeys(keys))
+        for _ in range(self.max_redirects + 1):
+            parts: Dict[str, List[str]] = {}
+            for key in pending:
+                parts.setdefault(self.ring.owner(key), []).append(key)
+            pending = []
+            for node, part in parts.items():
+                response = self._call(node, command(part))
+                if response["status"] == "Moved":
+                    pending += part
+                else:
+                    results.append((part, check(response, statuses)))
+            if not pending:
+                return results
+            self.refresh()
+        raise RuntimeError(f"Too many redirects for {pending[0]}, is the cluster rebalancing?")
+
+    def _result(self, key: str, command: str, statuses: Any = ("Ok",)) -> Any:
+        return self._per_node([key], lambda part: command, statuses)[0][1]
+
+    def _call(self, node: str, command: str) -> Dict[str, Any]:
+        try:
+            return self._connection(node).call(command)
+        except OSError:
+            connection = self._connections.pop(node, None)
+            if connection is not None:
+                connection.close()  # reconnects on the next call
+            raise
+
+    def _connection(self, node: str) -> Connection:
+        connection = self._connections.get(node)
+        if connection is None:
+            connection = self._connections[node] = Connection(node, self.timeout)
+        return connection
@@ -0,0 +1,140 @@
+import json
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+Entry = Tuple[str, str]
+Record = Tuple[str, str, Optional[float]]  # key, value, expiry deadline as a unix time
+
+# The text of a command, how to decode its result, and the response statuses that aren't errors.
+Command = Tuple[str, Callable[[Any], Any], Tuple[str, ...]]
+
+OK = ("Ok",)
+
+def check(response: Dict[str, Any], statuses: Tuple[str, ...] = OK) -> Any:
+    """Result of a decoded response, RuntimeError with the server's message for an error.
+
+    Some commands answer a plain False with an Error status (EXPIRE of a missing key), those
+    list "Error" in statuses, an Error with a message is still raised.
+    """
+    if response["status"] not in statuses or (response["status"] == "Error" and response.get("mesg")):
+        raise RuntimeError(response.get("mesg") or response.get("result") or response["status"])
+    return response.get("result")
+
+def keeps_connection(error: BaseException) -> bool:
+    """Whether a connection is still usable after error: a server's refusal or the caller's own
+    exception is, an I/O or protocol failure (or an interrupt) may have left a response half read."""
+    return isinstance(error, Exception) and not isinstance(error, (OSError, json.JSONDecodeError))
+
+def results_of(commands: List[Command], responses: List[Dict[str, Any]], raise_on_error: bool = True) -> List[Any]:
+    """Decoded results of pipelined commands, failed ones raise or, with raise_on_error off, are their RuntimeError."""
+    results: List[Any] = []
+    for (_, decode, statuses), response in zip(commands, responses):
+        try:
+            results.append(decode(check(response, statuses)))
+        except RuntimeError as e:
+            if raise_on_error:
+                raise
+            results.append(e)
+    return results
+
+def key_arg(key: str) -> str:
+    if not key or any(char.isspace() for char in key):
+        raise ValueError(f"Keys can't be empty or contain whitespace, got {key!r}.")
+    return key
+
+def value_arg(value: str, spaces: bool = True) -> str:
+    if "\n" in value or "\r" in value or (not spaces and (not value or any(char.isspace() for char in value))):
+        raise ValueError(f"Values can't contain newlines{'' if spaces else ' or spaces in a batch'}, got {value!r}.")
+    return value
+
+def _none(result: Any) -> None:
+    return None
+
+def _same(result: Any) -> Any:
+    return result
+
+def _page(result: List[Any]) -> Tuple[List[Entry], Optional[str]]:
+    cursor, entries = result
+    return [(key, value) for key, value in entries], cursor
+
+def _chunk(result: List[Any]) -> Tuple[List[Record], Optional[str]]:
+    cursor, records = result
+    return [(key, value, deadline) for key, value, deadline in records], cursor
+
+class Commands:
+    """The server's commands, for whatever can execute a Command: clients, pipelines, transactions.
+
+    Methods return whatever _execute returns, the decoded result for a client, a coroutine of
+    it for an asyncio client, the pipeline itself for a pipeline.
+    """
+
+    def _execute(self, command: Command) -> Any:
+        raise NotImplementedError
+
+    def get(self, key: str) -> Any:
+        """The value, None if the key doesn't exist."""
+        return self._execute((f"MGET {key_arg(key)}", lambda result: result[0], OK))  # GET answers a message for a missing key
+
+    def put(self, key: str, value: str, ex: Optional[int] = None) -> Any:
+        """Sets key, expiring after ex seconds if given."""
+        if ex is not None:
+            return self._execute((f"PUTEX {key_arg(key)} {int(ex)} {value_arg(value)}", _none, OK))
+        return self._execute((f"PUT {key_arg(key)} {value_arg(value)}", _none, OK))
+
+    def delete(self, key: str) -> Any:
+        """Whether the key existed."""
+        return self._execute((f"MDEL {key_arg(key)}", lambda result: result == "1", OK))
+
+    def expire(self, key: str, seconds: int) -> Any:
+        """Whether the key existed."""
+        return self._execute((f"EXPIRE {key_arg(key)} {int(seconds)}", lambda result: result == "True", ("Ok", "Error")))
+
+    def cas(self, key: str, expected: str, value: str) -> Any:
+        """Sets key to value if its value is expected, returns whether it did."""
+        return self._execute((f"CAS {key_arg(key)} {value_arg(expected, spaces=False)} {value_arg(value)}", lambda result: result == "True", ("Ok", "Error")))
+
+    def incr(self, key: str, amount: int = 1) -> Any:
+        """The new value, a missing key counts as 0."""
+        return self._execute((f"INCR {key_arg(key)} {int(amount)}", int, OK))
+
+    def decr(self, key: str, amount: int = 1) -> Any:
+        return self._execute((f"DECR {key_arg(key)} {int(amount)}", int, OK))
+
+    def ttl(self, key: str) -> Any:
+        """Seconds left, -1 if the key never expires, -2 if it doesn't exist."""
+        return self._execute((f"TTL {key_arg(key)}", int, OK))
+
+    def mget(self, keys: List[str]) -> Any:
+        """The values in the order of keys, None for missing ones."""
+        return self._execute(("MGET " + " ".join(map(key_arg, keys)), _same, OK))
+
+    def mput(self, items: Dict[str, str]) -> Any:
+        """Sets every key atomically, values can't contain spaces."""
+        return self._execute(("MPUT " + " ".join(f"{key_arg(key)} {value_arg(value, spaces=False)}" for key, value in items.items()), _none, OK))
+
+    def mdelete(self, keys: List[str]) -> Any:
+        """How many keys existed."""
+        return self._execute(("MDEL " + " ".join(map(key_arg, keys)), int, OK))
+
+    def scan(self, start: Optional[str] = None, end: Optional[str] = None, limit: int = 100) -> Any:
+        """A page of (key, value) from start to end (excluded) and the start of the next page (None at the end)."""
+        return self._execute((f"SCAN {key_arg(start) if start else '-'} {key_arg(end) if end else '+'} LIMIT {int(limit)}", _page, OK))
+
+    def prefix(self, prefix: str, limit: int = 100, cursor: Optional[str] = None) -> Any:
+        """A page of (key, value) starting with prefix and the cursor of the next page (None at the end)."""
+        after = f" FROM {key_arg(cursor)}" if cursor else ""
+        return self._execute((f"PREFIX {key_arg(prefix)} LIMIT {int(limit)}{after}", _page, OK))
+
+    def load(self, records: List[Record]) -> Any:
+        """Stores (key, value, deadline) records atomically, returns how many (expired ones are skipped)."""
+        return self._execute(("LOAD " + json.dumps([list(record) for record in records]), int, OK))
+
+    def dump(self, cursor: Optional[str] = None, limit: int = 1000) -> Any:
+        """A chunk of (key, value, deadline) records from cursor and the cursor of the next chunk (None at the end)."""
+        return self._execute((f"DUMP {key_arg(cursor) if cursor else '-'} LIMIT {int(limit)}", _chunk, OK))
+
+    def stats(self) -> Any:
+        return self._execute(("STATS", _same, OK))
+
+def chunks(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
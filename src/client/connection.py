@@ -0,0 +1,41 @@
+import json
+import socket
+
+from typing import Any, Dict, List, Optional, Tuple
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host, int(port)
+
+class Connection:
+    """One blocking text protocol connection to a server, a command and its response at a time."""
+
+    def __init__(self, address: str, timeout: Optional[float] = 5.0) -> None:
+        self.address: str = address
+        self._socket: socket.socket = socket.create_connection(parse_address(address), timeout=timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._socket.makefile("rb")
+
+    def call(self, command: str) -> Dict[str, Any]:
+        """Sends one command, returns the decoded response ({"status": ..., "result": ..., "mesg": ...})."""
+        self.send(command)
+        return self.receive()
+
+    def call_many(self, commands: List[str]) -> List[Dict[str, Any]]:
+        """Pipelines commands: one write for all of them, then their responses in order."""
+        self._socket.sendall(b"".join(command.encode("utf-8", errors="surrogateescape") + b"\n" for command in commands))
+        return [self.receive() for _ in commands]
+
+    def send(self, command: str) -> None:
+        self._socket.sendall(command.encode("utf-8", errors="surrogateescape") + b"\n")
+
+    def receive(self) -> Dict[str, Any]:
+        """The next line the server sent, decoded: a response, or an event once subscribed."""
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError(f"{self.address} closed the connection.")
+        return json.loads(line)
+
+    def close(self) -> None:
+        self._reader.close()
+        self._socket.close()
@@ -0,0 +1,40 @@
+import bisect
+import hashlib
+
+from typing import Dict, List
+
+VNODES = 128  # points per node, spreads the keys evenly enough and moves ~1/N of them when a node joins
+
+def hash_of(text: str) -> int:
+    """Stable across processes and runs, unlike hash() which is salted per process."""
+    return int.from_bytes(hashlib.md5(text.encode("utf-8", errors="surrogateescape")).digest()[:8], "big")
+
+class HashRing:
+    """Consistent hashing of keys to nodes ("host:port" addresses).
+
+    Every node is hashed to vnodes points on a ring, a key belongs to the node of the first
+    point at or after its own hash. Adding a node only takes the keys that now fall before
+    its points, every other key stays where it was.
+    """
+
+    def __init__(self, nodes: List[str], vnodes: int = VNODES) -> None:
+        if not nodes:
+            raise ValueError("A hash ring needs at least one node.")
+        self.nodes: List[str] = sorted(set(nodes))
+        self.vnodes: int = vnodes
+        ring: Dict[int, str] = {}
+        for node in self.nodes:
+            for i in range(vnodes):
+                ring.setdefault(hash_of(f"{node}#{i}"), node)
+        self._points: List[int] = sorted(ring)
+        self._owners: List[str] = [ring[point] for point in self._points]
+
+    def owner(self, key: str) -> str:
+        i = bisect.bisect_left(self._points, hash_of(key))
+        return self._owners[i if i < len(self._points) else 0]
+
+    def __contains__(self, node: str) -> bool:
+        return node in self.nodes
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, HashRing) and (self.nodes, self.vnodes) == (other.nodes, other.vnodes)
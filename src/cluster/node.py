@@ -0,0 +1,186 @@
+import itertools
+import logging
+import threading
+import time
+
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src.client.connection import Connection
+from src.cluster.hash_ring import HashRing
+from src.datastore.key_value_store import KeyValueStore
+
+MIGRATE_BATCH = 1000  # keys looked at per CLUSTER TAKE, the source holds its store lock for one batch
+
+Migrated = Tuple[str, str, Optional[float]]  # key, value, expiry deadline
+
+class ClusterNode:
+    """This server's share of a cluster: the keys its address owns on the hash ring.
+
+    Nodes don't talk to each other to agree on the ring, an administrator (ClusterClient.add_node)
+    sends every node the new ring with a higher epoch. A node given a new ring imports the keys
+    it gained by pulling them from their previous owners, in batches from a background thread,
+    and right away for any key a client asks for in the meantime. A source only copies the keys
+    it hands over, and deletes them once the importing node confirmed it stored them (FORGET):
+    a batch whose response got lost is just asked for again, it's never lost.
+    """
+
+    def __init__(self, store: KeyValueStore, address: str, nodes: List[str], epoch: int = 0,
+                 migrate_batch: int = MIGRATE_BATCH, retry_interval: float = 0.05) -> None:
+        self.store: KeyValueStore = store
+        self.address: str = address
+        self.ring: HashRing = HashRing(nodes)
+        self.epoch: int = epoch
+        self.previous: Optional[HashRing] = None  # ring still being imported from, None once rebalanced
+        self.migrate_batch: int = migrate_batch
+        self.retry_interval: float = retry_interval
+        self._state_lock = threading.Lock()
+        self._import_lock = threading.Lock()  # one pull at a time, so a batch in flight can't overwrite a key pulled for a client
+        self._peers: Dict[str, Connection] = {}  # used under _import_lock only
+        self._imported: Set[str] = set()  # keys stored by the current import, under _import_lock
+
+    def info(self) -> Dict[str, Any]:
+        return {"node": self.address, "epoch": self.epoch, "nodes": self.ring.nodes, "importing": self.previous is not None}
+
+    def route(self, keys: List[str]) -> Set[str]:
+        """The nodes owning keys. When it's only this one, keys not imported yet are pulled first."""
+        ring = self.ring
+        owners = {ring.owner(key) for key in keys}
+        if owners == {self.address} and self.previous is not None:
+            self._pull(keys)
+        return owners
+
+    def set_ring(self, epoch: int, nodes: List[str]) -> None:
+        """Adopts a newer ring and starts importing the keys this node gained."""
+        with self._state_lock:
+            if epoch <= self.epoch:
+                raise RuntimeError(f"Ring epoch {epoch} is not newer than the current one ({self.epoch}).")
+            if self.previous is not None:
+                raise RuntimeError("Still importing keys for the current ring, try again once rebalanced.")
+            ring = HashRing(nodes)
+            previous, self.ring, self.epoch = self.ring, ring, epoch
+            if self.address not in ring:
+                return  # leaving the cluster, the others pull our keys
+            self.previous = previous
+        sources = [node for node in previous.nodes if node != self.address]
+        threading.Thread(target=self._import, args=(epoch, sources), name="cluster-import", daemon=True).start()
+        logging.info(f"Cluster ring {epoch}: {', '.join(ring.nodes)}, importing from {', '.join(sources) or 'nobody'}")
+
+    def take(self, epoch: int, node: str, cursor: Optional[str], count: int) -> Tuple[Optional[str], List[Migrated]]:
+        """Copies the keys node owns among the next count keys from cursor, node then calls forget.
+
+        Returns the entries and the cursor of the next batch, None once every key was looked at.
+        """
+        self._check_epoch(epoch)
+        store = self.store
+        store._build_index()
+        with store._lock:
+            keys = list(itertools.islice(store._index.irange(cursor, None), count + 1))
+            cursor = keys.pop() if len(keys) > count else None
+            ring = self.ring
+            return cursor, self._entries([key for key in keys if ring.owner(key) == node])
+
+    def take_keys(self, epoch: int, keys: List[str]) -> List[Migrated]:
+        """Copies those of keys this node holds but doesn't own, the requester then calls forget."""
+        self._check_epoch(epoch)
+        store = self.store
+        with store._lock:
+            ring = self.ring
+            return self._entries([key for key in keys if key in store._store and ring.owner(key) != self.address])
+
+    def forget(self, epoch: int, keys: List[str]) -> int:
+        """Deletes those of keys the importing node stored and this one doesn't own, returns how many."""
+        self._check_epoch(epoch)
+        store = self.store
+        with store._lock:
+            ring = self.ring
+            keys = [key for key in keys if key in store._store and ring.owner(key) != self.address]
+            if keys:
+                store._apply(dict.fromkeys(keys))  # a delete like any other, logged and replicated
+            return len(keys)
+
+    def _entries(self, keys: List[str]) -> List[Migrated]:
+        """Store lock held."""
+        store = self.store
+        return [(key, store._store[key], store._expires.get(key)) for key in keys]
+
+    def _check_epoch(self, epoch: int) -> None:
+        if epoch != self.epoch:
+            raise RuntimeError(f"Ring epoch {epoch} doesn't match this node's ({self.epoch}).")
+
+    def _import(self, epoch: int, sources: List[str]) -> None:
+        for source in sources:
+            cursor = "-"
+            while cursor is not None:
+                if self.epoch != epoch:
+                    return  # superseded
+                with self._import_lock:
+                    result = self._call(source, f"CLUSTER TAKE {epoch} {self.address} {cursor} {self.migrate_batch}")
+                    if result is not None:
+                        following, entries = result
+                        self._restore(entries)
+                        if self._forget(source, epoch, entries):
+                            cursor = following
+                        else:
+                            result = None  # the same batch again, the source still has it
+                if result is None:
+                    time.sleep(self.retry_interval)  # source down or not on this epoch yet
+        with self._import_lock, self._state_lock:
+            if self.epoch == epoch:
+                self.previous = None
+                self._imported = set()
+        logging.info(f"Cluster ring {epoch}: import done")
+
+    def _pull(self, keys: List[str], timeout: float = 1.0) -> None:
+        """Imports keys a client asked for before the background import got to them."""
+        with self._import_lock:
+            previous, epoch = self.previous, self.epoch
+            if previous is None:
+                return  # done in the meantime
+            by_source: Dict[str, List[str]] = {}
+            for key in keys:
+                source = previous.owner(key)
+                if source != self.address and key not in self.store._store and key not in self._imported:
+                    by_source.setdefault(source, []).append(key)
+            for source, missing in by_source.items():
+                deadline = time.monotonic() + timeout
+                while True:
+                    entries = self._call(source, f"CLUSTER TAKEKEYS {epoch} {' '.join(missing)}")
+                    if entries is not None:
+                        self._restore(entries)
+                        if self._forget(source, epoch, entries):
+                            break
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"Rebalancing: {source} didn't hand over its keys, try again.")
+                    time.sleep(self.retry_interval)
+
+    def _restore(self, entries: List[Migrated]) -> None:
+        """Stores the entries not imported yet: a batch sent again must not undo what clients did since. _import_lock held."""
+        entries = [entry for entry in entries if entry[0] not in self._imported]
+        if not entries:
+            return
+        self._imported.update(key for key, _, _ in entries)
+        store = self.store
+        with store._lock:
+            expires = {key: deadline for key, _, deadline in entries if deadline is not None}
+            store._apply({key: value for key, value, _ in entries}, expires or None)
+
+    def _forget(self, source: str, epoch: int, entries: List[Migrated]) -> bool:
+        """Lets source delete the entries stored here, False if that failed and should be retried. _import_lock held."""
+        return not entries or self._call(source, f"CLUSTER FORGET {epoch} {' '.join(key for key, _, _ in entries)}") is not None
+
+    def _call(self, source: str, command: str) -> Any:
+        """Result of command on source, None if it failed (and should be retried). _import_lock held."""
+        try:
+            peer = self._peers.get(source)
+            if peer is None:
+                peer = self._peers[source] = Connection(source)
+            response = peer.call(command)
+        except OSError as e:
+            peer = self._peers.pop(source, None)
+            if peer is not None:
+                peer.close()
+            logging.warning(f"Cluster import from {source} failed: {e}")
+            return None
+        if response["status"] != "Ok":
+            return None
+        return response.get("result")
@@ -0,0 +1,198 @@
+import random
+import sys
+import time
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from src.datastore.key_value_store import KeyValueStore
+
+ENTRY_OVERHEAD = 128  # rough cost of the dict slots and bookkeeping of one key, on top of the strings themselves
+
+def entry_size(key: str, value: str) -> int:
+    """Bytes a key-value pair takes in memory, O(1) whatever the length of the value."""
+    return sys.getsizeof(key) + sys.getsizeof(value) + ENTRY_OVERHEAD
+
+class EvictionPolicy(ABC):
+    """Picks which key goes when the store is over its memory limit, every method is O(1)."""
+
+    @abstractmethod
+    def add(self, key: str) -> None:
+        """A new key was written."""
+        pass
+
+    @abstractmethod
+    def touch(self, key: str) -> None:
+        """An existing key was read or written."""
+        pass
+
+    @abstractmethod
+    def remove(self, key: str) -> None:
+        """A key was deleted."""
+        pass
+
+    @abstractmethod
+    def victim(self) -> str:
+        """The key to evict next, there is at least one."""
+        pass
+
+class LRUPolicy(EvictionPolicy):
+    """Exact least recently used, keys are kept in access order."""
+
+    def __init__(self) -> None:
+        self._order: "OrderedDict[str, None]" = OrderedDict()
+
+    def add(self, key: str) -> None:
+        self._order[key] = None
+
+    def touch(self, key: str) -> None:
+        self._order.move_to_end(key)
+
+    def remove(self, key: str) -> None:
+        del self._order[key]
+
+    def victim(self) -> str:
+        return next(iter(self._order))
+
+class RandomPolicy(EvictionPolicy):
+    """Evicts a key picked at random, no bookkeeping on reads at all."""
+
+    def __init__(self) -> None:
+        self._keys: List[str] = []  # dense, so picking one at random is O(1)
+        self._positions: Dict[str, int] = {}
+
+    def add(self, key: str) -> None:
+        self._positions[key] = len(self._keys)
+        self._keys.append(key)
+
+    def touch(self, key: str) -> None:
+        pass
+
+    def remove(self, key: str) -> None:
+        position = self._positions.pop(key)
+        last = self._keys.pop()
+        if last != key:  # fill the hole with the last key
+            self._keys[position] = last
+            self._positions[last] = position
+
+    def victim(self) -> str:
+        return random.choice(self._keys)
+
+class LFUPolicy(RandomPolicy):
+    """Approximate least frequently used, the way Redis does it.
+
+    Every key has a small logarithmic access counter (incremented with a probability that
+    shrinks as it grows, so 255 covers millions of hits) that decays by one every
+    decay_seconds without access. The victim is the least used of a few keys sampled at
+    random, instead of keeping every key sorted by frequency.
+    """
+
+    INITIAL = 5  # new keys get a chance to be used before they're the first to go
+
+    def __init__(self, samples: int = 5, log_factor: int = 10, decay_seconds: float = 60) -> None:
+        super().__init__()
+        self.samples: int = samples
+        self.log_factor: int = log_factor
+        self.decay_seconds: float = decay_seconds
+        self._counters: Dict[str, Tuple[int, float]] = {}  # key -> (counter, last decay time)
+
+    def add(self, key: str) -> None:
+        super().add(key)
+        self._counters[key] = (self.INITIAL, time.monotonic())
+
+    def touch(self, key: str) -> None:
+        now = time.monotonic()
+        counter = self._decayed(key, now)
+        if counter < 255 and random.random() < 1 / (max(counter - self.INITIAL, 0) * self.log_factor + 1):
+            counter += 1
+        self._counters[key] = (counter, now)
+
+    def remove(self, key: str) -> None:
+        super().remove(key)
+        del self._counters[key]
+
+    def victim(self) -> str:
+        now = time.monotonic()
+        candidates = random.sample(self._keys, min(self.samples, len(self._keys)))
+        return min(candidates, key=lambda key: self._decayed(key, now))
+
+    def _decayed(self, key: str, now: float) -> int:
+        counter, since = self._counters[key]
+        return max(counter - int((now - since) / self.decay_seconds), 0)
+
+POLICIES = ("lru", "lfu", "random")
+
+class BoundedKeyValueStore(KeyValueStore):
+    """KeyValueStore with a memory ceiling, in bytes.
+
+    Whenever committed writes take the data over max_memory, keys are evicted following the
+    eviction policy until it fits again, instead of growing until the process gets OOM killed.
+    Evictions are deletes like any other, and are counted in stats().
+    """
+
+    def __init__(self, max_memory: int, policy: str = "lru", samples: int = 5) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown eviction policy '{policy}'. Available policies: {', '.join(POLICIES)}")
+        super().__init__()
+        self.max_memory: int = max_memory
+        self.used_memory: int = 0
+        self.evicted_keys: int = 0
+        self.evicted_bytes: int = 0
+        self._sizes: Dict[str, int] = {}
+        self._policy: EvictionPolicy = LFUPolicy(samples) if policy == "lfu" else RandomPolicy() if policy == "random" else LRUPolicy()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = super().get(key)
+            if key in self._sizes:
+                self._policy.touch(key)
+            return value
+
+    def mget(self, keys: List[str]) -> List[Optional[str]]:
+        with self._lock:
+            values = super().mget(keys)
+            for key in keys:
+                if key in self._sizes:
+                    self._policy.touch(key)
+            return values
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "keys": len(self._store),
+                "used_memory": self.used_memory,
+                "max_memory": self.max_memory,
+                "evicted_keys": self.evicted_keys,
+                "evicted_bytes": self.evicted_bytes,
+            }
+
+    def _apply(self, changes: Dict[str, Optional[str]], expires: Optional[Dict[str, float]] = None) -> None:
+        for key, value in changes.items():
+            if value is not None and entry_size(key, value) > self.max_memory:
+                raise RuntimeError(f"Value of '{key}' is bigger than the memory limit of {self.max_memory} bytes.")
+        super()._apply(changes, expires)
+        for key, value in changes.items():
+            self._account(key, value)
+
+        while self.used_memory > self.max_memory and self._sizes:
+            victim = self._policy.victim()
+            self.evicted_bytes += self._sizes[victim]
+            self.evicted_keys += 1
+            super()._apply({victim: None})
+            self._account(victim, None)
+
+    def _account(self, key: str, value: Optional[str]) -> None:
+        """Keeps sizes and the eviction policy in line with a write that was just applied."""
+        old = self._sizes.pop(key, None)
+        if old is not None:
+            self.used_memory -= old
+            if value is None:
+                self._policy.remove(key)
+        if value is not None:
+            size = self._sizes[key] = entry_size(key, value)
+            self.used_memory += size
+            if old is None:
+                self._policy.add(key)
+            else:
+                self._policy.touch(key)
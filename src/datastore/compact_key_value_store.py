@@ -0,0 +1,217 @@
+import struct
+import zlib
+
+from array import array
+from threading import RLock
+from typing import Dict, List, Optional, Tuple
+
+from src.datastore.kv_store_interface import KeyValueStoreInterface
+from src.datastore.session import current_session
+from src.datastore.transactions import MISSING, TransactionStack
+
+RECORD = struct.Struct("<IIB")  # key length, stored value length, flags, followed by the key and value bytes
+COMPRESSED = 1
+
+EMPTY, DELETED = -1, -2  # slot markers, any other slot holds the arena offset of a record
+
+def to_bytes(text: str) -> bytes:
+    return text.encode("utf-8", errors="surrogatepass")  # keys from the binary protocol may hold lone surrogates
+
+def to_str(data: bytes) -> str:
+    return data.decode("utf-8", errors="surrogatepass")
+
+class CompactKeyValueStore(KeyValueStoreInterface):
+    """Same semantics as KeyValueStore, with a fraction of the memory per entry.
+
+    A dict of str costs two objects and a dict slot per entry, well over 100 bytes before
+    counting a single character. Here every pair is a record appended to one bytearray (the
+    arena), and an open addressing hash table made of two flat arrays maps hashes to record
+    offsets, about 9 + key + value bytes per record plus 16 bytes per table slot. Values of at
+    least compress_threshold bytes are stored zlib compressed when that makes them smaller.
+
+    Overwritten and deleted records stay in the arena as garbage until it makes up half of it,
+    then the live records are copied into a fresh arena (which also resizes the table).
+    """
+
+    def __init__(self, compress_threshold: Optional[int] = None, compress_level: int = 1) -> None:
+        self.compress_threshold: Optional[int] = compress_threshold  # None: never compress
+        self.compress_level: int = compress_level
+        self._lock = RLock()
+        self._arena: bytearray = bytearray()
+        self._slots: array = array("q", [EMPTY]) * 8
+        self._hashes: array = array("q", [0]) * 8
+        self._used: int = 0  # live keys
+        self._filled: int = 0  # live keys and DELETED markers, what probing has to walk over
+        self._garbage: int = 0  # arena bytes taken by dead records
+
+    @property
+    def transactions(self) -> TransactionStack:
+        return current_session().state(self, TransactionStack)
+
+    def __len__(self) -> int:
+        return self._used
+
+    def put(self, key: str, value: str) -> None:
+        with self._lock:
+            if self.transactions:
+                self.transactions.write(key, value)
+            else:
+                self._apply({key: value})
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self.transactions.lookup(key)
+            if value is not MISSING:
+                return value
+            return self._read(key)
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            if self.transactions:
+                if self.get(key) is not None:
+                    self.transactions.write(key, None)
+                    return True
+                return False
+            return self._apply({key: None}) == 1
+
+    def mget(self, keys: List[str]) -> List[Optional[str]]:
+        with self._lock:
+            txns = self.transactions
+            values: List[Optional[str]] = []
+            for key in keys:
+                value = txns.lookup(key)
+                values.append(self._read(key) if value is MISSING else value)
+            return values
+
+    def mput(self, items: Dict[str, str]) -> None:
+        with self._lock:
+            if self.transactions:
+                for key, value in items.items():
+                    self.transactions.write(key, value)
+            elif items:
+                self._apply(dict(items))
+
+    def mdelete(self, keys: List[str]) -> int:
+        with self._lock:
+            if self.transactions:
+                existing = {key for key, value in zip(keys, self.mget(keys)) if value is not None}
+                for key in existing:
+                    self.transactions.write(key, None)
+                return len(existing)
+            return self._apply(dict.fromkeys(keys))
+
+    def start(self) -> None:
+        with self._lock:
+            self.transactions.begin()
+
+    def commit(self) -> None:
+        with self._lock:
+            txn = self.transactions.commit()
+            if txn:  # None for a nested transaction, folded into its parent
+                self._apply(txn)
+
+    def rollback(self) -> None:
+        with self._lock:
+            self.transactions.rollback()
+
+    def _apply(self, changes: Dict[str, Optional[str]]) -> int:
+        """Writes committed changes (None deletes) with the lock held, returns how many keys were deleted."""
+        deleted = 0
+        for key, value in changes.items():
+            if value is None:
+                deleted += self._remove(to_bytes(key))
+            else:
+                self._insert(to_bytes(key), to_bytes(value))
+        if self._garbage > 4096 and self._garbage * 2 > len(self._arena):
+            self._rebuild(len(self._slots))  # mostly dead records, compact the arena
+        return deleted
+
+    def _read(self, key: str) -> Optional[str]:
+        key_bytes = to_bytes(key)
+        slot, _ = self._probe(key_bytes, hash(key_bytes))
+        if slot < 0:
+            return None
+        offset = self._slots[slot]
+        key_size, value_size, flags = RECORD.unpack_from(self._arena, offset)
+        start = offset + RECORD.size + key_size
+        value = bytes(self._arena[start:start + value_size])
+        return to_str(zlib.decompress(value) if flags & COMPRESSED else value)
+
+    def _probe(self, key: bytes, key_hash: int) -> Tuple[int, int]:
+        """Linear probing, returns the slot holding key (-1 if absent) and the first slot a new key can take."""
+        slots, hashes, arena = self._slots, self._hashes, self._arena
+        mask = len(slots) - 1
+        i = key_hash & mask
+        free = -1
+        while True:
+            offset = slots[i]
+            if offset == EMPTY:
+                return -1, i if free == -1 else free
+            if offset == DELETED:
+                if free == -1:
+                    free = i
+            elif hashes[i] == key_hash:
+                key_size = RECORD.unpack_from(arena, offset)[0]
+                start = offset + RECORD.size
+                if key_size == len(key) and arena[start:start + key_size] == key:
+                    return i, free
+            i = (i + 1) & mask
+
+    def _insert(self, key: bytes, value: bytes) -> None:
+        flags = 0
+        if self.compress_threshold is not None and len(value) >= self.compress_threshold:
+            compressed = zlib.compress(value, self.compress_level)
+            if len(compressed) < len(value):
+                value, flags = compressed, COMPRESSED
+
+        key_hash = hash(key)
+        slot, free = self._probe(key, key_hash)
+        offset = len(self._arena)
+        self._arena += RECORD.pack(len(key), len(value), flags)
+        self._arena += key
+        self._arena += value
+        if slot >= 0:
+            self._garbage += self._record_size(self._slots[slot])
+            self._slots[slot] = offset
+            return
+
+        if self._slots[free] == EMPTY:
+            self._filled += 1
+        self._slots[free] = offset
+        self._hashes[free] = key_hash
+        self._used += 1
+        if self._filled * 3 >= len(self._slots) * 2:  # keep probe sequences short
+            self._rebuild(len(self._slots) * 2 if self._used * 3 >= len(self._slots) else len(self._slots))
+
+    def _remove(self, key: bytes) -> bool:
+        slot, _ = self._probe(key, hash(key))
+        if slot < 0:
+            return False
+        self._garbage += self._record_size(self._slots[slot])
+        self._slots[slot] = DELETED  # not EMPTY, that would cut the probe sequences running through it
+        self._used -= 1
+        return True
+
+    def _record_size(self, offset: int) -> int:
+        key_size, value_size, _ = RECORD.unpack_from(self._arena, offset)
+        return RECORD.size + key_size + value_size
+
+    def _rebuild(self, capacity: int) -> None:
+        """Copies the live records into a fresh arena and table, dropping garbage and DELETED markers."""
+        arena, slots, hashes = self._arena, self._slots, self._hashes
+        self._arena = bytearray()
+        self._slots = array("q", [EMPTY]) * capacity
+        self._hashes = array("q", [0]) * capacity
+        self._garbage = 0
+        self._filled = self._used
+        mask = capacity - 1
+        for offset, key_hash in zip(slots, hashes):
+            if offset < 0:
+                continue
+            key_size, value_size, _ = RECORD.unpack_from(arena, offset)
+            i = key_hash & mask
+            while self._slots[i] != EMPTY:
+                i = (i + 1) & mask
+            self._slots[i] = len(self._arena)
+            self._hashes[i] = key_hash
+            self._arena += arena[offset:offset + RECORD.size + key_size + value_size]
@@ -0,0 +1,153 @@
+import logging
+import os
+import threading
+
+from typing import Dict, List, MutableMapping, Optional
+
+from src.datastore.key_value_store import KeyValueStore
+from src.datastore.kv_store_interface import Record
+from src.datastore.snapshot import MappedSnapshot, SnapshotOverlay, list_snapshots, snapshot_path, write_snapshot
+from src.datastore.wal import WriteAheadLog, list_segments, read_segment, segment_path
+
+class DurableKeyValueStore(KeyValueStore):
+    """KeyValueStore that survives restarts.
+
+    Every committed change set (a PUT, a DEL or a whole transaction on COMMIT) is appended to
+    a write ahead log before being applied. Every snapshot_every change sets the log is rotated
+    and a compact snapshot of the data is written in the background, after which older log
+    segments are deleted. On startup the latest snapshot is mapped (see SnapshotOverlay) and the
+    log replayed on top, values from the snapshot are only read when first asked for.
+    """
+
+    def __init__(self, directory: str, fsync: str = "interval", fsync_interval_ms: int = 1000, snapshot_every: int = 100_000) -> None:
+        super().__init__()
+        self.directory: str = directory
+        self.snapshot_every: int = snapshot_every
+        self._since_snapshot: int = 0
+        self._snapshot_thread: Optional[threading.Thread] = None
+
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:  # the expiry sweeper may start during recovery, it must wait for the log
+            generation = self._recover()
+            self._wal = WriteAheadLog(directory, generation, fsync=fsync, fsync_interval_ms=fsync_interval_ms)
+
+    def put(self, key: str, value: str) -> None:
+        super().put(key, value)
+        self._wal.sync()  # outside the store lock, so concurrent writers share fsyncs
+
+    def delete(self, key: str) -> bool:
+        deleted = super().delete(key)
+        self._wal.sync()
+        return deleted
+
+    def mput(self, items: Dict[str, str]) -> None:
+        super().mput(items)
+        self._wal.sync()
+
+    def mdelete(self, keys: List[str]) -> int:
+        deleted = super().mdelete(keys)
+        self._wal.sync()
+        return deleted
+
+    def put_ex(self, key: str, value: str, seconds: float) -> None:
+        super().put_ex(key, value, seconds)
+        self._wal.sync()
+
+    def expire(self, key: str, seconds: float) -> bool:
+        exists = super().expire(key, seconds)
+        self._wal.sync()
+        return exists
+
+    def cas(self, key: str, expected: str, value: str) -> bool:
+        swapped = super().cas(key, expected, value)
+        self._wal.sync()
+        return swapped
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        number = super().incr(key, amount)
+        self._wal.sync()
+        return number
+
+    def load(self, records: List[Record]) -> int:
+        stored = super().load(records)
+        self._wal.sync()
+        return stored
+
+    def commit(self) -> None:
+        super().commit()
+        self._wal.sync()
+
+    def snapshot(self) -> None:
+        """Writes a snapshot now and waits for it, instead of waiting for snapshot_every changes."""
+        with self._lock:
+            self._start_snapshot()
+        self._wait_for_snapshot()
+
+    def close(self) -> None:
+        self._wait_for_snapshot()
+        self._wal.close()
+
+    def _apply(self, changes: Dict[str, Optional[str]], expires: Optional[Dict[str, float]] = None) -> None:
+        if self._since_snapshot >= self.snapshot_every and not self._snapshot_running():
+            self._start_snapshot()  # before logging, the snapshot must not include these changes
+        self._wal.append(changes, expires)
+        self._since_snapshot += 1
+        super()._apply(changes, expires)
+
+    def _recover(self) -> int:
+        """Loads the latest snapshot and replays the log after it, returns the generation to log into next."""
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                os.remove(os.path.join(self.directory, name))  # snapshot interrupted by a crash
+
+        snapshots = list_snapshots(self.directory)
+        segments = list_segments(self.directory)
+        base = snapshots[-1] if snapshots else 0
+
+        if snapshots:
+            # mapped, not loaded: values are read from disk the first time they're asked for
+            self._store = SnapshotOverlay(MappedSnapshot(snapshot_path(self.directory, base)))
+        replayed = 0
+        for generation in segments:
+            if generation >= base:
+                for record in read_segment(self.directory, generation):
+                    changes, expires = record if isinstance(record, list) else (record, None)
+                    super()._apply(changes, expires)  # already logged
+                    replayed += 1
+        logging.info(f"Recovered {len(self._store)} keys from {self.directory} ({replayed} log records replayed)")
+
+        return max([base, *segments]) + 1  # fresh segment, never append after a torn record
+
+    def _snapshot_running(self) -> bool:
+        return self._snapshot_thread is not None and self._snapshot_thread.is_alive()
+
+    def _start_snapshot(self) -> None:
+        """Called with the store lock held, the copy and the log rotation happen at the same point in time."""
+        self._wait_for_snapshot()
+        # Not free: O(keys written since the snapshot the store started from, every key without one),
+        # and writers wait for it. Writing the snapshot, the slow part, happens outside the lock.
+        data = self._store.copy()
+        generation = self._wal.rotate()
+        if self._expires:
+            self._wal.append({}, dict(self._expires))  # snapshots only hold values, the new segment carries the TTLs
+        self._since_snapshot = 0
+        self._snapshot_thread = threading.Thread(target=self._write_snapshot, args=(generation, data), name="snapshot", daemon=True)
+        self._snapshot_thread.start()
+
+    def _wait_for_snapshot(self) -> None:
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+
+    def _write_snapshot(self, generation: int, data: MutableMapping[str, str]) -> None:
+        try:
+            write_snapshot(self.directory, generation, data.items())
+        except OSError as e:
+            logging.error(f"Snapshot {generation} failed, keeping the write ahead log: {e}")
+            return
+        for old in list_snapshots(self.directory):
+            if old < generation:
+                os.remove(snapshot_path(self.directory, old))
+        for old in list_segments(self.directory):
+            if old < generation:
+                os.remove(segment_path(self.directory, old))
+        logging.info(f"Snapshot {generation} written ({len(data)} keys)")
@@ -1,65 +1,355 @@
-from typing import Dict, Optional
-from threading import RLock, local
-from src.datastore.kv_store_interface import KeyValueStoreInterface
+import heapq
+import math
+import time
+import weakref
+
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+from threading import Lock, RLock, Thread
+from src.datastore.kv_store_interface import KeyValueStoreInterface, Record, integer_value
+from src.datastore.session import current_session
+from src.datastore.sorted_index import Entry, SortedKeys, scan_page
+from src.datastore.transactions import MISSING, TransactionStack, Watch
+from src.metrics.metrics import InstrumentedLock
+
+Listener = Callable[[Dict[str, Optional[str]], Optional[Dict[str, float]]], None]
 
 class KeyValueStore(KeyValueStoreInterface):
-    def __init__(self) -> None:
+    def __init__(self, sweep_interval: float = 0.1, sweep_batch: int = 1000) -> None:
         self._store: Dict[str, str] = {}
-        self._lock = RLock()
-        self._local = local()
+        self._lock = InstrumentedLock(RLock())  # wait time shows up in STATS
+        self._expires: Dict[str, float] = {}  # key -> deadline (wall clock, so it can be logged), only keys with a TTL
+        self._deadlines: List[Tuple[float, str]] = []  # min-heap of (deadline, key), stale entries are skipped when popped
+        self._sweeper: Optional[Thread] = None  # started with the first TTL
+        self._index: Optional[SortedKeys] = None  # built by the first scan, maintained by _apply from then on
+        self._index_lock = Lock()  # one build at a time
+        self._index_changes: Optional[Set[str]] = None  # keys written while a build sorts without the lock
+        self._listeners: List[Listener] = []
+        self._watches: Dict[str, "weakref.WeakSet[Watch]"] = {}  # key -> watches of sessions still around
+        self.sweep_interval: float = sweep_interval
+        self.sweep_batch: int = sweep_batch  # most keys expired per lock acquisition
 
     @property
-    def transactions(self) -> list[Dict[str, Optional[str]]]:
-        if not hasattr(self._local, "transactions"):
-            self._local.transactions = []
-        return self._local.transactions
+    def transactions(self) -> TransactionStack:
+        return current_session().state(self, TransactionStack)
 
     def put(self, key: str, value: str) -> None:
         with self._lock:
             if self.transactions:
-                self.transactions[-1][key] = value
+                self.transactions.write(key, value)
             else:
-                self._store[key] = value
+                self._apply({key: value})
 
     def get(self, key: str) -> Optional[str]:
         with self._lock:
-            for txn in reversed(self.transactions):
-                if key in txn:
-                    return txn[key]
+            value = self.transactions.lookup(key)
+            if value is not MISSING:
+                return value
+            self._expire_if_due(key)
             return self._store.get(key)
 
     def delete(self, key: str) -> bool:
         with self._lock:
             if self.transactions:
-                if key in self._store or any(key in txn for txn in self.transactions):
-                    self.transactions[-1][key] = None
+                if self.get(key) is not None:
+                    self.transactions.write(key, None)
                     return True
                 return False
-            return self._store.pop(key, None) is not None
+            self._expire_if_due(key)
+            if key not in self._store:
+                return False
+            self._apply({key: None})
+            return True
 
-    def start(self) -> None:
+    def mget(self, keys: List[str]) -> List[Optional[str]]:
         with self._lock:
-            self.transactions.append({})
+            txns = self.transactions
+            values: List[Optional[str]] = []
+            for key in keys:
+                value = txns.lookup(key)
+                if value is MISSING:
+                    self._expire_if_due(key)
+                    value = self._store.get(key)
+                values.append(value)
+            return values
 
-    def commit(self) -> None:
+    def mput(self, items: Dict[str, str]) -> None:
+        with self._lock:
+            if self.transactions:
+                for key, value in items.items():
+                    self.transactions.write(key, value)
+            elif items:
+                self._apply(dict(items))  # one change set, so one log record when persisted
+
+    def mdelete(self, keys: List[str]) -> int:
         with self._lock:
-            if not self.transactions:
-                raise RuntimeError("No active transaction to commit.")
+            if self.transactions:
+                existing = {key for key, value in zip(keys, self.mget(keys)) if value is not None}
+                for key in existing:
+                    self.transactions.write(key, None)
+                return len(existing)
+            for key in keys:
+                self._expire_if_due(key)
+            changes: Dict[str, Optional[str]] = {key: None for key in keys if key in self._store}
+            if changes:
+                self._apply(changes)
+            return len(changes)
 
-            txn = self.transactions.pop()
+    def put_ex(self, key: str, value: str, seconds: float) -> None:
+        if seconds <= 0:
+            raise ValueError("Expire time must be a positive number of seconds.")
+        with self._lock:
+            self._check_no_transaction()
+            self._apply({key: value}, {key: time.time() + seconds})
 
+    def expire(self, key: str, seconds: float) -> bool:
+        with self._lock:
+            self._check_no_transaction()
+            self._expire_if_due(key)
+            if key not in self._store:
+                return False
+            if seconds <= 0:
+                self._apply({key: None})  # already expired
+            else:
+                self._apply({}, {key: time.time() + seconds})
+            return True
+
+    def ttl(self, key: str) -> int:
+        with self._lock:
+            value = self.transactions.lookup(key)
+            if value is not MISSING:
+                return -2 if value is None else -1  # written by the transaction, committing it drops any TTL
+            self._expire_if_due(key)
+            if key not in self._store:
+                return -2
+            deadline = self._expires.get(key)
+            return -1 if deadline is None else max(math.ceil(deadline - time.time()), 0)
+
+    def cas(self, key: str, expected: str, value: str) -> bool:
+        with self._lock:
+            if self.get(key) != expected:
+                return False
+            self.put(key, value)
+            return True
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        with self._lock:
+            number = integer_value(key, self.get(key)) + amount
             if self.transactions:
-                self.transactions[-1].update(txn)
+                self.transactions.write(key, str(number))  # a plain write, committing it drops the TTL like any other
             else:
-                for key, value in txn.items():
-                    if value is None:
-                        self._store.pop(key, None)
-                    else:
-                        self._store[key] = value
+                deadline = self._expires.get(key)  # a counter keeps its TTL, like in Redis
+                self._apply({key: str(number)}, {key: deadline} if deadline else None)
+            return number
+
+    def watch(self, keys: List[str]) -> None:
+        with self._lock:
+            txns = self.transactions
+            if txns:
+                raise RuntimeError("WATCH must come before START.")
+            if txns.watch is None:
+                txns.watch = Watch()
+            for key in keys:
+                self._expire_if_due(key)  # expiring it later shouldn't count as a change
+                txns.watch.keys.add(key)
+                self._watches.setdefault(key, weakref.WeakSet()).add(txns.watch)
+
+    def unwatch(self) -> None:
+        with self._lock:
+            self._unwatch(self.transactions)
+
+    def scan(self, start: Optional[str], end: Optional[str], limit: int) -> Tuple[List[Entry], Optional[str]]:
+        self._build_index()
+        with self._lock:  # held for one page only, callers page through big ranges
+            return scan_page(self._committed_range(start, end), self.transactions.changes(), start, end, limit)
+
+    def load(self, records: List[Record]) -> int:
+        with self._lock:  # once per chunk, whatever its size
+            self._check_no_transaction("LOAD")
+            now = time.time()
+            changes: Dict[str, Optional[str]] = {}
+            expires: Dict[str, float] = {}
+            for key, value, deadline in records:
+                if deadline is None:
+                    changes[key] = value
+                    expires.pop(key, None)  # a later record of the same key wins
+                elif deadline > now:
+                    changes[key] = value
+                    expires[key] = deadline
+            if changes:
+                self._apply(changes, expires)
+            return len(changes)
+
+    def dump(self, cursor: Optional[str], limit: int) -> Tuple[List[Record], Optional[str]]:
+        self._build_index()
+        with self._lock:  # held for one chunk only, writers get in between chunks
+            self._check_no_transaction("DUMP")
+            now = time.time()
+            records: List[Record] = []
+            for key in self._index.irange(cursor, None):
+                if len(records) == limit:
+                    return records, key
+                deadline = self._expires.get(key)
+                if deadline is None or deadline > now:
+                    records.append((key, self._store[key], deadline))
+            return records, None
+
+    def start(self) -> None:
+        with self._lock:
+            self.transactions.begin()
+
+    def commit(self) -> None:
+        with self._lock:
+            txns = self.transactions
+            if len(txns) == 1 and txns.watch is not None:
+                dirty = txns.watch.dirty
+                self._unwatch(txns)
+                if dirty:
+                    txns.rollback()
+                    raise RuntimeError("Transaction conflict: a watched key changed, the transaction was rolled back.")
+            txn = txns.commit()
+            if txn:  # None for a nested transaction, folded into its parent
+                self._apply(txn)
 
     def rollback(self) -> None:
         with self._lock:
-            if not self.transactions:
-                raise RuntimeError("No active transaction to rollback.")
-            self.transactions.pop()
+            txns = self.transactions
+            txns.rollback()
+            if not txns:
+                self._unwatch(txns)
+
+    def add_listener(self, listener: Listener) -> None:
+        """Calls listener(changes, expires) with every committed change set, in commit order.
+
+        Listeners run with the store lock held, they must be quick and must not call the store.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def sweep_expired(self) -> int:
+        """Deletes keys whose deadline passed, at most sweep_batch per call, returns how many.
+
+        Only the due end of the heap is looked at, so the cost is O(expired keys), not O(keys).
+        """
+        with self._lock:
+            now = time.time()
+            heap = self._deadlines
+            expired: Dict[str, Optional[str]] = {}
+            for _ in range(self.sweep_batch):
+                if not heap or heap[0][0] > now:
+                    break
+                deadline, key = heapq.heappop(heap)
+                if self._expires.get(key) == deadline:  # otherwise the key was overwritten or got a new TTL since
+                    expired[key] = None
+            if expired:
+                self._apply(expired)
+            return len(expired)
+
+    def _apply(self, changes: Dict[str, Optional[str]], expires: Optional[Dict[str, float]] = None) -> None:
+        """Every write to the committed data goes through here, with the lock held.
+
+        A value of None deletes the key, writing a key drops its TTL. expires sets new deadlines.
+        Subclasses hook in here to see committed changes.
+        """
+        index = self._index
+        if self._index_changes is not None:
+            self._index_changes.update(changes)
+        for key, value in changes.items():
+            if value is None:
+                self._store.pop(key, None)
+                if index is not None:
+                    index.discard(key)
+            else:
+                self._store[key] = value
+                if index is not None:
+                    index.add(key)
+            if self._expires:
+                self._expires.pop(key, None)
+        if expires:
+            for key, deadline in expires.items():
+                self._expires[key] = deadline
+                heapq.heappush(self._deadlines, (deadline, key))
+            if len(self._deadlines) > 2 * len(self._expires) + 1024:
+                self._deadlines = [(deadline, key) for key, deadline in self._expires.items()]  # too many stale entries
+                heapq.heapify(self._deadlines)
+            if self._sweeper is None:
+                self._sweeper = Thread(target=KeyValueStore._sweep_periodically, args=(weakref.ref(self), self.sweep_interval), name="expiry", daemon=True)
+                self._sweeper.start()
+        if self._watches:
+            self._touch(changes, expires)
+        for listener in self._listeners:
+            listener(changes, expires)
+
+    def _touch(self, changes: Dict[str, Optional[str]], expires: Optional[Dict[str, float]]) -> None:
+        """Flags the watches on written keys (a new TTL counts), lock held."""
+        for key in [*changes, *(expires or ())]:
+            watches = self._watches.get(key)
+            if watches is not None:
+                for watch in watches:
+                    watch.dirty = True
+                if not watches:
+                    del self._watches[key]  # every session watching it is gone
+
+    def _unwatch(self, txns: TransactionStack) -> None:
+        watch, txns.watch = txns.watch, None
+        if watch is not None:
+            for key in watch.keys:
+                watches = self._watches.get(key)
+                if watches is not None:
+                    watches.discard(watch)
+                    if not watches:
+                        del self._watches[key]
+
+    def _build_index(self) -> None:
+        """Builds the sorted index of the keys the first time it's needed.
+
+        Only copying the keys holds the lock, O(n) but a C loop. The sort, the slow part, runs
+        without it while _apply notes the keys written meanwhile, which are then caught up with
+        the lock held again.
+        """
+        if self._index is not None:
+            return
+        with self._index_lock:
+            with self._lock:
+                if self._index is not None:
+                    return
+                keys = list(self._store)
+                changes = self._index_changes = set()
+            index = SortedKeys(keys)
+            with self._lock:
+                if self._index_changes is not changes:
+                    return  # the data was replaced meanwhile, the next scan builds it again
+                for key in changes:
+                    if key in self._store:
+                        index.add(key)
+                    else:
+                        index.discard(key)
+                self._index, self._index_changes = index, None
+
+    def _committed_range(self, start: Optional[str], end: Optional[str]) -> Iterator[Entry]:
+        now = time.time()
+        for key in self._index.irange(start, end):
+            deadline = self._expires.get(key)
+            if deadline is None or deadline > now:  # expired but not swept yet, can't delete while iterating
+                yield key, self._store[key]
+
+    def _expire_if_due(self, key: str) -> None:
+        """Lazy expiry, a key read after its deadline is deleted right away instead of waiting for the sweeper."""
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.time():
+            self._apply({key: None})
+
+    def _check_no_transaction(self, command: str = "Key expiry") -> None:
+        if self.transactions:
+            raise RuntimeError(f"{command} can't be used inside a transaction.")
 
+    @staticmethod
+    def _sweep_periodically(ref: "weakref.ref[KeyValueStore]", interval: float) -> None:
+        """Expires keys in small batches, releasing the lock in between, until the store is gone."""
+        while True:
+            time.sleep(interval)
+            store = ref()
+            if store is None:
+                return
+            while store.sweep_expired() == store.sweep_batch:
+                time.sleep(0)  # more are due, but let clients in first
+            del store  # don't keep the store alive while sleeping
@@ -1,5 +1,22 @@
+import re
+
 from abc import ABC, abstractmethod
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
+
+Record = Tuple[str, str, Optional[float]]  # key, value, deadline (wall clock) or None if it never expires
+
+INTEGER = re.compile(r"-?[0-9]+")  # what INCR takes, int() alone would also take " 5", "+5" or "1_000"
+
+def integer_value(key: str, value: Optional[str]) -> int:
+    """The integer stored at key for INCR, 0 if there is none."""
+    if value is None:
+        return 0
+    try:
+        if INTEGER.fullmatch(value):
+            return int(value)
+    except ValueError:
+        pass  # more digits than int() converts
+    raise RuntimeError(f"Value of {key} is not an integer.")
 
 class KeyValueStoreInterface(ABC):
     @abstractmethod
@@ -17,6 +34,63 @@ class KeyValueStoreInterface(ABC):
         """Removes a key from the store."""
         pass
 
+    @abstractmethod
+    def mget(self, keys: List[str]) -> List[Optional[str]]:
+        """Retrieves the values of several keys at once, None for the ones that do not exist."""
+        pass
+
+    @abstractmethod
+    def mput(self, items: Dict[str, str]) -> None:
+        """Stores several key-value pairs at once, atomically."""
+        pass
+
+    @abstractmethod
+    def mdelete(self, keys: List[str]) -> int:
+        """Removes several keys at once, atomically, and returns how many existed."""
+        pass
+
+    def put_ex(self, key: str, value: str, seconds: float) -> None:
+        """Stores a key-value pair that expires after the given number of seconds."""
+        raise NotImplementedError(f"{type(self).__name__} does not support key expiry.")
+
+    def expire(self, key: str, seconds: float) -> bool:
+        """Sets a key to expire after the given number of seconds, returns whether the key exists."""
+        raise NotImplementedError(f"{type(self).__name__} does not support key expiry.")
+
+    def ttl(self, key: str) -> int:
+        """Seconds left before a key expires, -1 if it never does, -2 if it does not exist."""
+        raise NotImplementedError(f"{type(self).__name__} does not support key expiry.")
+
+    def scan(self, start: Optional[str], end: Optional[str], limit: int) -> Tuple[List[Tuple[str, str]], Optional[str]]:
+        """Up to limit (key, value) pairs from start (included) to end (excluded) in key order, None
+        means unbounded, and the key to start the next page from (None once there is nothing left)."""
+        raise NotImplementedError(f"{type(self).__name__} does not support range scans.")
+
+    def cas(self, key: str, expected: str, value: str) -> bool:
+        """Sets key to value only if its current value is expected, returns whether it did."""
+        raise NotImplementedError(f"{type(self).__name__} does not support CAS.")
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        """Adds amount to the integer value of key (0 if it does not exist), returns the new value."""
+        raise NotImplementedError(f"{type(self).__name__} does not support INCR.")
+
+    def watch(self, keys: List[str]) -> None:
+        """Makes the next commit fail if any of keys is written by anybody else in the meantime."""
+        raise NotImplementedError(f"{type(self).__name__} does not support WATCH.")
+
+    def unwatch(self) -> None:
+        """Forgets the watched keys."""
+        raise NotImplementedError(f"{type(self).__name__} does not support WATCH.")
+
+    def load(self, records: List[Record]) -> int:
+        """Stores records at once, atomically, skipping the ones whose deadline passed, returns how many were stored."""
+        raise NotImplementedError(f"{type(self).__name__} does not support LOAD and DUMP.")
+
+    def dump(self, cursor: Optional[str], limit: int) -> Tuple[List[Record], Optional[str]]:
+        """Up to limit committed records in key order from cursor (included, None for the first key),
+        and the cursor of the next chunk (None once there is nothing left)."""
+        raise NotImplementedError(f"{type(self).__name__} does not support LOAD and DUMP.")
+
     @abstractmethod
     def start(self) -> None:
         """Starts a new transaction."""
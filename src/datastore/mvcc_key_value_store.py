@@ -0,0 +1,213 @@
+from threading import Lock, RLock
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.datastore.kv_store_interface import KeyValueStoreInterface
+from src.datastore.session import current_session
+from src.datastore.transactions import MISSING, TransactionStack
+
+Version = Tuple[int, Optional[str]]  # (commit timestamp, value), a None value is a delete
+
+class MVCCTransactions(TransactionStack):
+    """A session's transaction stack, plus the snapshot its outermost transaction reads from."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.snapshot: Optional[int] = None
+
+class MVCCKeyValueStore(KeyValueStoreInterface):
+    """Multi version store with snapshot isolated transactions.
+
+    Every key keeps the versions committed at each timestamp. A transaction reads the data as
+    of the timestamp it started at, without taking any lock, and buffers its writes. Committing
+    fails if another client committed one of the same keys in the meantime (first committer
+    wins), instead of silently overwriting it. Versions nobody can read anymore are collected
+    as transactions finish, so long transactions never block or slow down other clients.
+    """
+
+    def __init__(self, gc_every: int = 1000) -> None:
+        self._versions: Dict[str, List[Version]] = {}
+        self._clock: int = 0  # timestamp of the latest commit, published once its versions are all in place
+        self._commit_lock = RLock()  # one writer at a time, readers never take it
+        self._active_lock = Lock()
+        self._active: Dict[int, int] = {}  # snapshot timestamp -> number of transactions reading it
+        self._garbage: Set[str] = set()  # keys that may have versions nobody can read anymore
+        self._collected_at: int = -1  # horizon of the last collection
+        self.gc_every: int = gc_every
+
+    @property
+    def transactions(self) -> MVCCTransactions:
+        return current_session().state(self, MVCCTransactions)
+
+    def _read(self, key: str, snapshot: int) -> Optional[str]:
+        versions = self._versions.get(key)
+        if not versions:
+            return None
+        for i in range(len(versions) - 1, -1, -1):  # newest first, only ever appended to or replaced
+            timestamp, value = versions[i]
+            if timestamp <= snapshot:
+                return value
+        return None
+
+    def _read_latest(self, key: str) -> Optional[str]:
+        versions = self._versions.get(key)
+        return versions[-1][1] if versions else None  # a commit appends its versions only once it can't fail
+
+    def _visible(self, key: str, txns: MVCCTransactions) -> Optional[str]:
+        value = txns.lookup(key)
+        if value is not MISSING:
+            return value
+        if txns.snapshot is None:
+            return self._read_latest(key)
+        return self._read(key, txns.snapshot)
+
+    def put(self, key: str, value: str) -> None:
+        txns = self.transactions
+        if txns:
+            txns.write(key, value)
+        else:
+            self._commit({key: value})
+
+    def get(self, key: str) -> Optional[str]:
+        return self._visible(key, self.transactions)
+
+    def delete(self, key: str) -> bool:
+        txns = self.transactions
+        if txns:
+            if self._visible(key, txns) is not None:
+                txns.write(key, None)
+                return True
+            return False
+        with self._commit_lock:
+            if self._read_latest(key) is None:
+                return False
+            self._commit({key: None})
+            return True
+
+    def mget(self, keys: List[str]) -> List[Optional[str]]:
+        txns = self.transactions
+        snapshot = txns.snapshot if txns.snapshot is not None else self._acquire_snapshot()
+        try:
+            values: List[Optional[str]] = []
+            for key in keys:  # one snapshot for the whole batch, it never sees half a commit
+                value = txns.lookup(key)
+                values.append(self._read(key, snapshot) if value is MISSING else value)
+            return values
+        finally:
+            if txns.snapshot is None:
+                self._release_snapshot(snapshot)
+
+    def mput(self, items: Dict[str, str]) -> None:
+        txns = self.transactions
+        if txns:
+            for key, value in items.items():
+                txns.write(key, value)
+        elif items:
+            self._commit(dict(items))
+
+    def mdelete(self, keys: List[str]) -> int:
+        txns = self.transactions
+        if txns:
+            existing = {key for key in keys if self._visible(key, txns) is not None}
+            for key in existing:
+                txns.write(key, None)
+            return len(existing)
+        with self._commit_lock:
+            changes: Dict[str, Optional[str]] = {key: None for key in keys if self._read_latest(key) is not None}
+            if changes:
+                self._commit(changes)
+            return len(changes)
+
+    def start(self) -> None:
+        txns = self.transactions
+        if not txns:
+            txns.snapshot = self._acquire_snapshot()
+        txns.begin()
+
+    def commit(self) -> None:
+        txns = self.transactions
+        changes = txns.commit()
+        if txns:
+            return  # nested transaction, folded into its parent
+
+        try:
+            if changes:
+                self._commit(changes, txns.snapshot)
+        finally:
+            self._finish(txns)  # only now, GC must keep the versions the conflict check looks at
+
+    def rollback(self) -> None:
+        txns = self.transactions
+        txns.rollback()
+        if not txns:
+            self._finish(txns)
+
+    def _finish(self, txns: MVCCTransactions) -> None:
+        """Releases the snapshot of a session whose outermost transaction ended."""
+        snapshot = txns.snapshot
+        txns.snapshot = None
+        self._release_snapshot(snapshot)
+
+    def _acquire_snapshot(self) -> int:
+        """Latest commit timestamp, registered so that garbage collection keeps what it can see."""
+        with self._active_lock:
+            snapshot = self._clock
+            self._active[snapshot] = self._active.get(snapshot, 0) + 1
+            return snapshot
+
+    def _release_snapshot(self, snapshot: int) -> None:
+        with self._active_lock:
+            self._active[snapshot] -= 1
+            if not self._active[snapshot]:
+                del self._active[snapshot]
+
+    def _commit(self, changes: Dict[str, Optional[str]], snapshot: Optional[int] = None) -> None:
+        """Installs changes as one new version, snapshot is the one the writes were based on (None: latest)."""
+        with self._commit_lock:
+            if snapshot is not None:
+                for key in changes:
+                    versions = self._versions.get(key)
+                    if versions and versions[-1][0] > snapshot:
+                        raise RuntimeError(f"Transaction conflict: '{key}' was modified by another client, transaction rolled back.")
+
+            timestamp = self._clock + 1
+            for key, value in changes.items():
+                versions = self._versions.get(key)
+                if versions is None:
+                    self._versions[key] = [(timestamp, value)]
+                else:
+                    versions.append((timestamp, value))
+                    self._garbage.add(key)
+                if value is None:
+                    self._garbage.add(key)  # the tombstone itself goes once nobody can see the old value
+            self._clock = timestamp  # readers see the whole commit from here on, or none of it
+
+            if len(self._garbage) >= self.gc_every and self._horizon() > self._collected_at:
+                self.collect_garbage()  # only when something became unreachable since last time
+
+    def _horizon(self) -> int:
+        """Oldest snapshot still being read, versions older than the one visible there are unreachable."""
+        with self._active_lock:
+            return min(self._active, default=self._clock)
+
+    def collect_garbage(self) -> None:
+        """Drops the versions no running or future transaction can read."""
+        with self._commit_lock:
+            horizon = self._collected_at = self._horizon()
+            for key in list(self._garbage):
+                versions = self._versions.get(key)
+                if versions is None:
+                    self._garbage.discard(key)
+                    continue
+                keep = 0
+                for i in range(len(versions) - 1, -1, -1):
+                    if versions[i][0] <= horizon:
+                        keep = i  # newest version visible at the horizon, older ones are unreachable
+                        break
+                if keep == len(versions) - 1 and versions[keep][1] is None:
+                    del self._versions[key]  # only a tombstone everybody can see is left
+                    self._garbage.discard(key)
+                    continue
+                if keep:
+                    self._versions[key] = versions[keep:]  # replaced, never trimmed in place, for lock free readers
+                if len(self._versions[key]) == 1 and self._versions[key][0][1] is not None:
+                    self._garbage.discard(key)
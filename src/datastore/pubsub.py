@@ -0,0 +1,215 @@
+import threading
+import weakref
+
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from src.datastore.key_value_store import KeyValueStore
+from src.datastore.session import current_session
+from src.model.response import Response
+
+MAX_PENDING_EVENTS = 1000  # per subscriber, past that it's disconnected as a slow consumer
+MAX_QUEUED_CHANGES = 10_000  # change sets waiting for the dispatcher, past that every subscriber is dropped
+
+Changes = Dict[str, Optional[str]]
+
+class Subscription:
+    """The keys and prefixes one client subscribed to, and the events waiting to be sent to it.
+
+    Events are pushed by the hub's dispatcher thread, push never blocks: it appends to a bounded
+    buffer and calls wake, the server then drains the buffer to the client. A client that lets
+    max_pending events pile up is too slow, its subscription is closed and the server disconnects
+    it rather than buffering without bound.
+    """
+
+    def __init__(self, wake: Callable[[], None], max_pending: int = MAX_PENDING_EVENTS) -> None:
+        self.keys: Set[str] = set()
+        self.prefixes: Set[str] = set()
+        self.max_pending: int = max_pending
+        self.closed: bool = False
+        self._wake = wake
+        self._pending: Deque[bytes] = deque()
+        self._lock = threading.Lock()
+
+    def push(self, event: bytes) -> None:
+        with self._lock:
+            if self.closed:
+                return
+            if len(self._pending) >= self.max_pending:
+                self.closed = True  # slow consumer, the server disconnects it once woken
+            else:
+                self._pending.append(event)
+        self._wake()
+
+    def drop(self) -> None:
+        """Closes the subscription as too slow, the server disconnects the client once woken."""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+        self._wake()
+
+    def drain(self) -> bytes:
+        """Every pending event, as the encoded lines to send."""
+        with self._lock:
+            events = b"".join(self._pending)
+            self._pending.clear()
+            return events
+
+    def close(self) -> None:
+        """Stops pushing to this subscription, call it when the client disconnects."""
+        with self._lock:
+            self.closed = True
+            self._pending.clear()
+
+class PubSub:
+    """Pushes the changes committed to a store to the subscriptions matching their keys.
+
+    A subscription pattern is a key, or a prefix when it ends with *. Every committed change set
+    (a PUT, a DEL, an expired key, a whole transaction) is one event per matching subscription:
+
+        {"status": "Event", "result": {"<key>": "<new value>" or null when deleted, ...}}
+
+    With the store lock held, the writer only appends its change set to a bounded queue. A
+    dispatcher thread matches the keys (a dict lookup per changed key for exact keys, every
+    distinct prefix checked against every changed key), encodes each distinct event once and
+    pushes it. If the dispatcher falls MAX_QUEUED_CHANGES behind, events would be lost: every
+    subscriber is dropped instead, to reconnect and read the keys again. Subscriptions are held
+    weakly, like watches: a client that goes away is forgotten with its session.
+    """
+
+    def __init__(self, store: KeyValueStore, max_pending: int = MAX_PENDING_EVENTS, max_queued: int = MAX_QUEUED_CHANGES) -> None:
+        self.max_pending: int = max_pending
+        self.max_queued: int = max_queued
+        self._lock = threading.Lock()
+        self._keys: Dict[str, "weakref.WeakSet[Subscription]"] = {}
+        self._prefixes: Dict[str, "weakref.WeakSet[Subscription]"] = {}
+        self._queue: Deque[Changes] = deque()  # appended to under the store lock, popped by the dispatcher
+        self._overflowed: bool = False
+        self._ready = threading.Event()
+        self._idle = threading.Condition()
+        self._queued: int = 0  # change sets published, dispatched and lost to an overflow so far
+        self._dispatched: int = 0
+        self._lost: int = 0
+        self._dispatcher: Optional[threading.Thread] = None
+        store.add_listener(self._publish)
+
+    def subscribe(self, patterns: Iterable[str]) -> int:
+        """Subscribes the current session to patterns, returns how many it's subscribed to."""
+        session = current_session()
+        if session.wake is None:
+            raise RuntimeError("SUBSCRIBE isn't supported on this connection.")
+        if session.subscription is None or session.subscription.closed:
+            session.subscription = Subscription(session.wake, self.max_pending)
+        subscription: Subscription = session.subscription
+        with self._lock:
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=PubSub._dispatch_forever, args=(weakref.ref(self),), name="pubsub", daemon=True)
+                self._dispatcher.start()
+            for pattern in patterns:
+                if pattern.endswith("*"):
+                    subscription.prefixes.add(pattern[:-1])
+                    self._prefixes.setdefault(pattern[:-1], weakref.WeakSet()).add(subscription)
+                else:
+                    subscription.keys.add(pattern)
+                    self._keys.setdefault(pattern, weakref.WeakSet()).add(subscription)
+            return len(subscription.keys) + len(subscription.prefixes)
+
+    def unsubscribe(self, patterns: Optional[List[str]] = None) -> int:
+        """Unsubscribes the current session from patterns, or from everything, returns how many are left."""
+        subscription: Optional[Subscription] = current_session().subscription
+        if subscription is None:
+            return 0
+        with self._lock:
+            if patterns is None:
+                patterns = [*subscription.keys, *(prefix + "*" for prefix in subscription.prefixes)]
+            for pattern in patterns:
+                if pattern.endswith("*"):
+                    subscription.prefixes.discard(pattern[:-1])
+                    self._discard(self._prefixes, pattern[:-1], subscription)
+                else:
+                    subscription.keys.discard(pattern)
+                    self._discard(self._keys, pattern, subscription)
+            return len(subscription.keys) + len(subscription.prefixes)
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Waits until every change set committed so far was dispatched, False on timeout."""
+        target = self._queued
+        with self._idle:
+            return self._idle.wait_for(lambda: self._dispatched + self._lost >= target, timeout)
+
+    @staticmethod
+    def _discard(index: Dict[str, "weakref.WeakSet[Subscription]"], pattern: str, subscription: Subscription) -> None:
+        subscriptions = index.get(pattern)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del index[pattern]
+
+    def _publish(self, changes: Changes, expires: Optional[Dict[str, float]]) -> None:
+        """Store listener, runs with the store lock held: queues the change set and nothing else."""
+        if not changes or (not self._keys and not self._prefixes):
+            return
+        self._queued += 1  # the store lock orders writers
+        if len(self._queue) >= self.max_queued:
+            self._overflowed = True
+            self._lost += 1
+        else:
+            self._queue.append(changes)  # change sets aren't modified once applied
+        self._ready.set()
+
+    @staticmethod
+    def _dispatch_forever(ref: "weakref.ref[PubSub]") -> None:
+        """Dispatches queued change sets until the hub is gone."""
+        while True:
+            hub = ref()
+            if hub is None:
+                return
+            ready = hub._ready
+            del hub  # not kept alive while waiting
+            if not ready.wait(1.0):
+                continue
+            hub = ref()
+            if hub is None:
+                return
+            hub._dispatch()
+            del hub
+
+    def _dispatch(self) -> None:
+        self._ready.clear()  # before looking at the queue, a change set queued from now on sets it again
+        while self._queue:
+            self._fan_out(self._queue.popleft())
+            with self._idle:
+                self._dispatched += 1
+                self._idle.notify_all()
+        if self._overflowed:
+            self._overflowed = False
+            with self._lock:
+                dropped = {subscription for index in (self._keys, self._prefixes) for subscriptions in index.values() for subscription in subscriptions}
+            for subscription in dropped:
+                subscription.drop()
+            with self._idle:
+                self._idle.notify_all()
+
+    def _fan_out(self, changes: Changes) -> None:
+        matches: Dict[Subscription, List[Tuple[str, ...]]] = {}  # keys matched by each pattern of a subscription
+        with self._lock:
+            for key in changes:
+                for subscription in self._keys.get(key, ()):
+                    matches.setdefault(subscription, []).append((key,))
+            for prefix, subscriptions in self._prefixes.items():
+                keys = tuple(key for key in changes if key.startswith(prefix))
+                if keys:
+                    for subscription in subscriptions:
+                        matches.setdefault(subscription, []).append(keys)
+        events: Dict[Tuple[str, ...], bytes] = {}  # encoded once per distinct set of keys
+        for subscription, matched in matches.items():
+            if len(matched) == 1:
+                keys = matched[0]
+            else:  # several patterns matched, merged in commit order so identical events share their encoding
+                wanted = {key for part in matched for key in part}
+                keys = tuple(key for key in changes if key in wanted)
+            event = events.get(keys)
+            if event is None:
+                event = events[keys] = Response("Event", {key: changes[key] for key in keys}).encode()
+            subscription.push(event)
@@ -0,0 +1,226 @@
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from src.datastore.key_value_store import KeyValueStore
+from src.datastore.kv_store_interface import Record
+
+# Replication stream, JSON lines over TCP:
+#   replica -> primary  {"id": <replication id or null>, "offset": <last applied offset>}
+#   primary -> replica  {"partial": <offset>, "id": ...}            when the backlog still has what comes after offset
+#                       {"full": <offset>, "id": ...}, then {"data": {...}} chunks and one final {"expires": {...}}
+#                       then forever: {"offset": n, "changes": {...}, "expires": {...} or null}
+# Offsets count the change sets committed on the primary since it started, the replication
+# id changes with every start of the primary, so a replica never resumes against other data.
+SNAPSHOT_CHUNK = 1000
+
+def _line(message: Dict[str, Any]) -> bytes:
+    return (json.dumps(message) + "\n").encode("utf-8")
+
+class ReplicationSource:
+    """Streams the committed change sets of a primary store to its replicas.
+
+    Every change set is encoded once, when it's committed, into a bounded backlog. A
+    reconnecting replica resumes from its offset if the backlog still covers it, any other
+    replica first gets a copy of the data. A replica falling further behind than the backlog
+    is disconnected, and resynchronizes when it reconnects.
+    """
+
+    def __init__(self, store: KeyValueStore, host: str = "127.0.0.1", port: int = 0, backlog_size: int = 100_000) -> None:
+        self.store: KeyValueStore = store
+        self.id: str = os.urandom(8).hex()
+        self.offset: int = 0  # of the latest change set
+        self._backlog: Deque[Tuple[int, bytes]] = deque(maxlen=backlog_size)  # (offset, encoded record), contiguous offsets
+        self._changed = threading.Condition()
+        self._closed: bool = False
+        self.server_socket: socket.socket = socket.create_server((host, port))
+        self.port: int = self.server_socket.getsockname()[1]
+        store.add_listener(self._record)
+
+    def serve_forever(self) -> None:
+        """Accepts replicas until closed, one thread per replica."""
+        logging.info(f"Replication source {self.id} listening on port {self.port}")
+        while True:
+            try:
+                replica, address = self.server_socket.accept()
+            except OSError:
+                break  # closed
+            threading.Thread(target=self._serve, args=(replica, address), name="replication", daemon=True).start()
+
+    def close(self) -> None:
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+        self.server_socket.close()
+
+    def _record(self, changes: Dict[str, Optional[str]], expires: Optional[Dict[str, float]]) -> None:
+        """Store listener, called with the store lock held, so in commit order."""
+        with self._changed:
+            self.offset += 1
+            self._backlog.append((self.offset, _line({"offset": self.offset, "changes": changes, "expires": expires})))
+            self._changed.notify_all()
+
+    def _covers(self, offset: int) -> bool:
+        """Whether everything after offset is still in the backlog."""
+        if offset == self.offset:
+            return True
+        return bool(self._backlog) and self._backlog[0][0] <= offset + 1 <= self.offset
+
+    def _serve(self, replica: socket.socket, address: Tuple[str, int]) -> None:
+        try:
+            with replica:
+                hello = json.loads(replica.makefile("rb").readline())
+                with self._changed:
+                    offset = hello["offset"] if hello.get("id") == self.id and self._covers(hello["offset"]) else None
+                if offset is None:
+                    offset = self._send_snapshot(replica)
+                    logging.info(f"Replica {address} fully synchronized at offset {offset}")
+                else:
+                    replica.sendall(_line({"partial": offset, "id": self.id}))
+                    logging.info(f"Replica {address} resumed from offset {offset}")
+                self._stream(replica, offset)
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Replica {address} disconnected: {e}")
+
+    def _send_snapshot(self, replica: socket.socket) -> int:
+        with self.store._lock:  # the copy and its offset must match, no commit in between
+            data = self.store._store.copy()
+            expires = dict(self.store._expires)
+            with self._changed:
+                offset = self.offset
+        replica.sendall(_line({"full": offset, "id": self.id}))
+        items = iter(data.items())
+        while True:
+            chunk = dict(itertools.islice(items, SNAPSHOT_CHUNK))
+            if not chunk:
+                break
+            replica.sendall(_line({"data": chunk}))
+        replica.sendall(_line({"expires": expires}))
+        return offset
+
+    def _stream(self, replica: socket.socket, offset: int) -> None:
+        while True:
+            with self._changed:
+                while self.offset == offset and not self._closed:
+                    self._changed.wait()
+                if self._closed:
+                    return
+                if not self._covers(offset):
+                    raise ValueError(f"fell behind the backlog at offset {offset}")
+                first = self._backlog[0][0]
+                records: List[bytes] = [record for _, record in itertools.islice(self._backlog, offset + 1 - first, None)]
+                offset = self.offset
+            replica.sendall(b"".join(records))  # outside the lock, a slow replica doesn't hold up commits
+
+class ReplicaKeyValueStore(KeyValueStore):
+    """Read only copy of a primary's data, kept up to date by a background thread.
+
+    Reads (and read only transactions) are served locally, writes are refused. The thread
+    reconnects whenever the stream breaks and resumes from the last applied offset.
+    """
+
+    READ_ONLY = "This server is a read only replica, send writes to the primary."
+
+    def __init__(self, primary: Tuple[str, int], retry_interval: float = 1.0) -> None:
+        super().__init__()
+        self.primary: Tuple[str, int] = primary
+        self.retry_interval: float = retry_interval
+        self.replication_id: Optional[str] = None
+        self.offset: int = 0
+        self.synced = threading.Event()  # set once the first synchronization completed
+        self._closed = threading.Event()
+        self._socket: Optional[socket.socket] = None
+        threading.Thread(target=self._replicate, name="replica", daemon=True).start()
+
+    def put(self, key: str, value: str) -> None:
+        raise RuntimeError(self.READ_ONLY)
+
+    def delete(self, key: str) -> bool:
+        raise RuntimeError(self.READ_ONLY)
+
+    def mput(self, items: Dict[str, str]) -> None:
+        raise RuntimeError(self.READ_ONLY)
+
+    def mdelete(self, keys: List[str]) -> int:
+        raise RuntimeError(self.READ_ONLY)
+
+    def put_ex(self, key: str, value: str, seconds: float) -> None:
+        raise RuntimeError(self.READ_ONLY)
+
+    def expire(self, key: str, seconds: float) -> bool:
+        raise RuntimeError(self.READ_ONLY)
+
+    def cas(self, key: str, expected: str, value: str) -> bool:
+        raise RuntimeError(self.READ_ONLY)
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        raise RuntimeError(self.READ_ONLY)
+
+    def load(self, records: List[Record]) -> int:
+        raise RuntimeError(self.READ_ONLY)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "role": "replica",
+            "primary": f"{self.primary[0]}:{self.primary[1]}",
+            "replication_id": self.replication_id,
+            "offset": self.offset,
+            "connected": self._socket is not None,
+        }
+
+    def close(self) -> None:
+        self._closed.set()
+        if self._socket is not None:
+            self._socket.shutdown(socket.SHUT_RDWR)
+
+    def _replicate(self) -> None:
+        while not self._closed.is_set():
+            try:
+                with socket.create_connection(self.primary) as primary:
+                    self._socket = primary
+                    self._follow(primary)
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"Replication from {self.primary} interrupted: {e}")
+            finally:
+                self._socket = None
+            self._closed.wait(self.retry_interval)
+
+    def _follow(self, primary: socket.socket) -> None:
+        primary.sendall(_line({"id": self.replication_id, "offset": self.offset}))
+        stream = primary.makefile("rb")
+        header = json.loads(stream.readline())
+        if "full" in header:
+            data: Dict[str, str] = {}
+            while True:
+                message = json.loads(stream.readline())
+                if "data" not in message:
+                    break
+                data.update(message["data"])
+            with self._lock:
+                self._load(data, message["expires"])
+                self.replication_id, self.offset = header["id"], header["full"]
+        else:
+            self.replication_id = header["id"]
+        self.synced.set()
+
+        for line in stream:  # until the primary goes away
+            record = json.loads(line)
+            with self._lock:
+                self._apply(record["changes"], record["expires"])
+                self.offset = record["offset"]
+
+    def _load(self, data: Dict[str, str], expires: Dict[str, float]) -> None:
+        """Replaces the whole data set with the primary's, lock held."""
+        self._store = data
+        self._expires = {}
+        self._deadlines = []
+        self._index = None  # rebuilt by the next scan
+        self._index_changes = None  # a build in progress sorted the old keys
+        if expires:
+            self._apply({}, expires)
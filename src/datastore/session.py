@@ -0,0 +1,39 @@
+import weakref
+
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+class Session:
+    """Per-connection state (open transactions, etc.) for every store a client talks to."""
+
+    def __init__(self) -> None:
+        self._state: "weakref.WeakKeyDictionary[Any, Any]" = weakref.WeakKeyDictionary()
+        self.wake: Optional[Callable[[], None]] = None  # set by servers that can push to the client, see PubSub
+        self.subscription: Optional[Any] = None  # the client's Subscription, once it subscribed
+
+    def state(self, owner: Any, factory: Callable[[], Any]) -> Any:
+        """Returns the state this session holds for owner, creating it with factory if needed."""
+        try:
+            return self._state[owner]
+        except KeyError:
+            value = self._state[owner] = factory()
+            return value
+
+_current: ContextVar[Session] = ContextVar("hatch_kvs_session")
+
+def current_session() -> Session:
+    """Returns the session bound to the running thread or asyncio task, creating one if needed.
+
+    A context variable (rather than threading.local) is used so that both the
+    thread-per-connection server and the asyncio server get one session per client.
+    """
+    session = _current.get(None)
+    if session is None:
+        session = new_session()
+    return session
+
+def new_session() -> Session:
+    """Binds a fresh session to the current context, call this when a client connects."""
+    session = Session()
+    _current.set(session)
+    return session
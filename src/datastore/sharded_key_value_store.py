@@ -0,0 +1,121 @@
+from contextlib import ExitStack
+from threading import RLock
+from typing import Dict, List, Optional
+
+from src.datastore.kv_store_interface import KeyValueStoreInterface
+from src.datastore.session import current_session
+from src.datastore.transactions import MISSING, TransactionStack
+
+class ShardedKeyValueStore(KeyValueStoreInterface):
+    """Same semantics as KeyValueStore, but keys are hashed into independently locked shards.
+
+    Clients working on unrelated keys no longer wait on one global lock. Transactions are
+    buffered per session exactly like in KeyValueStore, and committing one takes the locks
+    of every shard it touches, always in shard order so two commits can't deadlock.
+    """
+
+    def __init__(self, shards: int = 16) -> None:
+        if shards < 1:
+            raise ValueError("A sharded store needs at least one shard.")
+        self._shards: List[Dict[str, str]] = [{} for _ in range(shards)]
+        self._locks: List[RLock] = [RLock() for _ in range(shards)]
+
+    @property
+    def transactions(self) -> TransactionStack:
+        return current_session().state(self, TransactionStack)
+
+    def _shard_of(self, key: str) -> int:
+        return hash(key) % len(self._shards)
+
+    def put(self, key: str, value: str) -> None:
+        txns = self.transactions
+        if txns:
+            txns.write(key, value)
+            return
+        shard = self._shard_of(key)
+        with self._locks[shard]:
+            self._shards[shard][key] = value
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.transactions.lookup(key)
+        if value is not MISSING:
+            return value
+        shard = self._shard_of(key)
+        with self._locks[shard]:
+            return self._shards[shard].get(key)
+
+    def delete(self, key: str) -> bool:
+        txns = self.transactions
+        if txns:
+            if self.get(key) is not None:
+                txns.write(key, None)
+                return True
+            return False
+        shard = self._shard_of(key)
+        with self._locks[shard]:
+            return self._shards[shard].pop(key, None) is not None
+
+    def mget(self, keys: List[str]) -> List[Optional[str]]:
+        txns = self.transactions
+        values: List[Optional[str]] = [txns.lookup(key) for key in keys]
+        by_shard: Dict[int, List[int]] = {}
+        for i, (key, value) in enumerate(zip(keys, values)):
+            if value is MISSING:
+                by_shard.setdefault(self._shard_of(key), []).append(i)
+
+        with ExitStack() as stack:
+            for shard in sorted(by_shard):  # every involved shard at once, in _apply's order: never half a commit
+                stack.enter_context(self._locks[shard])
+            for shard, positions in by_shard.items():
+                data = self._shards[shard]
+                for i in positions:
+                    values[i] = data.get(keys[i])
+        return values
+
+    def mput(self, items: Dict[str, str]) -> None:
+        txns = self.transactions
+        if txns:
+            for key, value in items.items():
+                txns.write(key, value)
+        else:
+            self._apply(dict(items))
+
+    def mdelete(self, keys: List[str]) -> int:
+        txns = self.transactions
+        if txns:
+            existing = {key for key, value in zip(keys, self.mget(keys)) if value is not None}
+            for key in existing:
+                txns.write(key, None)
+            return len(existing)
+        return self._apply(dict.fromkeys(keys))
+
+    def start(self) -> None:
+        self.transactions.begin()
+
+    def commit(self) -> None:
+        txn = self.transactions.commit()
+        if not txn:
+            return  # nested transaction folded into its parent, or nothing to write
+        self._apply(txn)
+
+    def rollback(self) -> None:
+        self.transactions.rollback()
+
+    def _apply(self, changes: Dict[str, Optional[str]]) -> int:
+        """Applies changes atomically across shards (None deletes), returns how many keys were deleted."""
+        by_shard: Dict[int, Dict[str, Optional[str]]] = {}
+        for key, value in changes.items():
+            by_shard.setdefault(self._shard_of(key), {})[key] = value
+
+        deleted = 0
+        with ExitStack() as stack:
+            for shard in sorted(by_shard):  # global lock order, no deadlocks between commits
+                stack.enter_context(self._locks[shard])
+            for shard, shard_changes in by_shard.items():
+                data = self._shards[shard]
+                for key, value in shard_changes.items():
+                    if value is None:
+                        deleted += data.pop(key, None) is not None
+                    else:
+                        data[key] = value
+        return deleted
@@ -0,0 +1,203 @@
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+from array import array
+from typing import Dict, Iterable, Iterator, List, MutableMapping, Optional, Set, Tuple
+
+# Layout of a snapshot file, everything little endian:
+#   header:  magic, version, number of keys, number of index slots, offset of the index
+#   records: (key length u32, value length u32, key, value) sorted by key
+#   index:   open addressing hash table of (crc32 of the key u64, record offset u64), offset 0 = empty slot
+HEADER = struct.Struct("<4sIQQQ")
+RECORD = struct.Struct("<II")
+SLOT = struct.Struct("<QQ")
+MAGIC = b"HKVS"
+VERSION = 1
+
+def snapshot_path(directory: str, generation: int) -> str:
+    return os.path.join(directory, f"snapshot-{generation:08d}.bin")
+
+def list_snapshots(directory: str) -> List[int]:
+    """Generations of the complete snapshots found in directory, oldest first."""
+    return sorted(
+        int(name[len("snapshot-"):-len(".bin")])
+        for name in os.listdir(directory)
+        if name.startswith("snapshot-") and name.endswith(".bin")
+    )
+
+def _encode(text: str) -> bytes:
+    return text.encode("utf-8", errors="surrogatepass")
+
+def _decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="surrogatepass")
+
+def write_snapshot(directory: str, generation: int, items: Iterable[Tuple[str, str]]) -> str:
+    """Writes every key/value pair to the snapshot of the given generation, atomically.
+
+    Snapshot N holds the data as it was right before write ahead log segment N started.
+    """
+    records = sorted((_encode(key), _encode(value)) for key, value in items)
+    slots = 1
+    while slots < 2 * len(records):  # at most half full, so probe sequences stay short
+        slots *= 2
+
+    index = array("Q", bytes(16 * slots))
+    path = snapshot_path(directory, generation)
+    tmp_path = path + ".tmp"  # half written snapshots never look like real ones
+    with open(tmp_path, "wb") as f:
+        f.write(bytes(HEADER.size))  # filled in once we know where the index starts
+        offset = HEADER.size
+        for key, value in records:
+            f.write(RECORD.pack(len(key), len(value)))
+            f.write(key)
+            f.write(value)
+
+            hashed = zlib.crc32(key)
+            slot = hashed & (slots - 1)
+            while index[2 * slot + 1]:
+                slot = (slot + 1) & (slots - 1)
+            index[2 * slot] = hashed
+            index[2 * slot + 1] = offset
+            offset += RECORD.size + len(key) + len(value)
+
+        if sys.byteorder != "little":
+            index.byteswap()
+        index.tofile(f)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(records), slots, offset))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_directory(directory)
+    return path
+
+class MappedSnapshot:
+    """Read only view of a snapshot file through mmap.
+
+    Opening one costs the same whatever the size of the snapshot, pages are only read from
+    disk when a lookup (or iteration) touches them.
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._count, self._slots, self._index = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} snapshot.")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, key: str) -> Optional[str]:
+        encoded = _encode(key)
+        hashed = zlib.crc32(encoded)
+        mask = self._slots - 1
+        slot = hashed & mask
+        while True:
+            stored_hash, offset = SLOT.unpack_from(self._map, self._index + 16 * slot)
+            if not offset:
+                return None
+            if stored_hash == hashed:
+                key_size, value_size = RECORD.unpack_from(self._map, offset)
+                start = offset + RECORD.size
+                if self._map[start:start + key_size] == encoded:
+                    return _decode(self._map[start + key_size:start + key_size + value_size])
+            slot = (slot + 1) & mask
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        """Every pair, in key order."""
+        offset = HEADER.size
+        while offset < self._index:
+            key_size, value_size = RECORD.unpack_from(self._map, offset)
+            start = offset + RECORD.size
+            yield _decode(self._map[start:start + key_size]), _decode(self._map[start + key_size:start + key_size + value_size])
+            offset = start + key_size + value_size
+
+    def close(self) -> None:
+        self._map.close()
+
+def read_snapshot(directory: str, generation: int) -> Iterator[Tuple[str, str]]:
+    snapshot = MappedSnapshot(snapshot_path(directory, generation))
+    try:
+        yield from snapshot.items()
+    finally:
+        snapshot.close()
+
+class SnapshotOverlay(MutableMapping):
+    """Dictionary of the data, backed by a mapped snapshot and only holding what changed since.
+
+    Values are faulted in from the snapshot the first time they're read, so a server restarted
+    from a snapshot of millions of keys can answer its first request right away.
+    """
+
+    def __init__(self, base: MappedSnapshot, data: Optional[Dict[str, str]] = None, deleted: Optional[Set[str]] = None, size: Optional[int] = None) -> None:
+        self._base: MappedSnapshot = base
+        self._data: Dict[str, str] = data if data is not None else {}  # written or faulted in
+        self._deleted: Set[str] = deleted if deleted is not None else set()  # deleted keys the snapshot still has
+        self._size: int = len(base) if size is None else size
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        try:
+            return self._data[key]
+        except KeyError:
+            pass
+        if key in self._deleted:
+            return default
+        value = self._base.get(key)
+        if value is None:
+            return default
+        self._data[key] = value  # fault in, the next read is a plain dict lookup
+        return value
+
+    def __getitem__(self, key: str) -> str:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self.get(key) is not None
+
+    def __setitem__(self, key: str, value: str) -> None:
+        if key not in self:
+            self._size += 1
+        self._data[key] = value
+        self._deleted.discard(key)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self._size -= 1
+        del self._data[key]  # present in _data now that __contains__ faulted it in
+        if self._base.get(key) is not None:
+            self._deleted.add(key)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[str]:
+        yield from list(self._data)
+        for key, _ in self._base.items():
+            if key not in self._data and key not in self._deleted:
+                yield key
+
+    def items(self) -> Iterator[Tuple[str, str]]:  # type: ignore[override]
+        yield from list(self._data.items())
+        for key, value in self._base.items():
+            if key not in self._data and key not in self._deleted:
+                yield key, value
+
+    def copy(self) -> "SnapshotOverlay":
+        """Point in time copy, only what changed since the snapshot is actually copied."""
+        return SnapshotOverlay(self._base, dict(self._data), set(self._deleted), self._size)
+
+def _fsync_directory(directory: str) -> None:
+    """The rename itself is only durable once the directory entry is on disk."""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,132 @@
+import sys
+
+from bisect import bisect_left
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+Entry = Tuple[str, str]
+
+class SortedKeys:
+    """Sorted set of keys, stored as a list of sorted chunks (the layout of sortedcontainers).
+
+    Adding or removing a key is a binary search plus an insert into one chunk of at most
+    2 * chunk_size keys, which stays cheap at millions of keys where a single sorted list
+    would move everything after the insertion point. Iterating a range starts with a
+    binary search and then walks the chunks in order.
+    """
+
+    def __init__(self, keys: Iterable[str] = (), chunk_size: int = 1000) -> None:
+        ordered = sorted(keys)
+        self.chunk_size: int = chunk_size
+        self._chunks: List[List[str]] = [ordered[i:i + chunk_size] for i in range(0, len(ordered), chunk_size)]
+        self._maxes: List[str] = [chunk[-1] for chunk in self._chunks]  # last key of every chunk, to find the chunk of a key
+        self._len: int = len(ordered)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[str]:
+        return self.irange()
+
+    def __contains__(self, key: str) -> bool:
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return False
+        chunk = self._chunks[i]
+        j = bisect_left(chunk, key)
+        return j < len(chunk) and chunk[j] == key
+
+    def add(self, key: str) -> None:
+        if not self._chunks:
+            self._chunks.append([key])
+            self._maxes.append(key)
+            self._len = 1
+            return
+        i = min(bisect_left(self._maxes, key), len(self._maxes) - 1)  # past the last chunk: goes at its end
+        chunk = self._chunks[i]
+        j = bisect_left(chunk, key)
+        if j < len(chunk) and chunk[j] == key:
+            return
+        chunk.insert(j, key)
+        self._maxes[i] = chunk[-1]
+        self._len += 1
+        if len(chunk) > 2 * self.chunk_size:
+            half = len(chunk) // 2
+            self._chunks[i:i + 1] = [chunk[:half], chunk[half:]]
+            self._maxes[i:i + 1] = [chunk[half - 1], chunk[-1]]
+
+    def discard(self, key: str) -> None:
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return
+        chunk = self._chunks[i]
+        j = bisect_left(chunk, key)
+        if j == len(chunk) or chunk[j] != key:
+            return
+        del chunk[j]
+        self._len -= 1
+        if chunk:
+            self._maxes[i] = chunk[-1]
+        else:
+            del self._chunks[i]
+            del self._maxes[i]
+
+    def irange(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[str]:
+        """Keys from start (included) to end (excluded) in order, None means unbounded.
+
+        Don't modify the set while iterating.
+        """
+        i = 0 if start is None else bisect_left(self._maxes, start)
+        j = 0 if start is None or i == len(self._chunks) else bisect_left(self._chunks[i], start)
+        for chunk in islice(self._chunks, i, None):
+            for k in range(j, len(chunk)):
+                key = chunk[k]
+                if end is not None and key >= end:
+                    return
+                yield key
+            j = 0
+
+def prefix_end(prefix: str) -> Optional[str]:
+    """Smallest string sorting after every string starting with prefix, None if there is none."""
+    while prefix and ord(prefix[-1]) == sys.maxunicode:
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def in_range(key: str, start: Optional[str], end: Optional[str]) -> bool:
+    return (start is None or key >= start) and (end is None or key < end)
+
+def scan_page(
+    committed: Iterable[Entry], changes: Dict[str, Optional[str]], start: Optional[str], end: Optional[str], limit: int,
+) -> Tuple[List[Entry], Optional[str]]:
+    """One page of a range scan, as seen by a session with uncommitted changes.
+
+    committed yields the committed entries from start to end in key order. Returns at most
+    limit entries and the key to start the next page from, None once the range is exhausted.
+    """
+    overlay = sorted((key, value) for key, value in changes.items() if in_range(key, start, end))
+    entries = list(islice(_overlaid(committed, overlay), limit + 1))
+    if len(entries) > limit:
+        return entries[:limit], entries[limit][0]
+    return entries, None
+
+def _overlaid(committed: Iterable[Entry], overlay: List[Tuple[str, Optional[str]]]) -> Iterator[Entry]:
+    """Merges two sorted streams, the overlay wins and its None values hide keys."""
+    pending = iter(overlay)
+    change = next(pending, None)
+    for key, value in committed:
+        while change is not None and change[0] < key:
+            if change[1] is not None:
+                yield change
+            change = next(pending, None)
+        if change is not None and change[0] == key:
+            if change[1] is not None:
+                yield change
+            change = next(pending, None)
+            continue
+        yield key, value
+    while change is not None:
+        if change[1] is not None:
+            yield change
+        change = next(pending, None)
@@ -0,0 +1,217 @@
+import os
+import threading
+
+from multiprocessing.connection import Client, Connection, Listener
+from queue import Empty, LifoQueue
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.datastore.kv_store_interface import KeyValueStoreInterface, Record, integer_value
+from src.datastore.session import current_session, new_session
+from src.datastore.sorted_index import Entry, in_range, scan_page
+from src.datastore.transactions import MISSING, TransactionStack
+
+class StoreServer:
+    """Serves one datastore to other processes over a local socket.
+
+    This is the shared data plane of the multi process server: every worker process talks to
+    the single store process, so all workers see the same data and the same atomic commits.
+    """
+
+    def __init__(
+        self, store: KeyValueStoreInterface, address: Optional[str] = None, authkey: Optional[bytes] = None, listener: Optional[Listener] = None
+    ) -> None:
+        self.store: KeyValueStoreInterface = store
+        self.authkey: bytes = authkey or os.urandom(16)
+        self.listener: Listener = listener or Listener(address, family="AF_UNIX", authkey=self.authkey)  # a given one must use authkey
+        self.address: str = self.listener.address
+
+    def serve_forever(self) -> None:
+        """Accepts worker connections until the listener is closed, one thread per worker connection."""
+        while True:
+            try:
+                connection = self.listener.accept()
+            except OSError:
+                break  # listener closed
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def close(self) -> None:
+        self.listener.close()
+
+    def _serve(self, connection: Connection) -> None:
+        new_session()
+        handlers: Dict[str, Callable[..., Any]] = {
+            "get": self.store.get,
+            "put": self.store.put,
+            "delete": self.store.delete,
+            "mget": self.store.mget,
+            "mput": self.store.mput,
+            "mdelete": self.store.mdelete,
+            "put_ex": self.store.put_ex,
+            "expire": self.store.expire,
+            "ttl": self.store.ttl,
+            "cas": self.store.cas,
+            "incr": self.store.incr,
+            "scan": self.store.scan,
+            "load": self.store.load,
+            "dump": self.store.dump,
+            "apply": self._apply,
+        }
+        while True:
+            try:
+                op, args = connection.recv()
+            except (EOFError, OSError):
+                break  # worker gone
+            try:
+                reply: Tuple[bool, Any] = (True, handlers[op](*args))
+            except Exception as e:
+                reply = (False, str(e))
+            connection.send(reply)
+        connection.close()
+
+    def _apply(self, changes: Dict[str, Optional[str]]) -> None:
+        """Applies a committed transaction from a worker as one transaction of the real store."""
+        self.store.start()
+        try:
+            for key, value in changes.items():
+                if value is None:
+                    self.store.delete(key)
+                else:
+                    self.store.put(key, value)
+        except Exception:
+            self.store.rollback()
+            raise
+        self.store.commit()
+
+class RemoteKeyValueStore(KeyValueStoreInterface):
+    """Datastore living in a StoreServer of another process.
+
+    Transactions are buffered locally per session, exactly like KeyValueStore does, and only
+    cross the process boundary when the outermost one commits, as one atomic batch.
+    """
+
+    def __init__(self, address: str, authkey: bytes) -> None:
+        self.address: str = address
+        self.authkey: bytes = authkey
+        self._pool: "LifoQueue[Connection]" = LifoQueue()  # connections aren't thread safe, one per caller at a time
+
+    @property
+    def transactions(self) -> TransactionStack:
+        return current_session().state(self, TransactionStack)
+
+    def _call(self, op: str, *args: Any) -> Any:
+        try:
+            connection = self._pool.get_nowait()
+        except Empty:
+            connection = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+        try:
+            connection.send((op, args))
+            ok, result = connection.recv()
+        except BaseException:
+            connection.close()  # don't hand a connection in an unknown state to someone else
+            raise
+        self._pool.put(connection)
+        if not ok:
+            raise RuntimeError(result)
+        return result
+
+    def put(self, key: str, value: str) -> None:
+        if self.transactions:
+            self.transactions.write(key, value)
+        else:
+            self._call("put", key, value)
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.transactions.lookup(key)
+        if value is not MISSING:
+            return value
+        return self._call("get", key)
+
+    def delete(self, key: str) -> bool:
+        if self.transactions:
+            if self.get(key) is not None:
+                self.transactions.write(key, None)
+                return True
+            return False
+        return self._call("delete", key)
+
+    def mget(self, keys: List[str]) -> List[Optional[str]]:
+        values: List[Optional[str]] = [self.transactions.lookup(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is MISSING]
+        if missing:  # one round trip for everything the transactions don't answer
+            for i, value in zip(missing, self._call("mget", [keys[i] for i in missing])):
+                values[i] = value
+        return values
+
+    def mput(self, items: Dict[str, str]) -> None:
+        if self.transactions:
+            for key, value in items.items():
+                self.transactions.write(key, value)
+        else:
+            self._call("mput", items)
+
+    def mdelete(self, keys: List[str]) -> int:
+        if self.transactions:
+            existing = {key for key, value in zip(keys, self.mget(keys)) if value is not None}
+            for key in existing:
+                self.transactions.write(key, None)
+            return len(existing)
+        return self._call("mdelete", keys)
+
+    def put_ex(self, key: str, value: str, seconds: float) -> None:
+        if self.transactions:
+            raise RuntimeError("Key expiry can't be used inside a transaction.")
+        self._call("put_ex", key, value, seconds)
+
+    def expire(self, key: str, seconds: float) -> bool:
+        if self.transactions:
+            raise RuntimeError("Key expiry can't be used inside a transaction.")
+        return self._call("expire", key, seconds)
+
+    def ttl(self, key: str) -> int:
+        value = self.transactions.lookup(key)
+        if value is not MISSING:
+            return -2 if value is None else -1
+        return self._call("ttl", key)
+
+    def cas(self, key: str, expected: str, value: str) -> bool:
+        if self.transactions:  # against what this session sees, like KeyValueStore
+            if self.get(key) != expected:
+                return False
+            self.transactions.write(key, value)
+            return True
+        return self._call("cas", key, expected, value)
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        if self.transactions:
+            number = integer_value(key, self.get(key)) + amount
+            self.transactions.write(key, str(number))
+            return number
+        return self._call("incr", key, amount)
+
+    def scan(self, start: Optional[str], end: Optional[str], limit: int) -> Tuple[List[Entry], Optional[str]]:
+        changes = self.transactions.changes()
+        hidden = sum(1 for key in changes if in_range(key, start, end))  # at most this many committed entries are overridden
+        entries, cursor = self._call("scan", start, end, limit + hidden)
+        page, next_key = scan_page(entries, changes, start, end if cursor is None else cursor, limit)  # local changes past the fetched range belong to later pages
+        return page, cursor if next_key is None else next_key
+
+    def load(self, records: List[Record]) -> int:
+        if self.transactions:
+            raise RuntimeError("LOAD can't be used inside a transaction.")
+        return self._call("load", records)
+
+    def dump(self, cursor: Optional[str], limit: int) -> Tuple[List[Record], Optional[str]]:
+        if self.transactions:
+            raise RuntimeError("DUMP can't be used inside a transaction.")
+        return self._call("dump", cursor, limit)
+
+    def start(self) -> None:
+        self.transactions.begin()
+
+    def commit(self) -> None:
+        txn = self.transactions.commit()
+        if txn:
+            self._call("apply", txn)
+
+    def rollback(self) -> None:
+        self.transactions.rollback()
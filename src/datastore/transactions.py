@@ -0,0 +1,74 @@
+from typing import Any, Dict, List, Optional, Set
+
+MISSING: Any = object()  # "this transaction never touched the key", as opposed to None which is a delete
+
+class Watch:
+    """Keys a session watches, flagged dirty by the store as soon as one of them is written."""
+
+    def __init__(self) -> None:
+        self.keys: Set[str] = set()
+        self.dirty: bool = False
+
+class TransactionStack:
+    """The nested transactions of one session, flattened into one view over the committed data.
+
+    The view maps every key the session touched to the value it sees, or None when the key
+    was deleted, so reads cost one dict lookup whatever the nesting depth. Each level keeps an
+    undo log instead, the value its first write to a key replaced, so a rollback restores only
+    what that level changed and a nested commit hands its undo log to its parent. Datastores
+    only need to resolve reads they can't answer from here and apply what commit returns.
+    """
+
+    def __init__(self) -> None:
+        self._view: Dict[str, Optional[str]] = {}
+        self._undo: List[Dict[str, Any]] = []  # per level, key -> value before that level (MISSING: untouched)
+        self.watch: Optional[Watch] = None  # WATCHed keys, until the outermost transaction ends
+
+    def __len__(self) -> int:
+        return len(self._undo)
+
+    def begin(self) -> None:
+        self._undo.append({})
+
+    def lookup(self, key: str, default: Any = MISSING) -> Optional[str]:
+        """Returns the value this session sees for key, None if it deleted it, default if untouched."""
+        return self._view.get(key, default)
+
+    def changes(self) -> Dict[str, Optional[str]]:
+        """Every key this session touched and the value it sees for it, None for deletes."""
+        return dict(self._view)
+
+    def write(self, key: str, value: Optional[str]) -> None:
+        """Records a new value (or a delete when value is None) in the innermost transaction."""
+        undo = self._undo[-1]
+        if key not in undo:
+            undo[key] = self._view.get(key, MISSING)
+        self._view[key] = value
+
+    def commit(self) -> Optional[Dict[str, Optional[str]]]:
+        """Closes the innermost transaction.
+
+        Nested transactions are folded into their parent and None is returned, committing
+        the outermost one returns its changes, which the datastore must apply atomically.
+        """
+        if not self._undo:
+            raise RuntimeError("No active transaction to commit.")
+
+        undo = self._undo.pop()
+        if self._undo:
+            parent = self._undo[-1]
+            for key, previous in undo.items():
+                parent.setdefault(key, previous)  # the parent's own first write is older
+            return None
+        changes, self._view = self._view, {}
+        return changes
+
+    def rollback(self) -> None:
+        if not self._undo:
+            raise RuntimeError("No active transaction to rollback.")
+        view = self._view
+        for key, previous in self._undo.pop().items():
+            if previous is MISSING:
+                del view[key]
+            else:
+                view[key] = previous
@@ -0,0 +1,117 @@
+import json
+import logging
+import os
+import threading
+
+from typing import Any, Dict, Iterator, List, Optional
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+def segment_path(directory: str, generation: int) -> str:
+    return os.path.join(directory, f"wal-{generation:08d}.log")
+
+def list_segments(directory: str) -> List[int]:
+    """Generations of the log segments found in directory, oldest first."""
+    return sorted(
+        int(name[len("wal-"):-len(".log")])
+        for name in os.listdir(directory)
+        if name.startswith("wal-") and name.endswith(".log")
+    )
+
+def read_segment(directory: str, generation: int) -> Iterator[Any]:
+    """Yields the records of a segment in the order they were committed.
+
+    A record is a change set, or a [change set, deadlines] pair when it also set TTLs.
+    """
+    with open(segment_path(directory, generation), "rb") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logging.warning(f"Ignoring torn record at the end of {segment_path(directory, generation)}")
+                return  # a crash in the middle of a write, nothing after it was acknowledged
+
+class WriteAheadLog:
+    """Append only log of committed change sets, one JSON object per line.
+
+    fsync policy:
+        always: sync() fsyncs before the client gets its answer. Writers arriving while an
+                fsync is in flight share the next one (group commit) instead of queueing one each.
+        interval: a background thread fsyncs every fsync_interval_ms, a crash of the machine
+                  (not the process) loses at most that much.
+        never: leave it to the OS.
+    The log is split in numbered segments so that the ones covered by a snapshot can be deleted.
+    """
+
+    def __init__(self, directory: str, generation: int, fsync: str = "interval", fsync_interval_ms: int = 1000) -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync}'. Available policies: {', '.join(FSYNC_POLICIES)}")
+        self.directory: str = directory
+        self.generation: int = generation
+        self.fsync: str = fsync
+        self._file = open(segment_path(directory, generation), "ab")
+        self._lock = threading.Lock()  # guards the file and _written
+        self._sync_lock = threading.Lock()  # one fsync in flight at a time
+        self._written: int = 0  # records written to the OS
+        self._synced: int = 0  # records known to be on disk
+        self._closed = threading.Event()
+
+        if fsync == "interval":
+            interval = fsync_interval_ms / 1000
+            threading.Thread(target=self._sync_periodically, args=(interval,), name="wal-fsync", daemon=True).start()
+
+    def append(self, changes: Dict[str, Optional[str]], expires: Optional[Dict[str, float]] = None) -> None:
+        line = (json.dumps([changes, expires] if expires else changes) + "\n").encode("utf-8")
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()  # survives a crash of the process from here on
+            self._written += 1
+
+    def sync(self) -> None:
+        """Makes sure everything appended so far is on disk, when the policy asks for it."""
+        if self.fsync == "always":
+            self._fsync()
+
+    def rotate(self) -> int:
+        """Starts a new segment, returns its generation. Call with writers excluded."""
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self.generation += 1
+            self._file = open(segment_path(self.directory, self.generation), "ab")
+            self._synced = self._written
+        return self.generation
+
+    def close(self) -> None:
+        self._closed.set()
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+
+    def _fsync(self) -> None:
+        target = self._written
+        if self._synced >= target:
+            return
+        with self._sync_lock:
+            if self._synced >= target:
+                return  # someone else's fsync covered our record, that's the group commit
+            with self._lock:
+                if self._file.closed:
+                    return
+                covered = self._written
+                fd = os.dup(self._file.fileno())  # rotate may close the file while we fsync
+            try:
+                os.fsync(fd)  # without the lock, so writers keep appending to the next batch
+            finally:
+                os.close(fd)
+            self._synced = max(self._synced, covered)
+
+    def _sync_periodically(self, interval: float) -> None:
+        while not self._closed.wait(interval):
+            try:
+                self._fsync()
+            except (OSError, ValueError) as e:
+                logging.error(f"Periodic fsync of the write ahead log failed: {e}")
@@ -0,0 +1,190 @@
+import json
+import struct
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.api.kv_api import KeyValueAPI
+from src.model.response import BUSY, Response
+
+# A client switches its connection to the binary protocol by sending HANDSHAKE as its very
+# first bytes (a text command can't start with a NUL byte), the server echoes it back.
+#
+# Request frame:  u32 length of the rest, u8 opcode, then every argument as u32 length + bytes
+# Response frame: u32 length of the rest, then status, result and mesg, each one encoded value
+# Values:         NULL | STRING u32 length + bytes | LIST u32 count + values (dicts are sent as JSON strings)
+# Keys and values are arbitrary bytes, integers are big endian.
+HANDSHAKE = b"\x00HKV\x01"
+
+LENGTH = struct.Struct(">I")
+
+NULL, STRING, LIST = 0, 1, 2
+
+OP_PUT, OP_GET, OP_DEL, OP_START, OP_COMMIT, OP_ROLLBACK, OP_MGET, OP_MPUT, OP_MDEL, OP_EXIT = 1, 2, 3, 4, 5, 6, 7, 8, 9, 0x7F
+OP_PUTEX, OP_EXPIRE, OP_TTL, OP_SCAN, OP_PREFIX, OP_STATS = 10, 11, 12, 13, 14, 15
+OP_CAS, OP_INCR, OP_DECR, OP_WATCH, OP_UNWATCH = 16, 17, 18, 19, 20
+OP_DUMP, OP_LOAD = 21, 22
+
+COMMANDS: Dict[int, Tuple[str, int]] = {  # opcode -> (KeyValueAPI method, number of arguments)
+    OP_PUT: ("put", 2),
+    OP_GET: ("get", 1),
+    OP_DEL: ("delete", 1),
+    OP_START: ("start", 0),
+    OP_COMMIT: ("commit", 0),
+    OP_ROLLBACK: ("rollback", 0),
+    OP_PUTEX: ("put_ex", 3),  # seconds as decimal text, like in the text protocol
+    OP_EXPIRE: ("expire", 2),
+    OP_TTL: ("ttl", 1),
+    OP_SCAN: ("scan", 3),  # start (- for none), end (+ for none), limit
+    OP_PREFIX: ("prefix", 3),  # prefix, limit, cursor (empty for the first page)
+    OP_STATS: ("stats", 0),  # answers one JSON document
+    OP_CAS: ("cas", 3),  # key, expected, new value
+    OP_INCR: ("incr", 2),  # key, amount as decimal text
+    OP_DECR: ("decr", 2),
+    OP_UNWATCH: ("unwatch", 0),
+    OP_DUMP: ("dump", 2),  # cursor (- for the first key), limit, answers [cursor, [[key, value, deadline], ...]]
+}
+
+BATCH_COMMANDS: Dict[int, Tuple[str, int]] = {  # opcode -> (KeyValueAPI method, arguments per item)
+    OP_MGET: ("mget", 1),
+    OP_MPUT: ("mput", 2),
+    OP_MDEL: ("mdelete", 1),
+    OP_WATCH: ("watch", 1),
+    OP_LOAD: ("load", 3),  # key, value, deadline as decimal unix time (empty if it never expires)
+}
+
+def to_str(data: bytes) -> str:
+    """Binary safe: bytes that aren't UTF-8 survive the round trip through the str based store."""
+    return data.decode("utf-8", errors="surrogateescape")
+
+def to_bytes(text: str) -> bytes:
+    return text.encode("utf-8", errors="surrogateescape")
+
+def encode_value(value: Any) -> bytes:
+    if value is None:
+        return bytes((NULL,))
+    if isinstance(value, dict):
+        value = json.dumps(value)  # nested and self describing, no point in a binary encoding for it
+    elif isinstance(value, (list, tuple)):
+        return bytes((LIST,)) + LENGTH.pack(len(value)) + b"".join(encode_value(item) for item in value)
+    data = value if isinstance(value, bytes) else to_bytes(str(value))
+    return bytes((STRING,)) + LENGTH.pack(len(data)) + data
+
+def decode_value(data: bytes, offset: int = 0) -> Tuple[Any, int]:
+    """Returns the value starting at offset (strings as bytes) and the offset right after it."""
+    kind = data[offset]
+    offset += 1
+    if kind == NULL:
+        return None, offset
+    (size,) = LENGTH.unpack_from(data, offset)
+    offset += LENGTH.size
+    if kind == STRING:
+        return bytes(data[offset:offset + size]), offset + size
+    if kind == LIST:
+        items: List[Any] = []
+        for _ in range(size):
+            item, offset = decode_value(data, offset)
+            items.append(item)
+        return items, offset
+    raise ValueError(f"Unknown value type {kind}.")
+
+def encode_response(response: Response) -> bytes:
+    body = encode_value(response.status) + encode_value(response.result) + encode_value(response.mesg)
+    return LENGTH.pack(len(body)) + body
+
+def encode_request(opcode: int, *args: bytes) -> bytes:
+    """Client side helper building one request frame."""
+    body = bytes((opcode,)) + b"".join(LENGTH.pack(len(arg)) + arg for arg in args)
+    return LENGTH.pack(len(body)) + body
+
+def decode_response(frame: bytes) -> Tuple[str, Any, Optional[str]]:
+    """Client side helper, takes a frame without its length prefix, returns (status, result, mesg)."""
+    status, offset = decode_value(frame)
+    result, offset = decode_value(frame, offset)
+    mesg, _ = decode_value(frame, offset)
+    return to_str(status), result, None if mesg is None else to_str(mesg)
+
+class BinaryProtocol:
+    """Length prefixed binary protocol, no text parsing and no JSON on either side.
+
+    Same contract as TextProtocol: feed() takes whatever was read off the socket and returns
+    the responses of every complete frame, batched.
+    """
+
+    def __init__(self, api: KeyValueAPI, max_frame_size: int = 16 * 1024 * 1024) -> None:
+        self.api: KeyValueAPI = api
+        self.max_frame_size: int = max_frame_size
+        self.closed: bool = False
+        self._buffer: bytearray = bytearray()
+
+    def feed(self, data: bytes, busy: bool = False) -> bytes:
+        buffer = self._buffer
+        buffer += data
+
+        responses = []
+        start = 0
+        while not self.closed and len(buffer) - start >= LENGTH.size:
+            (size,) = LENGTH.unpack_from(buffer, start)
+            if size > self.max_frame_size:
+                responses.append(encode_response(Response("Error", mesg=f"Frame exceeds {self.max_frame_size} bytes.")))
+                self.closed = True  # the stream can't be trusted anymore
+                break
+            end = start + LENGTH.size + size
+            if len(buffer) < end:
+                break  # wait for the rest of the frame
+            responses.append(self._handle(memoryview(buffer)[start + LENGTH.size:end], busy))
+            start = end
+
+        if self.closed:
+            buffer.clear()
+        elif start:
+            del buffer[:start]
+        return b"".join(responses)
+
+    def _handle(self, frame: memoryview, busy: bool = False) -> bytes:
+        try:
+            opcode, args = self._parse(frame)
+        except (ValueError, IndexError, struct.error) as e:
+            return encode_response(Response("Error", mesg=f"Malformed frame: {e}"))
+        finally:
+            frame.release()
+
+        if opcode == OP_EXIT:
+            self.closed = True
+            return encode_response(Response("Ok"))
+        if busy:
+            return encode_response(BUSY)
+        try:
+            if opcode in COMMANDS:
+                name, arity = COMMANDS[opcode]
+                if len(args) != arity:
+                    return encode_response(Response("Error", mesg=f"{name.upper()} takes {arity} argument(s), got {len(args)}."))
+                method: Callable[..., Response] = getattr(self.api, name)
+                return encode_response(method(*args))
+
+            if opcode in BATCH_COMMANDS:
+                name, per_item = BATCH_COMMANDS[opcode]
+                if not args or len(args) % per_item:
+                    return encode_response(Response("Error", mesg=f"Batch commands take a non empty list of {per_item} argument(s) per item."))
+                method = getattr(self.api, name)
+                if per_item == 1:
+                    return encode_response(method(args))
+                if per_item == 2:
+                    return encode_response(method(dict(zip(args[::2], args[1::2]))))
+                return encode_response(method([args[i:i + per_item] for i in range(0, len(args), per_item)]))
+        except Exception as e:
+            return encode_response(Response("Error", mesg=str(e)))
+        return encode_response(Response("Error", mesg=f"Unknown opcode {opcode}."))
+
+    @staticmethod
+    def _parse(frame: memoryview) -> Tuple[int, List[str]]:
+        opcode = frame[0]
+        args: List[str] = []
+        offset = 1
+        while offset < len(frame):
+            (size,) = LENGTH.unpack_from(frame, offset)
+            offset += LENGTH.size
+            if offset + size > len(frame):
+                raise ValueError("argument runs past the end of the frame")
+            args.append(to_str(bytes(frame[offset:offset + size])))
+            offset += size
+        return opcode, args
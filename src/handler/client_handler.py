@@ -1,37 +1,84 @@
+import logging
 import socket
 import threading
 
 from datetime import datetime
 from typing import Optional, Tuple
 
+from src.datastore.pubsub import Subscription
+from src.datastore.session import Session, new_session
 from src.handler.parser import CommandParser
+from src.handler.protocol import NegotiatedProtocol
+from src.metrics.metrics import METRICS
+from src.server.logs import REQUEST_LOG
 
 class ClientHandler(threading.Thread):
-    def __init__(self, client_socket: socket.socket, client_address: Tuple[str, int]) -> None:
+    def __init__(self, client_socket: socket.socket, client_address: Tuple[str, int], recv_size: int = 64 * 1024) -> None:
         super().__init__()
         self.client_socket: socket.socket = client_socket
         self.client_address: Tuple[str, int] = client_address
+        self.recv_size: int = recv_size
+        self.session: Optional[Session] = None
+        self._send_lock = threading.Lock()  # responses and pushed events never interleave
+        self._pushed = threading.Event()
+        self._pusher: Optional[threading.Thread] = None
 
     def run(self) -> None:
-        print(f"[+] New connection from {self.client_address}")
-
-        parser = CommandParser()
-        while True:
-            try:
-                data: Optional[str] = self.client_socket.recv(1024).decode("utf-8")
+        self.session = new_session()
+        self.session.wake = self._wake
+        METRICS.connection_opened()
+        protocol = NegotiatedProtocol(CommandParser())
+        try:
+            while not protocol.closed:
+                data: bytes = self.client_socket.recv(self.recv_size)
                 if not data:
                     break # client gone
 
-                print(f"[{self.client_address}] Received: {data.strip()}")
+                if REQUEST_LOG.sampled():  # off by default, printing every command made stdout the bottleneck
+                    REQUEST_LOG.log(self.client_address, data)
 
-                response: str = parser.parse(data) + "\n" # just so it's easier to read
-                self.client_socket.send(response.encode("utf-8"))
+                responses: bytes = protocol.feed(data)
+                if responses:
+                    self._send(responses)  # one write for every pipelined command
+                METRICS.record_io(len(data), len(responses))
+                if self.session.subscription is not None and self._pusher is None:
+                    self._pusher = threading.Thread(target=self._push, args=(self.session.subscription,), daemon=True)
+                    self._pusher.start()
+        except OSError:
+            pass  # reset, broken pipe, or shut down as a slow consumer: the connection is gone either way
+        finally:
+            if self.session.subscription is not None:
+                self.session.subscription.close()
+            self._pushed.set()  # lets the pusher exit
+            METRICS.connection_closed()
+            logging.debug(f"Connection closed: {self.client_address}")
+            self.client_socket.close()
 
-                if data.strip().lower() == "exit":
-                    break  # bye bye bye
-            except ConnectionResetError:
-                break  # woops, just assume connection closed
+    def _send(self, data: bytes) -> None:
+        with self._send_lock:
+            self.client_socket.sendall(data)
 
-        print(f"[-] Connection closed: {self.client_address}")
-        self.client_socket.close()
+    def _wake(self) -> None:
+        """Called by writers with the store lock held when events are pending, never blocks."""
+        self._pushed.set()
+        subscription = self.session.subscription if self.session is not None else None
+        if subscription is not None and subscription.closed:
+            self._shutdown()  # slow consumer: unblocks the pusher if it's stuck sending, and the reader
+
+    def _push(self, subscription: Subscription) -> None:
+        """Sends the events of subscription as they come, in a thread of its own as reads block."""
+        while not subscription.closed:
+            self._pushed.wait()
+            self._pushed.clear()
+            events: bytes = subscription.drain()
+            try:
+                if events:
+                    self._send(events)
+            except OSError:
+                return
 
+    def _shutdown(self) -> None:
+        try:
+            self.client_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass  # already closed
@@ -1,56 +1,197 @@
-from typing import List
-from src.api.kv_api import KeyValueAPI
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from src.api.kv_api import DUMP_LIMIT, SCAN_LIMIT, KeyValueAPI
 from src.model.response import Response
 
+Handler = Callable[[KeyValueAPI, List[str]], Optional[Response]]  # None: malformed arguments
+
+class Command(NamedTuple):
+    handler: Handler
+    min_args: int
+    max_args: Optional[int]  # None: any number
+    rest: bool  # the last argument is the rest of the line, spaces included
+    usage: bytes  # answer to malformed arguments, encoded once
+
+COMMANDS: Dict[str, Command] = {}  # in the order they're listed to clients
+
+def command(name: str, usage: str, arity: Tuple[int, Optional[int]] = (0, 0), rest: bool = False) -> Callable[[Handler], Handler]:
+    """Registers the handler of a command taking arity=(min, max) arguments.
+
+    Arguments are split on whitespace, or with rest on single spaces into exactly max arguments,
+    the last keeping its spaces. Other checks are up to the handler, which returns None to answer usage.
+    """
+    def register(handler: Handler) -> Handler:
+        COMMANDS[name] = Command(handler, arity[0], arity[1], rest, Response("Error", mesg=usage).encode())
+        return handler
+    return register
+
+def options(args: List[str], names: Tuple[str, ...]) -> Optional[Dict[str, str]]:
+    """Parses NAME value pairs following the arguments of a command, None if they're malformed."""
+    if len(args) % 2:
+        return None
+    parsed: Dict[str, str] = {}
+    for name, value in zip(args[::2], args[1::2]):
+        if name.upper() not in names:
+            return None
+        parsed[name.upper()] = value
+    return parsed
+
+@command("PUT", "PUT requires two arguments. Usage: PUT <key> <value>", (2, 2), rest=True)
+def _put(api: KeyValueAPI, args: List[str]) -> Response:
+    return api.put(args[0], args[1])  # the value is the rest of the line, whatever it ends with
+
+@command("PUTEX", "PUTEX requires three arguments. Usage: PUTEX <key> <seconds> <value>", (3, 3), rest=True)
+def _put_ex(api: KeyValueAPI, args: List[str]) -> Response:
+    return api.put_ex(args[0], args[2], args[1])
+
+@command("GET", "GET requires one argument. Usage: GET <key>", (1, 1))
+def _get(api: KeyValueAPI, args: List[str]) -> Response:
+    return api.get(args[0])
+
+@command("DEL", "DEL requires one argument. Usage: DEL <key>", (1, 1))
+def _delete(api: KeyValueAPI, args: List[str]) -> Response:
+    return api.delete(args[0])
+
+@command("MGET", "MGET requires at least one key. Usage: MGET <key> [<key> ...]", (1, None))
+def _mget(api: KeyValueAPI, args: List[str]) -> Response:
+    return api.mget(args)
+
+@command("MPUT", "MPUT requires key value pairs. Usage: MPUT <key> <value> [<key> <value> ...]", (2, None))
+def _mput(api: KeyValueAPI, args: List[str]) -> Optional[Response]:
+    if len(args) % 2:
+        return None
+    return api.mput(dict(zip(args[::2], args[1::2])))
+
+@command("MDEL", "MDEL requires at least one key. Usage: MDEL <key> [<key> ...]", (1, None))
+def _mdelete(api: KeyValueAPI, args: List[str]) -> Response:
+    return api.mdelete(args)
+
+@command("EXPIRE", "EXPIRE requires two arguments. Usage: EXPIRE <key> <seconds>", (2, 2))
+def _expire(api: KeyValueAPI, args: List[str]) -> Response:
+    return api.expire(args[0], args[1])
+
+@command("TTL", "TTL requires one argument. Usage: TTL <key>", (1, 1))
+def _ttl(api: KeyValueAPI, args: List[str]) -> Response:
+    return api.ttl(args[0])
+
+@command("CAS", "CAS requires three arguments. Usage: CAS <key> <expected> <value>", (3, 3), rest=True)
+def _cas(api: KeyValueAPI, args: List[str]) -> Response:
+    return api.cas(args[0], args[1], args[2])  # the new value can contain spaces, the expected one can't
+
+@command("INCR", "INCR requires a key. Usage: INCR <key> [<amount>]", (1, 2))
+def _incr(api: KeyValueAPI, args: List[str]) -> Response:
+    return api.incr(*args)
+
+@command("DECR", "DECR requires a key. Usage: DECR <key> [<amount>]", (1, 2))
+def _decr(api: KeyValueAPI, args: List[str]) -> Response:
+    return api.decr(*args)
+
+@command("WATCH", "WATCH requires at least one key. Usage: WATCH <key> [<key> ...]", (1, None))
+def _watch(api: KeyValueAPI, args: List[str]) -> Response:
+    return api.watch(args)
+
+@command("UNWATCH", "UNWATCH does not take arguments.")
+def _unwatch(api: KeyValueAPI, args: List[str]) -> Response:
+    return api.unwatch()
+
+@command("SCAN", "SCAN requires a start and an end key. Usage: SCAN <start|-> <end|+> [LIMIT <n>]", (2, None))
+def _scan(api: KeyValueAPI, args: List[str]) -> Optional[Response]:
+    parsed = options(args[2:], ("LIMIT",))
+    if parsed is None:
+        return None
+    return api.scan(args[0], args[1], parsed.get("LIMIT", SCAN_LIMIT))
+
+@command("PREFIX", "PREFIX requires a prefix. Usage: PREFIX <prefix> [LIMIT <n>] [FROM <cursor>]", (1, None))
+def _prefix(api: KeyValueAPI, args: List[str]) -> Optional[Response]:
+    parsed = options(args[1:], ("LIMIT", "FROM"))
+    if parsed is None:
+        return None
+    return api.prefix(args[0], parsed.get("LIMIT", SCAN_LIMIT), parsed.get("FROM"))
+
+@command("LOAD", "LOAD requires records. Usage: LOAD [[<key>, <value>, <deadline|null>], ...]", (1, 1), rest=True)
+def _load(api: KeyValueAPI, args: List[str]) -> Optional[Response]:
+    if not args[0]:
+        return None
+    return api.load(args[0])  # JSON, values can contain anything
+
+@command("DUMP", "DUMP requires a cursor. Usage: DUMP <cursor|-> [LIMIT <n>]", (1, 3))
+def _dump(api: KeyValueAPI, args: List[str]) -> Optional[Response]:
+    parsed = options(args[1:], ("LIMIT",))
+    if parsed is None:
+        return None
+    return api.dump(args[0], parsed.get("LIMIT", DUMP_LIMIT))
+
+@command("SUBSCRIBE", "SUBSCRIBE requires at least one key or prefix. Usage: SUBSCRIBE <key|prefix*> [<key|prefix*> ...]", (1, None))
+def _subscribe(api: KeyValueAPI, args: List[str]) -> Response:
+    return api.subscribe(args)
+
+@command("UNSUBSCRIBE", "Usage: UNSUBSCRIBE [<key|prefix*> ...]", (0, None))
+def _unsubscribe(api: KeyValueAPI, args: List[str]) -> Response:
+    return api.unsubscribe(args or None)  # none: every subscription
+
+@command("STATS", "STATS does not take arguments.")
+def _stats(api: KeyValueAPI, args: List[str]) -> Response:
+    return api.stats()
+
+@command("CLUSTER", (
+    "Usage: CLUSTER INFO | CLUSTER SETRING <epoch> <node> [<node> ...] | "
+    "CLUSTER TAKE <epoch> <node> <cursor|-> <count> | CLUSTER TAKEKEYS <epoch> <key> [<key> ...] | "
+    "CLUSTER FORGET <epoch> <key> [<key> ...]"
+), (1, None))
+def _cluster(api: KeyValueAPI, args: List[str]) -> Optional[Response]:
+    sub: str = args[0].upper()
+    if sub == "INFO" and len(args) == 1:
+        return api.cluster_info()
+    if sub == "SETRING" and len(args) >= 3:
+        return api.cluster_set_ring(args[1], args[2:])
+    if sub == "TAKE" and len(args) == 5:
+        return api.cluster_take(args[1], args[2], args[3], args[4])
+    if sub == "TAKEKEYS" and len(args) >= 3:
+        return api.cluster_take_keys(args[1], args[2:])
+    if sub == "FORGET" and len(args) >= 3:
+        return api.cluster_forget(args[1], args[2:])
+    return None
+
+@command("START", "START does not take arguments.")
+def _start(api: KeyValueAPI, args: List[str]) -> Response:
+    return api.start()
+
+@command("COMMIT", "COMMIT does not take arguments.")
+def _commit(api: KeyValueAPI, args: List[str]) -> Response:
+    return api.commit()
+
+@command("ROLLBACK", "ROLLBACK does not take arguments.")
+def _rollback(api: KeyValueAPI, args: List[str]) -> Response:
+    return api.rollback()
+
+AVAILABLE_COMMANDS = ", ".join(COMMANDS)
+
+EMPTY_COMMAND = Response("Error", mesg=f"Empty command. Available commands: {AVAILABLE_COMMANDS}").encode()
+
 class CommandParser:
     def __init__(self) -> None:
         self.api = KeyValueAPI()  # singleton
 
     def parse(self, command: str) -> str:
         """Parses the given command and executes the corresponding API method."""
-        parts: List[str] = command.strip().split(" ", 2)
-        if not parts or parts[0] == "":
-            return str(Response("Error", mesg="Empty command. Available commands: PUT, GET, DEL, START, COMMIT, ROLLBACK"))
+        return self.execute(command)[:-1].decode("ascii")
 
-        cmd: str = parts[0].upper() # let's assume we don't care if put or PUT or pUt
+    def execute(self, command: str) -> bytes:
+        """Like parse, returns the response as the encoded line to send back."""
+        name, _, tail = command.strip().partition(" ")
+        if not name:
+            return EMPTY_COMMAND
 
-        try:
-            if cmd == "PUT":
-                if len(parts) == 3:
-                    key, value = parts[1], parts[2]
-                    return str(self.api.put(key, value))
-                return str(Response("Error", mesg="PUT requires two arguments. Usage: PUT <key> <value>"))
-
-            elif cmd == "GET":
-                if len(parts) == 2:
-                    key = parts[1]
-                    return str(self.api.get(key))
-                return str(Response("Error", mesg="GET requires one argument. Usage: GET <key>"))
-
-            elif cmd == "DEL":
-                if len(parts) == 2:
-                    key = parts[1]
-                    return str(self.api.delete(key))
-                return str(Response("Error", mesg="DEL requires one argument. Usage: DEL <key>"))
-
-            elif cmd == "START":
-                if len(parts) == 1:
-                    return str(self.api.start())
-                return str(Response("Error", mesg="START does not take arguments."))
-
-            elif cmd == "COMMIT":
-                if len(parts) == 1:
-                    return str(self.api.commit())
-                return str(Response("Error", mesg="COMMIT does not take arguments."))
-
-            elif cmd == "ROLLBACK":
-                if len(parts) == 1:
-                    return str(self.api.rollback())
-                return str(Response("Error", mesg="ROLLBACK does not take arguments."))
-
-            else:
-                return str(Response("Error", mesg=f"Unknown command '{cmd}'. Available commands: PUT, GET, DEL, START, COMMIT, ROLLBACK"))
+        cmd: str = name.upper()  # let's assume we don't care if put or PUT or pUt
+        spec: Optional[Command] = COMMANDS.get(cmd)
+        if spec is None:
+            return Response("Error", mesg=f"Unknown command '{cmd}'. Available commands: {AVAILABLE_COMMANDS}").encode()
 
+        # no spaces in values of the other commands, every token is an argument
+        args: List[str] = tail.split(" ", spec.max_args - 1) if spec.rest else tail.split()
+        if len(args) < spec.min_args or (spec.max_args is not None and len(args) > spec.max_args):
+            return spec.usage
+        try:
+            response: Optional[Response] = spec.handler(self.api, args)
         except Exception as e:
-            return str(Response("Error", mesg=str(e)))
-
+            return Response("Error", mesg=str(e)).encode()
+        return spec.usage if response is None else response.encode()
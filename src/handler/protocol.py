@@ -0,0 +1,99 @@
+from typing import Optional, Union
+
+from src.handler.binary_protocol import HANDSHAKE, BinaryProtocol
+from src.handler.parser import CommandParser
+from src.model.response import BUSY, Response
+
+BUSY_LINE: bytes = BUSY.encode()
+
+class TextProtocol:
+    """Newline framed text protocol, independent of how bytes are read off the socket.
+
+    Bytes are accumulated in one reusable buffer, so a single read can carry many
+    pipelined commands (or only part of one), and the responses for every complete
+    command are handed back as one batch to be written with a single send.
+    """
+
+    def __init__(self, parser: CommandParser, max_line_size: int = 16 * 1024 * 1024) -> None:
+        self.parser: CommandParser = parser
+        self.max_line_size: int = max_line_size
+        self.closed: bool = False  # set once the client asked to leave (or broke framing)
+        self._buffer: bytearray = bytearray()
+        self._scanned: int = 0  # bytes of _buffer already known to contain no newline
+
+    def feed(self, data: bytes, busy: bool = False) -> bytes:
+        """Consumes freshly received bytes, returns the responses of every command they completed.
+
+        With busy, the commands are answered Busy without being run (exit still closes).
+        """
+        buffer = self._buffer
+        buffer += data
+
+        responses = []
+        start = 0
+        while not self.closed:
+            end = buffer.find(b"\n", max(start, self._scanned))
+            if end == -1:
+                break
+            line = bytes(buffer[start:end + 1])
+            start = end + 1
+            responses.append(self._handle(line, busy))
+
+        if start:
+            del buffer[:start]  # one compaction per read, not per command
+        self._scanned = len(buffer)
+
+        if not self.closed and len(buffer) > self.max_line_size:
+            responses.append(self._error(f"Command exceeds {self.max_line_size} bytes."))
+            self.closed = True  # can't find where the next command starts, give up
+        if self.closed:
+            buffer.clear()
+        return b"".join(responses)
+
+    def _handle(self, line: bytes, busy: bool = False) -> bytes:
+        try:
+            command: str = line.decode("utf-8")
+        except UnicodeDecodeError:
+            return self._error("Commands must be valid UTF-8.")
+
+        response: bytes = BUSY_LINE if busy else self.parser.execute(command)
+        if command.strip().lower() == "exit":
+            self.closed = True  # bye bye bye
+        return response
+
+    @staticmethod
+    def _error(mesg: str) -> bytes:
+        return Response("Error", mesg=mesg).encode()
+
+class NegotiatedProtocol:
+    """Picks the protocol of a connection from its first bytes.
+
+    Clients starting with the binary HANDSHAKE get the BinaryProtocol (and the handshake
+    echoed back), everybody else, `nc` included, gets the TextProtocol.
+    """
+
+    def __init__(self, parser: CommandParser, max_size: int = 16 * 1024 * 1024) -> None:
+        self.parser: CommandParser = parser
+        self.max_size: int = max_size  # of a command or a frame
+        self.protocol: Optional[Union[TextProtocol, BinaryProtocol]] = None
+        self._pending: bytes = b""
+
+    @property
+    def closed(self) -> bool:
+        return self.protocol is not None and self.protocol.closed
+
+    def feed(self, data: bytes, busy: bool = False) -> bytes:
+        if self.protocol is not None:
+            return self.protocol.feed(data, busy)
+
+        data = self._pending + data
+        if len(data) < len(HANDSHAKE) and HANDSHAKE.startswith(data):
+            self._pending = data  # could still be the handshake, wait for more
+            return b""
+        self._pending = b""
+
+        if data.startswith(HANDSHAKE):
+            self.protocol = BinaryProtocol(self.parser.api, max_frame_size=self.max_size)
+            return HANDSHAKE + self.protocol.feed(data[len(HANDSHAKE):], busy)
+        self.protocol = TextProtocol(self.parser, max_line_size=self.max_size)
+        return self.protocol.feed(data, busy)
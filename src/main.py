@@ -1,5 +1,134 @@
+import argparse
+import threading
+
+from src.api.kv_api import KeyValueAPI
+from src.cluster.node import ClusterNode
+from src.datastore.bounded_key_value_store import POLICIES, BoundedKeyValueStore
+from src.datastore.compact_key_value_store import CompactKeyValueStore
+from src.datastore.durable_key_value_store import DurableKeyValueStore
+from src.datastore.key_value_store import KeyValueStore
+from src.datastore.kv_store_interface import KeyValueStoreInterface
+from src.datastore.mvcc_key_value_store import MVCCKeyValueStore
+from src.datastore.replication import ReplicaKeyValueStore, ReplicationSource
+from src.datastore.sharded_key_value_store import ShardedKeyValueStore
+from src.datastore.wal import FSYNC_POLICIES
+from src.metrics.prometheus import start_metrics_server
+from src.server.async_server import AsyncTCPServer
+from src.server.logs import REQUEST_LOG, configure_logging
+from src.server.pooled_server import PooledTCPServer
+from src.server.prefork_server import PreforkServer
 from src.server.tcp_server import TCPServer
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Multi client in memory datastore server.")
+    parser.add_argument("--host", default="0.0.0.0", help="Interface to listen on.")
+    parser.add_argument("--port", type=int, default=4000, help="Port to listen on.")
+    parser.add_argument(
+        "--mode", choices=["thread", "asyncio", "pool"], default="thread",
+        help="thread: one OS thread per client. asyncio: one event loop for every client, for lots of connections. "
+             "pool: a fixed pool of worker threads behind one I/O thread, answering Busy when overloaded.",
+    )
+    parser.add_argument("--backlog", type=int, default=None, help="Listen backlog (defaults: 5 for thread, 4096 for asyncio, 128 for pool).")
+    parser.add_argument("--pool-workers", type=int, default=8, help="Worker threads of --mode pool.")
+    parser.add_argument("--max-connections", type=int, default=1024, help="With --mode pool, clients past this many are answered Busy and disconnected.")
+    parser.add_argument("--queue-size", type=int, default=256, help="With --mode pool, connections waiting for a worker before reads are answered Busy.")
+    parser.add_argument(
+        "--store", choices=["dict", "sharded", "mvcc", "compact"], default="dict",
+        help="dict: one dictionary behind one lock. sharded: keys spread over independently locked shards. "
+             "mvcc: multi version store, snapshot isolated transactions that fail on write conflicts. "
+             "compact: keys and values packed in one buffer, a fraction of the memory per entry.",
+    )
+    parser.add_argument("--shards", type=int, default=16, help="Number of shards for --store sharded.")
+    parser.add_argument("--compress-threshold", type=int, default=None, help="With --store compact, zlib compress values of at least this many bytes.")
+    parser.add_argument(
+        "--workers", type=int, default=0,
+        help="Run this many worker processes sharing the port (SO_REUSEPORT) in front of one store process. 0: single process.",
+    )
+    parser.add_argument("--data-dir", default=None, help="Persist the dict store in this directory (write ahead log + snapshots).")
+    parser.add_argument(
+        "--fsync", choices=FSYNC_POLICIES, default="interval",
+        help="always: fsync before answering a write. interval: fsync every --fsync-interval-ms. never: leave it to the OS.",
+    )
+    parser.add_argument("--fsync-interval-ms", type=int, default=1000, help="Time between fsyncs for --fsync interval.")
+    parser.add_argument("--snapshot-every", type=int, default=100_000, help="Write a snapshot every this many logged changes.")
+    parser.add_argument("--max-memory", type=int, default=0, help="Evict keys once the data takes more than this many bytes. 0: no limit.")
+    parser.add_argument("--eviction-policy", choices=POLICIES, default="lru", help="Which keys go first once --max-memory is reached.")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO", help="Minimum level of the logs.")
+    parser.add_argument(
+        "--log-requests", type=float, default=0.0,
+        help="Fraction of client reads to log, e.g. 0.01 for 1%%. 0 (default, for production): no request logging at all.",
+    )
+    parser.add_argument("--replication-port", type=int, default=0, help="Stream committed writes to replicas connecting on this port. 0: off.")
+    parser.add_argument("--replica-of", default=None, metavar="HOST:PORT", help="Serve a read only copy of the primary with this replication port.")
+    parser.add_argument(
+        "--cluster", default=None, metavar="HOST:PORT,...",
+        help="Run as a cluster node, the comma separated nodes of the current ring (a node joining later isn't in it yet).",
+    )
+    parser.add_argument("--cluster-node", default=None, metavar="HOST:PORT", help="This node's address in the ring (default: 127.0.0.1:<port>).")
+    parser.add_argument(
+        "--max-pending-events", type=int, default=1000,
+        help="SUBSCRIBE events buffered per client, a subscriber falling further behind is disconnected.",
+    )
+    parser.add_argument("--metrics-port", type=int, default=0, help="Serve Prometheus metrics on http://127.0.0.1:<port>/metrics. 0: off.")
+    args = parser.parse_args()
+    if args.data_dir and args.store != "dict":
+        parser.error("--data-dir is only supported with --store dict")
+    if args.max_memory and (args.store != "dict" or args.data_dir):
+        parser.error("--max-memory is only supported with --store dict, without --data-dir")
+    if (args.replication_port or args.replica_of) and (args.store != "dict" or args.workers):
+        parser.error("replication is only supported with --store dict, without --workers")
+    if args.replica_of and (args.data_dir or args.max_memory):
+        parser.error("a replica keeps the primary's data, --data-dir and --max-memory don't apply")
+    if args.cluster and (args.store != "dict" or args.workers or args.replica_of):
+        parser.error("--cluster is only supported with --store dict, without --workers or --replica-of")
+    if args.store == "mvcc" and args.workers:
+        parser.error("--store mvcc is not supported with --workers, transactions reach the store process as plain batches")
+    if args.metrics_port and args.workers:
+        parser.error("--metrics-port is not supported with --workers, every worker keeps its own metrics")
+    return args
+
+def build_store(args: argparse.Namespace) -> KeyValueStoreInterface:
+    if args.store == "sharded":
+        return ShardedKeyValueStore(args.shards)
+    if args.store == "mvcc":
+        return MVCCKeyValueStore()
+    if args.store == "compact":
+        return CompactKeyValueStore(args.compress_threshold)
+    if args.replica_of:
+        host, _, port = args.replica_of.rpartition(":")
+        return ReplicaKeyValueStore((host, int(port)))
+    if args.data_dir:
+        return DurableKeyValueStore(args.data_dir, args.fsync, args.fsync_interval_ms, args.snapshot_every)
+    if args.max_memory:
+        return BoundedKeyValueStore(args.max_memory, args.eviction_policy)
+    return KeyValueStore()
+
+def build_server(args: argparse.Namespace, reuse_port: bool = False):
+    if args.mode == "pool":
+        return PooledTCPServer(
+            args.host, args.port, workers=args.pool_workers, max_connections=args.max_connections,
+            queue_size=args.queue_size, backlog=args.backlog or 128, reuse_port=reuse_port,
+        )
+    if args.mode == "asyncio":
+        return AsyncTCPServer(args.host, args.port, backlog=args.backlog or 4096, reuse_port=reuse_port)
+    return TCPServer(args.host, args.port, max_clients=args.backlog or 5, reuse_port=reuse_port)
+
 if __name__ == "__main__":
-    server = TCPServer()
-    server.start()
+    args = parse_args()
+    configure_logging(args.log_level)
+    REQUEST_LOG.sample_rate = args.log_requests
+    if args.workers:
+        PreforkServer(lambda: build_store(args), lambda: build_server(args, reuse_port=True), args.workers).start()
+    else:
+        store = build_store(args)
+        api = KeyValueAPI.configure(store)
+        if api.pubsub is not None:
+            api.pubsub.max_pending = args.max_pending_events
+        if args.cluster:
+            KeyValueAPI.configure_cluster(ClusterNode(store, args.cluster_node or f"127.0.0.1:{args.port}", args.cluster.split(",")))
+        if args.replication_port:
+            source = ReplicationSource(store, args.host, args.replication_port)
+            threading.Thread(target=source.serve_forever, name="replication", daemon=True).start()
+        if args.metrics_port:
+            start_metrics_server(args.metrics_port)
+        build_server(args).start()
@@ -0,0 +1,202 @@
+import functools
+import time
+
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
+
+SUB_BUCKET_BITS = 3  # 8 buckets per power of two, values are off by at most 12.5%
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+def bucket_of(value: int) -> int:
+    """HDR style bucket of a value: exact below 2 * SUB_BUCKETS, log-linear above."""
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return shift * SUB_BUCKETS + (value >> shift)
+
+def bucket_start(bucket: int) -> int:
+    """Smallest value falling in bucket."""
+    if bucket < 2 * SUB_BUCKETS:
+        return bucket
+    shift = bucket // SUB_BUCKETS - 1
+    return (bucket - shift * SUB_BUCKETS) << shift
+
+class Histogram:
+    """Latency histogram in microseconds, constant memory and O(1) to record into.
+
+    Buckets are log-linear like in HdrHistogram: every power of two is split in SUB_BUCKETS
+    equal buckets, so percentiles keep the same relative precision from 1us to hours.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self.counts: List[int] = []
+        self.count: int = 0
+        self.total: float = 0.0  # seconds
+        self.max: float = 0.0
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.record_unlocked(seconds)
+
+    def record_unlocked(self, seconds: float) -> None:
+        """record(), for callers already serializing access to this histogram."""
+        bucket = bucket_of(int(seconds * 1_000_000))
+        if bucket >= len(self.counts):
+            self.counts.extend([0] * (bucket + 1 - len(self.counts)))
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction: float) -> float:
+        """Approximate value (in seconds) below which fraction of the recorded values fall."""
+        with self._lock:
+            target = fraction * self.count
+            seen = 0
+            for bucket, count in enumerate(self.counts):
+                seen += count
+                if count and seen >= target:
+                    return min(bucket_start(bucket + 1) / 1_000_000, self.max)
+            return 0.0
+
+    def cumulative(self, bounds_us: List[int]) -> List[int]:
+        """How many values are below each bound, bounds must be bucket boundaries (powers of two are)."""
+        with self._lock:
+            counts = list(self.counts)
+        result = []
+        seen = 0
+        bucket = 0
+        for bound in bounds_us:
+            while bucket < len(counts) and bucket_start(bucket + 1) <= bound:
+                seen += counts[bucket]
+                bucket += 1
+            result.append(seen)
+        return result
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "p50_us": round(self.percentile(0.5) * 1e6, 1),
+            "p99_us": round(self.percentile(0.99) * 1e6, 1),
+            "p999_us": round(self.percentile(0.999) * 1e6, 1),
+            "max_us": round(self.max * 1e6, 1),
+        }
+
+class Metrics:
+    """Process wide counters and histograms, what STATS and the Prometheus endpoint report."""
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self.started: float = time.time()
+        self.calls: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.latency: Dict[str, Histogram] = {}
+        self.lock_acquisitions: int = 0
+        self.lock_contended: int = 0
+        self.lock_wait: Histogram = Histogram()  # contended acquisitions only
+        self.connections: int = 0
+        self.connections_total: int = 0
+        self.bytes_in: int = 0
+        self.bytes_out: int = 0
+        self.connections_rejected: int = 0  # over the pooled server's max connections
+        self.busy_reads: int = 0  # reads answered Busy because every worker was taken
+
+    def record_command(self, name: str, seconds: float, ok: bool) -> None:
+        with self._lock:  # the one lock taken per command, the latency histograms are only written under it
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+            histogram = self.latency.get(name)
+            if histogram is None:
+                histogram = self.latency[name] = Histogram()
+            histogram.record_unlocked(seconds)
+
+    def connection_opened(self) -> None:
+        with self._lock:
+            self.connections += 1
+            self.connections_total += 1
+
+    def connection_closed(self) -> None:
+        with self._lock:
+            self.connections -= 1
+
+    def connection_rejected(self) -> None:
+        with self._lock:
+            self.connections_rejected += 1
+
+    def record_busy(self) -> None:
+        with self._lock:
+            self.busy_reads += 1
+
+    def record_io(self, received: int, sent: int) -> None:
+        with self._lock:
+            self.bytes_in += received
+            self.bytes_out += sent
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            commands = {
+                name: {"calls": calls, "errors": self.errors.get(name, 0), **self.latency[name].summary()}
+                for name, calls in sorted(self.calls.items())
+            }
+            return {
+                "uptime_seconds": int(time.time() - self.started),
+                "connections": {"active": self.connections, "total": self.connections_total},
+                "bytes": {"in": self.bytes_in, "out": self.bytes_out},
+                "overload": {"rejected_connections": self.connections_rejected, "busy_reads": self.busy_reads},
+                "commands": commands,
+                "lock": {"acquisitions": self.lock_acquisitions, "contended": self.lock_contended, "wait": self.lock_wait.summary()},
+            }
+
+    def reset(self) -> None:
+        self.__init__()
+
+METRICS = Metrics()
+
+def instrumented(method: Callable[..., Any]) -> Callable[..., Any]:
+    """Counts and times a KeyValueAPI method, calls answering an Error response count as errors."""
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        response = method(*args, **kwargs)
+        METRICS.record_command(name, time.perf_counter() - started, response.status != "Error")
+        return response
+    return wrapper
+
+class InstrumentedLock:
+    """Wraps a lock to measure how long callers wait for it.
+
+    The uncontended path is one non blocking acquire, the clock is only read when we have to wait.
+    """
+
+    def __init__(self, lock: Any, metrics: Optional[Metrics] = None) -> None:
+        self._lock = lock
+        self._metrics: Metrics = metrics or METRICS
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        metrics = self._metrics
+        if self._lock.acquire(blocking=False):
+            metrics.lock_acquisitions += 1  # counted while holding the lock, so no increment gets lost
+            return True
+        if not blocking:
+            return False
+        started = time.perf_counter()
+        if not self._lock.acquire(timeout=timeout):
+            return False
+        metrics.lock_acquisitions += 1
+        metrics.lock_contended += 1
+        metrics.lock_wait.record(time.perf_counter() - started)
+        return True
+
+    def release(self) -> None:
+        self._lock.release()
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._lock.release()
@@ -0,0 +1,77 @@
+import logging
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+from src.metrics.metrics import METRICS, Histogram, Metrics
+
+BOUNDS_US = [2 ** i for i in range(27)]  # 1us to ~67s, powers of two line up with the histogram buckets
+
+def _histogram(lines: List[str], name: str, labels: str, histogram: Histogram) -> None:
+    separator = "," if labels else ""
+    for bound, count in zip(BOUNDS_US, histogram.cumulative(BOUNDS_US)):
+        lines.append(f'{name}_bucket{{{labels}{separator}le="{bound / 1e6:g}"}} {count}')
+    lines.append(f'{name}_bucket{{{labels}{separator}le="+Inf"}} {histogram.count}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {histogram.total}")
+    lines.append(f"{name}_count{suffix} {histogram.count}")
+
+def render(metrics: Metrics = METRICS) -> str:
+    """The metrics in the Prometheus text exposition format."""
+    with metrics._lock:  # commands show up while clients are served
+        calls, errors, latency = dict(metrics.calls), dict(metrics.errors), dict(metrics.latency)
+    lines = [
+        "# TYPE hkv_connections gauge",
+        f"hkv_connections {metrics.connections}",
+        "# TYPE hkv_connections_total counter",
+        f"hkv_connections_total {metrics.connections_total}",
+        "# TYPE hkv_rejected_connections_total counter",
+        f"hkv_rejected_connections_total {metrics.connections_rejected}",
+        "# TYPE hkv_busy_reads_total counter",
+        f"hkv_busy_reads_total {metrics.busy_reads}",
+        "# TYPE hkv_received_bytes_total counter",
+        f"hkv_received_bytes_total {metrics.bytes_in}",
+        "# TYPE hkv_sent_bytes_total counter",
+        f"hkv_sent_bytes_total {metrics.bytes_out}",
+        "# TYPE hkv_commands_total counter",
+    ]
+    for name, count in sorted(calls.items()):
+        lines.append(f'hkv_commands_total{{command="{name}"}} {count}')
+    lines.append("# TYPE hkv_command_errors_total counter")
+    for name, count in sorted(errors.items()):
+        lines.append(f'hkv_command_errors_total{{command="{name}"}} {count}')
+    lines.append("# TYPE hkv_command_duration_seconds histogram")
+    for name, histogram in sorted(latency.items()):
+        _histogram(lines, "hkv_command_duration_seconds", f'command="{name}"', histogram)
+    lines += [
+        "# TYPE hkv_lock_acquisitions_total counter",
+        f"hkv_lock_acquisitions_total {metrics.lock_acquisitions}",
+        "# TYPE hkv_lock_contended_total counter",
+        f"hkv_lock_contended_total {metrics.lock_contended}",
+        "# TYPE hkv_lock_wait_seconds histogram",
+    ]
+    _histogram(lines, "hkv_lock_wait_seconds", "", metrics.lock_wait)
+    return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass  # one line per scrape is just noise
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serves GET /metrics from a background thread, on localhost unless told otherwise."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logging.info(f"Prometheus metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
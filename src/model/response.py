@@ -1,8 +1,11 @@
 import json
-from typing import Optional
+from json.encoder import encode_basestring_ascii
+from typing import Any, Dict, Optional
 
 class Response:
-    def __init__(self, status: str, result: Optional[str] = None, mesg: Optional[str] = None):
+    __slots__ = ("status", "result", "mesg")
+
+    def __init__(self, status: str, result: Optional[Any] = None, mesg: Optional[str] = None):
         self.status = status
         self.result = result
         self.mesg = mesg
@@ -15,3 +18,25 @@ class Response:
             response["mesg"] = self.mesg
         return json.dumps(response)
 
+    def encode(self) -> bytes:
+        """The response as a line of the text protocol, byte for byte str(self) plus a newline.
+
+        Strings, by far the most common results, go through json's C string encoder instead of
+        a dict built for json.dumps, and status only responses are encoded once per status.
+        """
+        if self.result is None and self.mesg is None:
+            line = _STATUS_LINES.get(self.status)
+            if line is None:
+                line = _STATUS_LINES[self.status] = (str(self) + "\n").encode("ascii")
+            return line
+        text = '{"status": ' + encode_basestring_ascii(self.status)
+        if self.result is not None:
+            text += ', "result": ' + (encode_basestring_ascii(self.result) if type(self.result) is str else json.dumps(self.result))
+        if self.mesg is not None:
+            text += ', "mesg": ' + (encode_basestring_ascii(self.mesg) if type(self.mesg) is str else json.dumps(self.mesg))
+        return (text + "}\n").encode("ascii")
+
+_STATUS_LINES: Dict[str, bytes] = {}
+
+OK = Response("Ok")  # shared by every plain success, responses aren't modified once built
+BUSY = Response("Busy", mesg="Server busy, try again later.")  # the command was not run
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import resource
+
+from typing import Callable, Optional, Tuple
+
+from src.datastore.session import Session, new_session
+from src.handler.parser import CommandParser
+from src.handler.protocol import NegotiatedProtocol
+from src.metrics.metrics import METRICS
+from src.server.logs import REQUEST_LOG
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+class AsyncTCPServer:
+    """Single threaded asyncio server, every connection is a coroutine instead of an OS thread.
+
+    Speaks exactly the same line protocol as TCPServer, through the same CommandParser.
+    """
+
+    def __init__(
+        self, host: str = "0.0.0.0", port: int = 4000, backlog: int = 4096,
+        read_size: int = 64 * 1024, max_line_size: int = 16 * 1024 * 1024, reuse_port: bool = False,
+        max_push_buffer: int = 1024 * 1024,
+    ) -> None:
+        self.host: str = host
+        self.port: int = port
+        self.backlog: int = backlog
+        self.read_size: int = read_size
+        self.max_line_size: int = max_line_size
+        self.reuse_port: bool = reuse_port
+        self.max_push_buffer: int = max_push_buffer  # unread bytes before a subscriber is dropped as too slow
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    def start(self) -> None:
+        """Start the server and block until interrupted."""
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            logging.info("Keyboard interrupt received. Shutting down server...")
+        finally:
+            logging.info("Server stopped.")
+
+    async def serve(self) -> None:
+        """Serve connections until the server is closed."""
+        server = await self.start_serving()
+        async with server:
+            await server.serve_forever()
+
+    async def start_serving(self) -> asyncio.AbstractServer:
+        """Bind the listening socket and start accepting connections in the background."""
+        _raise_open_files_limit()
+        self.server = await asyncio.start_server(
+            self.handle_client, self.host, self.port, backlog=self.backlog, reuse_port=self.reuse_port
+        )
+        self.port = self.server.sockets[0].getsockname()[1]  # in case we asked for port 0
+        logging.info(f"Server started on {self.host}:{self.port} (asyncio)")
+        return self.server
+
+    def stop(self) -> None:
+        """Stops accepting new connections."""
+        if self.server:
+            self.server.close()
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        client_address: Tuple[str, int] = writer.get_extra_info("peername")
+        logging.info(f"New connection from {client_address}")
+
+        session = new_session()  # this task's transactions must not leak into other connections
+        protocol = NegotiatedProtocol(CommandParser(), max_size=self.max_line_size)
+        pushed = asyncio.Event()
+        session.wake = _threadsafe(asyncio.get_running_loop(), pushed.set)
+        pusher = asyncio.create_task(self._push_events(session, writer, pushed))
+        METRICS.connection_opened()
+        try:
+            while not protocol.closed:
+                data: bytes = await reader.read(self.read_size)
+                if not data:
+                    break  # client gone
+                if REQUEST_LOG.sampled():
+                    REQUEST_LOG.log(client_address, data)
+
+                responses: bytes = protocol.feed(data)
+                if responses:
+                    writer.write(responses)  # one write for every pipelined command
+                    await writer.drain()
+                METRICS.record_io(len(data), len(responses))
+        except ConnectionResetError:
+            pass  # woops, just assume connection closed
+        finally:
+            pusher.cancel()
+            if session.subscription is not None:
+                session.subscription.close()
+            METRICS.connection_closed()
+            logging.info(f"Connection closed: {client_address}")
+            writer.close()
+
+    async def _push_events(self, session: Session, writer: asyncio.StreamWriter, pushed: asyncio.Event) -> None:
+        """Writes the SUBSCRIBE events of session as they come, drops the client if it falls behind.
+
+        Never waits for the client to read: a subscription overflowing its buffer, or more than
+        max_push_buffer bytes the client didn't read yet, and it's a slow consumer.
+        """
+        while True:
+            await pushed.wait()
+            pushed.clear()
+            subscription = session.subscription
+            events: bytes = subscription.drain()
+            if events:
+                writer.write(events)
+            if subscription.closed or writer.transport.get_write_buffer_size() > self.max_push_buffer:
+                writer.transport.abort()  # the reader sees the connection go and cleans up
+                return
+
+def _threadsafe(loop: asyncio.AbstractEventLoop, callback: Callable[[], None]) -> Callable[[], None]:
+    """callback, callable from any thread: it's scheduled on loop, dropped once loop is closed."""
+    def call() -> None:
+        try:
+            loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            pass  # the loop is closed, so is the connection
+    return call
+
+def _raise_open_files_limit() -> None:
+    """Every client is a file descriptor, so lift the soft limit as far as the hard limit allows."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError) as e:
+            logging.warning(f"Could not raise open files limit from {soft}: {e}")
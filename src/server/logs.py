@@ -0,0 +1,63 @@
+import logging
+import os
+import random
+import sys
+
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from typing import Optional, Tuple
+
+FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+_listener: Optional[QueueListener] = None
+
+def configure_logging(level: str = "INFO") -> None:
+    """Routes every log record through a queue to a background thread that does the writing.
+
+    Logging from a client thread or the event loop is then a put on an in memory queue,
+    it never waits on stderr (or whatever pipe it's redirected to) under load.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+    queue: SimpleQueue = SimpleQueue()
+    writer = logging.StreamHandler(sys.stderr)
+    writer.setFormatter(logging.Formatter(FORMAT))
+    root = logging.getLogger()
+    root.handlers[:] = [QueueHandler(queue)]  # replaces the synchronous basicConfig handler of the servers
+    root.setLevel(level)
+    _listener = QueueListener(queue, writer, respect_handler_level=True)
+    _listener.start()
+
+def _restart_listener() -> None:
+    """A forked worker inherits the queue but not the thread emptying it."""
+    global _listener
+    if _listener is not None:
+        _listener = QueueListener(_listener.queue, *_listener.handlers, respect_handler_level=True)
+        _listener.start()
+
+os.register_at_fork(after_in_child=_restart_listener)
+
+class RequestLog:
+    """Sampled, structured logging of what clients send, off unless a sample rate is set.
+
+    When off, the hot path pays one attribute check per read. When on, only a random
+    sample_rate fraction of the reads are logged, as key=value pairs at INFO level on the
+    hkv.requests logger.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, max_command_size: int = 200) -> None:
+        self.sample_rate: float = sample_rate
+        self.max_command_size: int = max_command_size
+        self.logger: logging.Logger = logging.getLogger("hkv.requests")
+
+    def sampled(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def log(self, client_address: Tuple[str, int], data: bytes) -> None:
+        command = data[:self.max_command_size].split(b"\n", 1)[0].decode("utf-8", errors="replace")
+        self.logger.info(
+            "request client=%s:%s bytes=%d commands=%d first=%r", *client_address[:2], len(data), data.count(b"\n"), command,
+        )
+
+REQUEST_LOG = RequestLog()
@@ -0,0 +1,330 @@
+import contextvars
+import functools
+import logging
+import queue
+import selectors
+import socket
+import threading
+
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from src.datastore.session import Session, new_session
+from src.handler.parser import CommandParser
+from src.handler.protocol import BUSY_LINE, NegotiatedProtocol
+from src.metrics.metrics import METRICS
+from src.server.async_server import _raise_open_files_limit
+from src.server.logs import REQUEST_LOG
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+class Connection:
+    """A client of the PooledTCPServer: its socket, protocol state and the reads waiting for a worker."""
+
+    def __init__(self, client_socket: socket.socket, address: Tuple[str, int], max_size: int) -> None:
+        self.socket: socket.socket = client_socket
+        self.address: Tuple[str, int] = address
+        self.protocol: NegotiatedProtocol = NegotiatedProtocol(CommandParser(), max_size=max_size)
+        self.context: contextvars.Context = contextvars.Context()  # workers change, the session stays
+        self.session: Session = self.context.run(new_session)
+        self.lock = threading.Lock()
+        self.pending: Deque[bytes] = deque()
+        self.pushed: bool = False  # SUBSCRIBE events wait for a worker to send them
+        self.scheduled: bool = False  # queued for, or being served by, a worker
+        self.reading: bool = True  # registered with the selector
+        self.eof: bool = False  # the client is done sending
+        self.closed: bool = False
+
+class PooledTCPServer:
+    """Fixed size pool of worker threads fed by one selector based I/O thread.
+
+    The I/O thread accepts connections and reads whatever arrives, workers parse and run the
+    commands and write the responses. Nothing grows with the load:
+
+    - at most max_connections clients, the next ones are answered Busy and disconnected;
+    - at most queue_size connections wait for a worker, a read arriving while the queue is full
+      has its commands answered Busy without running them;
+    - at most connection_queue reads wait per connection, past that the client isn't read from
+      until a worker caught up, so TCP pushes back on it.
+
+    A connection is served by one worker at a time, its commands run in order and inside its
+    own contextvars.Context, so sessions and transactions follow the client from worker to worker.
+    SUBSCRIBE events get a subscribed connection scheduled like a read does, its worker sends them.
+    """
+
+    def __init__(
+        self, host: str = "0.0.0.0", port: int = 4000, workers: int = 8, max_connections: int = 1024,
+        queue_size: int = 256, connection_queue: int = 16, backlog: int = 128, read_size: int = 64 * 1024,
+        max_line_size: int = 16 * 1024 * 1024, send_timeout: float = 10.0, reuse_port: bool = False,
+    ) -> None:
+        if workers < 1:
+            raise ValueError("At least one worker thread is needed.")
+        self.host: str = host
+        self.port: int = port
+        self.workers: int = workers
+        self.max_connections: int = max_connections
+        self.connection_queue: int = connection_queue
+        self.backlog: int = backlog
+        self.read_size: int = read_size
+        self.max_line_size: int = max_line_size
+        self.send_timeout: float = send_timeout  # a client not reading its responses for that long is dropped
+        self.server_socket: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.running: bool = False
+        self._queue: "queue.Queue[Optional[Connection]]" = queue.Queue(maxsize=queue_size)
+        self._selector = selectors.DefaultSelector()
+        self._connections: Dict[socket.socket, Connection] = {}
+        self._calls: Deque[Tuple[Callable[[Connection], None], Connection]] = deque()  # from the workers to the I/O thread
+        self._deferred: Set[Connection] = set()  # events to push while the queue was full, retried every tick
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        """Start the server and block until interrupted."""
+        try:
+            self.start_serving()
+            self._threads[0].join()
+        except KeyboardInterrupt:
+            logging.info("Keyboard interrupt received. Shutting down server...")
+        finally:
+            self.stop()
+
+    def start_serving(self) -> None:
+        """Bind the listening socket and start the I/O and worker threads in the background."""
+        _raise_open_files_limit()
+        self.server_socket.bind((self.host, self.port))
+        self.server_socket.listen(self.backlog)
+        self.server_socket.setblocking(False)
+        self.port = self.server_socket.getsockname()[1]  # in case we asked for port 0
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self._selector.register(self.server_socket, selectors.EVENT_READ)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ)
+        self.running = True
+        self._threads = [threading.Thread(target=self._io_loop, name="io", daemon=True)]
+        self._threads += [threading.Thread(target=self._work, name=f"worker-{i}", daemon=True) for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+        logging.info(f"Server started on {self.host}:{self.port} ({self.workers} workers)")
+
+    def stop(self) -> None:
+        """Stops the threads and closes every connection."""
+        if not self.running:
+            return
+        self.running = False
+        self._wake()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=5)
+        self._wakeup_r.close()
+        self._wakeup_w.close()
+        logging.info("Server stopped.")
+
+    # I/O thread, the only one touching the selector and the connection table
+
+    def _io_loop(self) -> None:
+        try:
+            while self.running:
+                for key, _ in self._selector.select(0.01 if self._deferred else None):
+                    if key.fileobj is self.server_socket:
+                        self._accept()
+                    elif key.fileobj is self._wakeup_r:
+                        self._run_calls()
+                    else:
+                        self._read(key.data)
+                for connection in list(self._deferred):
+                    self._deferred.discard(connection)
+                    self._push(connection)
+        except Exception as e:
+            logging.error(f"Server error: {e}")
+        finally:
+            self.running = False
+            for connection in list(self._connections.values()):
+                self._close(connection)
+            self._selector.close()
+            self.server_socket.close()
+            for _ in range(self.workers):
+                self._queue.put(None)  # workers pick these up once the queue drained
+
+    def _accept(self) -> None:
+        try:
+            client_socket, client_address = self.server_socket.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            logging.error(f"Error accepting connection: {e}")
+            return
+        if len(self._connections) >= self.max_connections:
+            METRICS.connection_rejected()
+            _send_now(client_socket, BUSY_LINE)
+            client_socket.close()
+            return
+        logging.info(f"New connection from {client_address}")
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client_socket.settimeout(self.send_timeout)  # reads only happen once the selector said there's data
+        connection = Connection(client_socket, client_address, self.max_line_size)
+        connection.session.wake = functools.partial(self._call_soon, self._push, connection)
+        self._connections[client_socket] = connection
+        self._selector.register(client_socket, selectors.EVENT_READ, connection)
+        METRICS.connection_opened()
+
+    def _read(self, connection: Connection) -> None:
+        try:
+            data: bytes = connection.socket.recv(self.read_size)
+        except (BlockingIOError, InterruptedError, socket.timeout):
+            return
+        except OSError:
+            data = b""  # woops, just assume connection closed
+        if data and REQUEST_LOG.sampled():
+            REQUEST_LOG.log(connection.address, data)
+
+        with connection.lock:
+            if not data:
+                connection.eof = True
+                self._pause(connection)
+                if not connection.scheduled:
+                    self._close(connection)
+                return  # otherwise the worker closes it once the pending reads are answered
+            connection.pending.append(data)
+            if connection.scheduled:
+                if len(connection.pending) >= self.connection_queue:
+                    self._pause(connection)  # its worker resumes reading once it caught up
+                return
+            try:
+                self._queue.put_nowait(connection)
+                connection.scheduled = True
+                return
+            except queue.Full:
+                data = b"".join(connection.pending)
+                connection.pending.clear()
+
+        # every worker is busy and enough connections wait for one: shed this read, the protocol
+        # state is ours as no worker has the connection
+        METRICS.record_busy()
+        responses: bytes = connection.protocol.feed(data, busy=True)
+        if (responses and not _send_now(connection.socket, responses)) or connection.protocol.closed:
+            self._close(connection)
+
+    def _push(self, connection: Connection) -> None:
+        """Gets a worker to send the pending SUBSCRIBE events of connection."""
+        with connection.lock:
+            if connection.closed:
+                return
+            subscription = connection.session.subscription
+            if subscription is not None and subscription.closed:
+                _shutdown(connection.socket)  # slow consumer: fails its worker's send if it's stuck in one
+            connection.pushed = True
+            if connection.scheduled:
+                return  # its worker sends them before handing the connection back
+            try:
+                self._queue.put_nowait(connection)
+                connection.scheduled = True
+                return
+            except queue.Full:
+                pass
+        self._deferred.add(connection)  # events are never answered Busy, they wait for room
+
+    def _pause(self, connection: Connection) -> None:
+        if connection.reading:
+            connection.reading = False
+            self._selector.unregister(connection.socket)
+
+    def _resume(self, connection: Connection) -> None:
+        if not connection.reading and not connection.closed and not connection.eof:
+            connection.reading = True
+            self._selector.register(connection.socket, selectors.EVENT_READ, connection)
+
+    def _close(self, connection: Connection) -> None:
+        if connection.closed:
+            return
+        connection.closed = True
+        self._pause(connection)
+        del self._connections[connection.socket]
+        self._deferred.discard(connection)
+        if connection.session.subscription is not None:
+            connection.session.subscription.close()
+        connection.socket.close()
+        METRICS.connection_closed()
+        logging.info(f"Connection closed: {connection.address}")
+
+    def _run_calls(self) -> None:
+        try:
+            while self._wakeup_r.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        while self._calls:
+            call, connection = self._calls.popleft()
+            call(connection)
+
+    def _call_soon(self, call: Callable[[Connection], None], connection: Connection) -> None:
+        """Runs call in the I/O thread."""
+        self._calls.append((call, connection))
+        self._wake()
+
+    def _wake(self) -> None:
+        try:
+            self._wakeup_w.send(b"\0")
+        except OSError:
+            pass  # already stopping, or the I/O thread has plenty of wake ups pending
+
+    # worker threads
+
+    def _work(self) -> None:
+        while True:
+            connection = self._queue.get()
+            if connection is None:
+                return
+            try:
+                self._serve(connection)
+            except Exception as e:
+                logging.error(f"Error serving {connection.address}: {e}")
+                self._call_soon(self._close, connection)
+
+    def _serve(self, connection: Connection) -> None:
+        """Answers every pending read of connection and sends its events, then hands it back to the I/O thread."""
+        while True:
+            with connection.lock:
+                if not (connection.pending or connection.pushed) or connection.closed:
+                    connection.scheduled = False
+                    done = connection.eof or connection.protocol.closed
+                    break
+                data = b"".join(connection.pending)
+                connection.pending.clear()
+                connection.pushed = False
+            responses: bytes = connection.context.run(connection.protocol.feed, data) if data else b""
+            subscription = connection.session.subscription
+            if subscription is not None:
+                responses += subscription.drain()
+                if subscription.closed:  # too slow to keep up with its events
+                    with connection.lock:
+                        connection.pending.clear()
+                        connection.eof = True
+            if responses:
+                try:
+                    connection.socket.sendall(responses)  # one write for every pipelined command
+                except OSError:  # gone, or not reading its responses for send_timeout
+                    with connection.lock:
+                        connection.pending.clear()
+                        connection.eof = True
+                    continue
+            METRICS.record_io(len(data), len(responses))
+            if connection.protocol.closed:
+                with connection.lock:
+                    connection.pending.clear()  # nothing after exit is answered
+        self._call_soon(self._close if done else self._resume, connection)
+
+def _send_now(client_socket: socket.socket, data: bytes) -> bool:
+    """Sends data without ever blocking the I/O thread, False if it didn't fit in the socket buffer."""
+    try:
+        return client_socket.send(data, socket.MSG_DONTWAIT) == len(data)
+    except OSError:
+        return False
+
+def _shutdown(client_socket: socket.socket) -> None:
+    try:
+        client_socket.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass  # already gone
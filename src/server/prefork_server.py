@@ -0,0 +1,79 @@
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+
+from multiprocessing.connection import Listener
+from typing import Callable, List, Protocol
+
+from src.api.kv_api import KeyValueAPI
+from src.datastore.kv_store_interface import KeyValueStoreInterface
+from src.datastore.store_process import RemoteKeyValueStore, StoreServer
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+class Server(Protocol):
+    def start(self) -> None: ...
+
+class PreforkServer:
+    """Runs several server processes accepting on the same port (SO_REUSEPORT) in front of one store process.
+
+    Parsing and JSON encoding happen in the workers, so they scale with cores instead of
+    sharing one GIL, while the data itself lives once, in the store process. The store is built
+    by make_store in the store process, after the fork: threads a store starts (a write ahead
+    log's fsync thread, a snapshot writer) don't survive a fork, they must run where the data is.
+    """
+
+    def __init__(self, make_store: Callable[[], KeyValueStoreInterface], make_server: Callable[[], Server], workers: int) -> None:
+        if workers < 1:
+            raise ValueError("At least one worker process is needed.")
+        self.make_store: Callable[[], KeyValueStoreInterface] = make_store
+        self.make_server: Callable[[], Server] = make_server  # must listen with reuse_port=True
+        self.workers: int = workers
+        self._context = multiprocessing.get_context("fork")  # children inherit the store listener
+        self._processes: List[multiprocessing.process.BaseProcess] = []
+
+    def start(self) -> None:
+        """Start the store process and the workers, block until interrupted."""
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # take the children down with us
+        authkey = os.urandom(16)
+        listener = Listener(family="AF_UNIX", authkey=authkey)  # bound before forking, workers queue up while the store loads
+        store_process = self._context.Process(target=self._run_store, args=(listener, authkey), name="kv-store", daemon=True)
+        store_process.start()
+        self._processes.append(store_process)
+        logging.info(f"Store process {store_process.pid} serving on {listener.address}")
+
+        for i in range(self.workers):
+            worker = self._context.Process(
+                target=self._run_worker, args=(listener.address, authkey), name=f"kv-worker-{i}", daemon=True
+            )
+            worker.start()
+            self._processes.append(worker)
+            logging.info(f"Worker process {worker.pid} started")
+
+        try:
+            for process in self._processes:
+                process.join()
+        except KeyboardInterrupt:
+            logging.info("Keyboard interrupt received. Shutting down workers...")
+        finally:
+            self.stop()
+            listener.close()
+
+    def stop(self) -> None:
+        """Terminates every child process."""
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            process.join()
+        self._processes.clear()
+        logging.info("Server stopped.")
+
+    def _run_store(self, listener: Listener, authkey: bytes) -> None:
+        StoreServer(self.make_store(), authkey=authkey, listener=listener).serve_forever()
+
+    def _run_worker(self, address: str, authkey: bytes) -> None:
+        KeyValueAPI.configure(RemoteKeyValueStore(address, authkey))
+        self.make_server().start()
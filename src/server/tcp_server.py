@@ -7,11 +7,14 @@ from src.handler.client_handler import ClientHandler
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 class TCPServer:
-    def __init__(self, host: str = "0.0.0.0", port: int = 4000, max_clients: int = 5) -> None:
+    def __init__(self, host: str = "0.0.0.0", port: int = 4000, max_clients: int = 5, reuse_port: bool = False) -> None:
         self.host: str = host
         self.port: int = port
         self.server_socket: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)  # reuse socket if needed
+        if reuse_port:
+            # several worker processes listen on the same port, the kernel balances connections between them
+            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         self.max_clients = max_clients
         self.running = False
 
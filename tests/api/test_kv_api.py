@@ -1,6 +1,8 @@
 import pytest
 from unittest.mock import MagicMock, patch
 from src.api.kv_api import KeyValueAPI
+from src.datastore.key_value_store import KeyValueStore
+from src.datastore.mvcc_key_value_store import MVCCKeyValueStore
 from src.model.response import Response
 
 @pytest.fixture
@@ -67,3 +69,135 @@ def test_rollback_transaction(mock_store):
     assert response.status == "Ok"
     mock_store.rollback.assert_called_once()
 
+
+def test_configure_swaps_store(mock_store):
+    """Test configure() puts the given datastore behind the singleton."""
+    other_store = MagicMock()
+    api = KeyValueAPI.configure(other_store)
+    assert api is KeyValueAPI()
+    assert api.store is other_store
+
+def test_mget(mock_store):
+    """Test that mget() returns the list of values, None included."""
+    mock_store.mget.return_value = ["value1", None]
+    api = KeyValueAPI()
+    response = api.mget(["key1", "key2"])
+    assert response.status == "Ok"
+    assert response.result == ["value1", None]
+    mock_store.mget.assert_called_once_with(["key1", "key2"])
+
+def test_mput(mock_store):
+    """Test that mput() forwards every pair."""
+    api = KeyValueAPI()
+    response = api.mput({"key1": "value1"})
+    assert response.status == "Ok"
+    mock_store.mput.assert_called_once_with({"key1": "value1"})
+
+def test_mdelete(mock_store):
+    """Test that mdelete() returns how many keys were deleted."""
+    mock_store.mdelete.return_value = 1
+    api = KeyValueAPI()
+    response = api.mdelete(["key1", "key2"])
+    assert response.status == "Ok"
+    assert response.result == "1"
+
+def test_put_ex(mock_store):
+    """Test that put_ex() converts the expire time and rejects bad or too large ones."""
+    api = KeyValueAPI()
+    assert api.put_ex("key1", "value1", "10").status == "Ok"
+    mock_store.put_ex.assert_called_once_with("key1", "value1", 10)
+    response = api.put_ex("key1", "value1", "soon")
+    assert response.status == "Error"
+    assert response.mesg == "Expire time must be a whole number of seconds, got 'soon'."
+    response = api.expire("key1", "10" * 20)
+    assert response.status == "Error"
+    assert response.mesg == f"Expire time must be at most 3153600000 seconds, got '{'10' * 20}'."
+    mock_store.expire.assert_not_called()
+
+def test_expire_and_ttl(mock_store):
+    """Test that expire() and ttl() return their results as strings."""
+    mock_store.expire.return_value = False
+    mock_store.ttl.return_value = -2
+    api = KeyValueAPI()
+    response = api.expire("key1", "10")
+    assert (response.status, response.result) == ("Error", "False")
+    mock_store.expire.assert_called_once_with("key1", 10)
+    response = api.ttl("key1")
+    assert (response.status, response.result) == ("Ok", "-2")
+
+def test_incr_amount_is_strict(mock_store):
+    """Test that incr() and decr() only take plain integer amounts."""
+    mock_store.incr.return_value = 5
+    api = KeyValueAPI()
+    assert api.incr("counter", "-3").result == "5"
+    api.decr("counter", "2")
+    assert mock_store.incr.call_args_list == [(("counter", -3),), (("counter", -2),)]
+    for amount in ["1_000", " 5 ", "+5", "1.5"]:
+        response = api.incr("counter", amount)
+        assert (response.status, response.mesg) == ("Error", f"Increment must be a whole number, got '{amount}'.")
+    assert mock_store.incr.call_count == 2
+
+def test_scan_and_prefix(mock_store):
+    """Test scan() maps - and + to open ends and prefix() turns the prefix into a range."""
+    mock_store.scan.return_value = ([("user:1", "value1")], "user:2")
+    api = KeyValueAPI()
+    response = api.scan("-", "+", "50000")
+    assert response.result == ["user:2", [["user:1", "value1"]]]
+    mock_store.scan.assert_called_once_with(None, None, 10_000)
+    api.prefix("user:", 10, "user:2")
+    mock_store.scan.assert_called_with("user:2", "user;", 10)
+    assert api.scan("a", "b", "0").mesg == "LIMIT must be at least 1."
+
+def test_load_and_dump(mock_store):
+    """Test load() validates the JSON records and dump() maps - to the first key."""
+    mock_store.load.return_value = 2
+    mock_store.dump.return_value = ([("key1", "value1", None)], "key2")
+    api = KeyValueAPI()
+    response = api.load('[["key1", "value1"], ["key2", "value2", 1900000000]]')
+    assert (response.status, response.result) == ("Ok", "2")
+    mock_store.load.assert_called_once_with([("key1", "value1", None), ("key2", "value2", 1900000000.0)])
+    assert api.dump("-", "10").result == ["key2", [["key1", "value1", None]]]
+    mock_store.dump.assert_called_once_with(None, 10)
+    assert api.load("not json").mesg == "LOAD takes a JSON list of [key, value, deadline] records."
+    assert api.load('[["key1", 1]]').mesg == 'Records are [key, value, deadline], got ["key1", 1].'
+    assert api.load('[["key1", "value1", "soon"]]').mesg == 'Deadlines are unix times or null, got "soon".'
+    assert api.load('[["key1", "value1", "inf"]]').mesg == 'Deadlines are unix times or null, got "inf".'
+    assert api.load('[["key1", "value1", NaN]]').mesg == 'Deadlines are unix times or null, got NaN.'
+    assert mock_store.load.call_count == 1
+    assert api.load('[["b c", "value1"]]').mesg == 'Keys can\'t be empty or contain whitespace, got "b c".'
+    assert api.load('[["", "value1"]]').mesg == 'Keys can\'t be empty or contain whitespace, got "".'
+
+def test_stats(mock_store):
+    """Test stats() counts API calls and includes what the store reports."""
+    mock_store.stats.return_value = {"evicted_keys": 3}
+    api = KeyValueAPI()
+    api.get("key1")
+    stats = api.stats().result
+    assert stats["commands"]["get"]["calls"] >= 1
+    assert stats["store"] == {"evicted_keys": 3}
+
+def test_cluster_redirects_foreign_keys(mock_store):
+    """Test a cluster node answers Moved for keys it doesn't own, before touching the store."""
+    cluster = MagicMock(address="127.0.0.1:4000")
+    cluster.route.side_effect = lambda keys: {"127.0.0.1:4001" if key.startswith("b") else "127.0.0.1:4000" for key in keys}
+    api = KeyValueAPI()
+    api.cluster = cluster
+    moved = api.put("b1", "value1")
+    assert (moved.status, moved.result, moved.mesg) == ("Moved", "127.0.0.1:4001", "Owned by 127.0.0.1:4001.")
+    mock_store.put.assert_not_called()
+    assert api.mget(["a1", "b1"]).status == "Moved"
+    assert api.put("a1", "value1").status == "Ok"
+    mock_store.put.assert_called_once_with("a1", "value1")
+    assert api.cluster_info().status == "Ok"
+    KeyValueAPI.configure_cluster(None)
+    assert api.cluster_info().mesg == "Cluster mode is off, start the server with --cluster."
+
+def test_subscribe_needs_the_dict_store():
+    """Test SUBSCRIBE is refused by stores that don't notify their writes."""
+    api = KeyValueAPI.configure(MVCCKeyValueStore())
+    try:
+        response = api.subscribe(["key1"])
+        assert response.status == "Error"
+        assert response.mesg == "SUBSCRIBE needs the dict store, without --workers."
+    finally:
+        KeyValueAPI.configure(KeyValueStore())
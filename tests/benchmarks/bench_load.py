@@ -0,0 +1,196 @@
+"""Load generator: throughput and latency of a real server under many pipelining clients.
+
+Starts the server (python -m src.main on a free port) in its own process, unless --connect
+points at one that is already running, then drives it from several client processes, each
+one running many asyncio connections. Every connection sends --pipeline operations per
+write, picked at random from the --mix, and times each one from the write to its answer.
+
+Reports operations per second and the p50/p99/p999 latency of every kind of operation, and
+saves everything, histograms included, as JSON in bench_results/ to compare commits.
+
+Usage: python -m tests.benchmarks.bench_load [--mix get=80,put=15,del=4,txn=1] [--clients 64]
+           [--pipeline 16] [--duration 10] [--server-args "--mode asyncio --store sharded"]
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import time
+
+from typing import Dict, List, Tuple
+
+OPERATIONS = ("get", "put", "del", "txn")
+
+def commands(operation: str, rng: random.Random, keys: int, value: str) -> List[bytes]:
+    """The text commands of one operation, a transaction is four of them."""
+    key = f"key{rng.randrange(keys)}"
+    if operation == "get":
+        return [f"GET {key}\n".encode()]
+    if operation == "put":
+        return [f"PUT {key} {value}\n".encode()]
+    if operation == "del":
+        return [f"DEL {key}\n".encode()]
+    return [b"START\n", f"PUT {key} {value}\n".encode(), f"PUT key{rng.randrange(keys)} {value}\n".encode(), b"COMMIT\n"]
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name}' in --mix. Available operations: {', '.join(OPERATIONS)}")
+        weights[name] = float(weight)
+    return weights
+
+async def connection(host: str, port: int, args: argparse.Namespace, seed: int, deadline: float, warmup_end: float,
+                     latencies: Dict[str, List[float]], errors: List[int]) -> None:
+    rng = random.Random(seed)
+    names, weights = zip(*parse_mix(args.mix).items())
+    value = "v" * args.value_size
+    reader, writer = await asyncio.open_connection(host, port, limit=16 * 1024 * 1024)
+    while time.perf_counter() < deadline:
+        batch = [(name, commands(name, rng, args.keys, value)) for name in rng.choices(names, weights, k=args.pipeline)]
+        sent = time.perf_counter()
+        writer.write(b"".join(command for _, parts in batch for command in parts))
+        await writer.drain()
+        for name, parts in batch:
+            for _ in parts:
+                line = await reader.readline()
+                if b'"Error"' in line:
+                    errors[0] += 1
+            if sent >= warmup_end:
+                latencies[name].append(time.perf_counter() - sent)
+    writer.write(b"EXIT\n")
+    writer.close()
+
+def client_process(host: str, port: int, args: argparse.Namespace, first: int, count: int, started: float) -> Tuple[Dict[str, List[float]], int]:
+    """Runs count connections in one event loop, returns their latencies (seconds) and error count."""
+    latencies: Dict[str, List[float]] = {name: [] for name in OPERATIONS}
+    errors = [0]
+
+    async def run() -> None:
+        deadline = started + args.warmup + args.duration
+        await asyncio.gather(*(
+            connection(host, port, args, first + i, deadline, started + args.warmup, latencies, errors) for i in range(count)
+        ))
+
+    asyncio.run(run())
+    return latencies, errors[0]
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)] if ordered else 0.0
+
+def histogram(ordered: List[float]) -> Dict[str, int]:
+    """Counts per power of two bucket, in microseconds: {"64": n} means 32us < latency <= 64us."""
+    buckets: Dict[str, int] = {}
+    for latency in ordered:
+        bucket = str(2 ** max(math.ceil(math.log2(max(latency * 1e6, 1))), 0))
+        buckets[bucket] = buckets.get(bucket, 0) + 1
+    return buckets
+
+def summarize(latencies: List[float], duration: float) -> Dict[str, object]:
+    ordered = sorted(latencies)
+    return {
+        "ops": len(ordered),
+        "ops_per_sec": round(len(ordered) / duration, 1),
+        "p50_us": round(percentile(ordered, 0.50) * 1e6, 1),
+        "p99_us": round(percentile(ordered, 0.99) * 1e6, 1),
+        "p999_us": round(percentile(ordered, 0.999) * 1e6, 1),
+        "max_us": round(ordered[-1] * 1e6, 1) if ordered else 0.0,
+        "histogram_us": histogram(ordered),
+    }
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for_server(host: str, port: int, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mix", default="get=80,put=15,del=4,txn=1", help="Relative weights of get, put, del and txn operations.")
+    parser.add_argument("--clients", type=int, default=64, help="Concurrent connections.")
+    parser.add_argument("--processes", type=int, default=min(os.cpu_count() or 1, 4), help="Client processes the connections are spread over.")
+    parser.add_argument("--pipeline", type=int, default=16, help="Operations sent per write.")
+    parser.add_argument("--duration", type=float, default=10, help="Measured seconds.")
+    parser.add_argument("--warmup", type=float, default=1, help="Seconds of load before measuring.")
+    parser.add_argument("--keys", type=int, default=100_000, help="Size of the key space.")
+    parser.add_argument("--value-size", type=int, default=100, help="Characters per value.")
+    parser.add_argument("--server-args", default="", help="Extra arguments for python -m src.main, e.g. \"--mode asyncio\".")
+    parser.add_argument("--connect", default=None, help="host:port of a running server, instead of starting one.")
+    parser.add_argument("--output", default="bench_results", help="Directory the JSON results are saved in.")
+    args = parser.parse_args()
+    parse_mix(args.mix)  # fail before starting anything
+
+    server = None
+    if args.connect:
+        host, _, port = args.connect.rpartition(":")
+        port = int(port)
+    else:
+        host, port = "127.0.0.1", free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "src.main", "--host", host, "--port", str(port), *shlex.split(args.server_args)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+    try:
+        wait_for_server(host, port)
+        processes = max(1, min(args.processes, args.clients))
+        shares = [args.clients // processes + (i < args.clients % processes) for i in range(processes)]
+        started = time.perf_counter() + 0.5  # every process starts its clock at the same time
+        with multiprocessing.get_context("spawn").Pool(processes) as pool:
+            results = pool.starmap(client_process, [
+                (host, port, args, sum(shares[:i]), share, started) for i, share in enumerate(shares)
+            ])
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    latencies: Dict[str, List[float]] = {name: [] for name in OPERATIONS}
+    for process_latencies, _ in results:
+        for name, values in process_latencies.items():
+            latencies[name].extend(values)
+    report = {
+        "revision": git_revision(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "errors": sum(errors for _, errors in results),
+        "total": summarize([latency for values in latencies.values() for latency in values], args.duration),
+        "operations": {name: summarize(values, args.duration) for name, values in latencies.items() if values},
+    }
+
+    print(f"{'operation':>10} {'ops/s':>12} {'p50 (us)':>10} {'p99 (us)':>10} {'p999 (us)':>10}")
+    for name, summary in [*report["operations"].items(), ("total", report["total"])]:
+        print(f"{name:>10} {summary['ops_per_sec']:>12,.0f} {summary['p50_us']:>10} {summary['p99_us']:>10} {summary['p999_us']:>10}")
+    print(f"error responses: {report['errors']} (DEL of a missing key counts as one)")
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{time.strftime('%Y%m%d-%H%M%S')}-{report['revision']}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"saved {path}")
+
+if __name__ == "__main__":
+    main()
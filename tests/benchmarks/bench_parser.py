@@ -0,0 +1,58 @@
+"""Text protocol micro-benchmark: time to parse, dispatch and encode the response of one command.
+
+Usage: python -m tests.benchmarks.bench_parser [--ops 200000] [--repeat 5]
+
+Runs CommandParser.execute in process against an in memory store, no sockets, and prints the
+best ns/op of the repeats for each command so changes to the parser or Response can be compared.
+"""
+import argparse
+import time
+
+from typing import Dict, List
+
+from src.api.kv_api import KeyValueAPI
+from src.datastore.key_value_store import KeyValueStore
+from src.handler.parser import CommandParser
+
+COMMANDS: Dict[str, List[str]] = {
+    "GET": ["GET key1"],
+    "GET missing": ["GET missing"],
+    "PUT": ["PUT key1 some value"],
+    "PUTEX": ["PUTEX key2 3600 value"],
+    "MGET 10": ["MGET " + " ".join(f"key{i}" for i in range(10))],
+    "MPUT 10": ["MPUT " + " ".join(f"key{i} value{i}" for i in range(10))],
+    "INCR": ["INCR counter"],
+    "START+COMMIT": ["START", "PUT key3 value", "COMMIT"],
+    "usage error": ["GET"],
+    "unknown": ["NOPE key1"],
+}
+
+def run(parser: CommandParser, commands: List[str], ops: int, repeat: int) -> float:
+    """Best ns per command over repeat runs of ops commands."""
+    batch = commands * (ops // len(commands))
+    execute = parser.execute
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        for command in batch:
+            execute(command)
+        best = min(best, (time.perf_counter_ns() - started) / len(batch))
+    return best
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=200_000, help="Commands per run.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per command, the best one is kept.")
+    args = parser.parse_args()
+
+    store = KeyValueStore()
+    store.mput({f"key{i}": f"value{i}" for i in range(10)})
+    KeyValueAPI.configure(store)
+    command_parser = CommandParser()
+
+    print(f"{'command':>14} {'ns/op':>10}")
+    for name, commands in COMMANDS.items():
+        print(f"{name:>14} {run(command_parser, commands, args.ops, args.repeat):>10,.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Cold start benchmark: time until a restarted durable store answers its first GET.
+
+Compares opening the mapped snapshot (what DurableKeyValueStore does) with loading every pair
+into a dict first (what a text snapshot would need), for growing dataset sizes.
+
+Usage: python -m tests.benchmarks.bench_snapshot_startup [--sizes 10000,100000,1000000]
+"""
+import argparse
+import logging
+import tempfile
+import time
+
+from src.datastore.durable_key_value_store import DurableKeyValueStore
+from src.datastore.snapshot import read_snapshot, write_snapshot
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma separated numbers of keys.")
+    parser.add_argument("--value-size", type=int, default=100, help="Bytes per value.")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print(f"{'keys':>10} {'mapped (ms)':>12} {'full load (ms)':>15}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as directory:
+            value = "v" * args.value_size
+            write_snapshot(directory, 1, ((f"key{i}", value) for i in range(size)))
+
+            started = time.perf_counter()
+            store = DurableKeyValueStore(directory, fsync="never")
+            assert store.get(f"key{size // 2}") == value
+            mapped = time.perf_counter() - started
+            store.close()
+
+            started = time.perf_counter()
+            data = dict(read_snapshot(directory, 1))
+            assert data[f"key{size // 2}"] == value
+            full = time.perf_counter() - started
+
+            print(f"{size:>10,} {mapped * 1000:>12.2f} {full * 1000:>15.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Lock contention benchmark: store throughput as the number of client threads grows.
+
+Usage: python -m tests.benchmarks.bench_store_contention [--clients 1,2,4,8,16] [--ops 20000]
+"""
+import argparse
+import random
+import threading
+import time
+
+from typing import Callable, Dict, List
+
+from src.datastore.key_value_store import KeyValueStore
+from src.datastore.kv_store_interface import KeyValueStoreInterface
+from src.datastore.sharded_key_value_store import ShardedKeyValueStore
+
+def run(store: KeyValueStoreInterface, clients: int, ops: int, keys: int, write_ratio: float) -> float:
+    """Runs ops operations per client thread, returns the aggregate operations per second."""
+    barrier = threading.Barrier(clients + 1)
+
+    def client(seed: int) -> None:
+        rng = random.Random(seed)
+        names = [f"key{rng.randrange(keys)}" for _ in range(ops)]
+        writes = [rng.random() < write_ratio for _ in range(ops)]
+        barrier.wait()
+        for name, write in zip(names, writes):
+            if write:
+                store.put(name, "value")
+            else:
+                store.get(name)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    return clients * ops / (time.perf_counter() - started)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", default="1,2,4,8,16", help="Comma separated client thread counts.")
+    parser.add_argument("--ops", type=int, default=20000, help="Operations per client.")
+    parser.add_argument("--keys", type=int, default=10000, help="Size of the key space.")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="Fraction of operations that are PUTs.")
+    parser.add_argument("--shards", type=int, default=16, help="Shards of the sharded store.")
+    args = parser.parse_args()
+
+    factories: Dict[str, Callable[[], KeyValueStoreInterface]] = {
+        "dict": KeyValueStore,
+        f"sharded({args.shards})": lambda: ShardedKeyValueStore(args.shards),
+    }
+    counts: List[int] = [int(c) for c in args.clients.split(",")]
+
+    print(f"{'clients':>8} " + " ".join(f"{name:>16}" for name in factories) + "   (ops/s)")
+    for clients in counts:
+        results = [run(factory(), clients, args.ops, args.keys, args.write_ratio) for factory in factories.values()]
+        print(f"{clients:>8} " + " ".join(f"{ops:>16,.0f}" for ops in results))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Memory benchmark: bytes per entry of the dict store against the compact store.
+
+Fills each store with the same small entries and measures what they allocated with
+tracemalloc, which sees Python objects, dicts, bytearrays and arrays alike.
+
+Usage: python -m tests.benchmarks.bench_store_memory [--keys 1000000] [--value-size 16]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from src.datastore.compact_key_value_store import CompactKeyValueStore
+from src.datastore.key_value_store import KeyValueStore
+
+def fill(factory, keys: int, value_size: int, batch: int = 1000):
+    store = factory()
+    for first in range(0, keys, batch):
+        store.mput({f"user:{i}:name": f"{i:0{value_size}d}" for i in range(first, min(first + batch, keys))})
+    assert store.get(f"user:{keys // 2}:name") == f"{keys // 2:0{value_size}d}"
+    return store
+
+def measure(factory, keys: int, value_size: int):
+    """Returns (bytes allocated, seconds to fill) for a store filled with keys entries."""
+    started = time.perf_counter()
+    fill(factory, keys, value_size)
+    elapsed = time.perf_counter() - started  # timed without tracemalloc, it slows allocations down a lot
+
+    gc.collect()
+    tracemalloc.start()
+    store = fill(factory, keys, value_size)
+    gc.collect()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    return allocated, elapsed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=1_000_000, help="Number of entries.")
+    parser.add_argument("--value-size", type=int, default=16, help="Characters per value.")
+    args = parser.parse_args()
+
+    stores = {
+        "dict": KeyValueStore,
+        "compact": CompactKeyValueStore,
+        "compact+zlib": lambda: CompactKeyValueStore(compress_threshold=64),
+    }
+    print(f"{'store':>14} {'MiB':>10} {'bytes/entry':>12} {'fill (s)':>10}")
+    for name, factory in stores.items():
+        allocated, elapsed = measure(factory, args.keys, args.value_size)
+        print(f"{name:>14} {allocated / 2 ** 20:>10.1f} {allocated / args.keys:>12.1f} {elapsed:>10.2f}")
+
+if __name__ == "__main__":
+    main()
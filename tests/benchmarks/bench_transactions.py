@@ -0,0 +1,64 @@
+"""Nested transaction benchmark: reads, nested commits and rollbacks as the nesting depth grows.
+
+Usage: python -m tests.benchmarks.bench_transactions [--depths 1,2,5,10,20,50] [--keys 100] [--ops 100000]
+
+Opens depth nested transactions on a KeyValueStore, each writing --keys keys, then measures
+in ns/op: GET of a key only the outermost level wrote, GET of a key no level touched, and a
+nested START + 10 PUTs + COMMIT or ROLLBACK on top of the stack.
+"""
+import argparse
+import time
+
+from typing import Callable, List
+
+from src.datastore.key_value_store import KeyValueStore
+from src.datastore.session import new_session
+
+def timed(operation: Callable[[], None], ops: int) -> float:
+    """Nanoseconds per call of operation."""
+    started = time.perf_counter_ns()
+    for _ in range(ops):
+        operation()
+    return (time.perf_counter_ns() - started) / ops
+
+def run(depth: int, keys: int, ops: int) -> List[float]:
+    new_session()
+    store = KeyValueStore()
+    store.mput({f"committed{i}": "value" for i in range(keys)})
+    for level in range(depth):
+        store.start()
+        for i in range(keys):
+            store.put(f"key{i}" if level else f"outer{i}", f"level{level}")
+
+    def nested(close: Callable[[], None]) -> Callable[[], None]:
+        def operation() -> None:
+            store.start()
+            for i in range(10):
+                store.put(f"key{i}", "nested")
+            close()
+        return operation
+
+    results = [
+        timed(lambda: store.get("outer0"), ops),
+        timed(lambda: store.get("committed0"), ops),
+        timed(nested(store.commit), ops // 10),
+        timed(nested(store.rollback), ops // 10),
+    ]
+    for _ in range(depth):
+        store.rollback()
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depths", default="1,2,5,10,20,50", help="Comma separated nesting depths.")
+    parser.add_argument("--keys", type=int, default=100, help="Keys written by every level.")
+    parser.add_argument("--ops", type=int, default=100_000, help="Reads per measurement, a tenth as many nested transactions.")
+    args = parser.parse_args()
+
+    print(f"{'depth':>6} {'get outer':>12} {'get committed':>14} {'nested commit':>14} {'nested rollback':>16}   (ns/op)")
+    for depth in (int(d) for d in args.depths.split(",")):
+        outer, committed, commit, rollback = run(depth, args.keys, args.ops)
+        print(f"{depth:>6} {outer:>12,.0f} {committed:>14,.0f} {commit:>14,.0f} {rollback:>16,.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.api.kv_api import KeyValueAPI
+from src.client.async_client import AsyncClient
+from src.client.client import Client
+from src.datastore.key_value_store import KeyValueStore
+from src.server.async_server import AsyncTCPServer
+
+@pytest.fixture
+def address():
+    """Fixture serving a fresh store from an asyncio server on a background thread."""
+    KeyValueAPI.configure(KeyValueStore())
+    server = AsyncTCPServer(host="127.0.0.1", port=0)
+    started = threading.Event()
+    loops = []
+
+    async def serve():
+        loops.append(asyncio.get_running_loop())
+        await server.start_serving()
+        started.set()
+        try:
+            await server.server.serve_forever()
+        except asyncio.CancelledError:
+            pass  # stopped
+
+    thread = threading.Thread(target=asyncio.run, args=(serve(),), daemon=True)
+    thread.start()
+    assert started.wait(5)
+    yield f"127.0.0.1:{server.port}"
+    loops[0].call_soon_threadsafe(server.stop)
+    thread.join()
+    KeyValueAPI.configure(KeyValueStore())
+
+@pytest.fixture
+def client(address):
+    client = Client(address, pool_size=2)
+    yield client
+    client.close()
+
+def test_commands(client):
+    """Test every command decodes its result."""
+    client.put("key1", "a value with spaces")
+    assert client.get("key1") == "a value with spaces"
+    assert client.get("missing") is None
+    client.put("key2", "value2", ex=100)
+    assert 0 < client.ttl("key2") <= 100
+    assert client.expire("missing", 10) is False
+    client.mput({"key3": "value3", "key4": "value4"})
+    assert client.mget(["key3", "missing", "key4"]) == ["value3", None, "value4"]
+    assert client.scan("key2", "key4") == ([("key2", "value2"), ("key3", "value3")], None)
+    assert client.prefix("key", limit=1) == ([("key1", "a value with spaces")], "key2")
+    assert client.mdelete(["key3", "key4", "missing"]) == 2
+    assert client.delete("key1") is True
+    assert client.delete("key1") is False
+    assert "commands" in client.stats()
+
+def test_arguments_are_checked_before_sending(client):
+    """Test arguments the text protocol can't carry are refused client side."""
+    with pytest.raises(ValueError):
+        client.put("two words", "value")
+    with pytest.raises(ValueError):
+        client.put("key1", "two\nlines")
+    with pytest.raises(ValueError):
+        client.mput({"key1": "no spaces in batches"})
+
+def test_pool_reuses_connections(client):
+    """Test sequential calls share one connection, concurrent ones wait for the pool."""
+    for _ in range(10):
+        client.get("key1")
+    assert client.pool._opened == 1
+    threads = [threading.Thread(target=lambda: [client.put(f"key{i}", "value") for i in range(50)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.pool._opened <= 2
+
+def test_pipeline(client):
+    """Test a pipeline returns every result in order, and errors when asked to."""
+    pipeline = client.pipeline().put("key1", "value1").get("key1").ttl("key1").expire("missing", 1)
+    assert pipeline.execute() == [None, "value1", -1, False]
+    results = client.pipeline().get("key1").put("key1", "value1", ex=-1).execute(raise_on_error=False)
+    assert results[0] == "value1" and isinstance(results[1], RuntimeError)
+    with pytest.raises(RuntimeError):
+        client.pipeline().put("key1", "value1", ex=-1).execute()
+
+def test_batch_helpers(client):
+    """Test the *_many helpers split big batches."""
+    client.batch_size = 7
+    items = {f"key{i}": f"value{i}" for i in range(50)}
+    client.put_many(items)
+    assert client.get_many(list(items)) == items
+    assert client.delete_many(list(items) + ["missing"]) == 50
+
+def test_transaction(client):
+    """Test a transaction commits at the end of its block and rolls back when it raises."""
+    with client.transaction() as txn:
+        txn.put("key1", "value1")
+        assert txn.get("key1") == "value1"
+        assert client.get("key1") is None  # other connections don't see it yet
+    assert client.get("key1") == "value1"
+    with pytest.raises(KeyError):
+        with client.transaction() as txn:
+            txn.put("key1", "changed")
+            raise KeyError("oops")
+    assert client.get("key1") == "value1"
+    assert len(client.pool._idle) == client.pool._opened  # rolled back cleanly, the connection went back to the pool
+
+def test_discarded_connection_wakes_a_waiter(address):
+    """Test a caller waiting on a full pool opens a new connection as soon as one is discarded."""
+    client = Client(address, pool_size=1, timeout=None)
+    holding, done = threading.Event(), threading.Event()
+
+    def fail_while_holding():
+        with pytest.raises(OSError):
+            with client.pool.connection():
+                holding.set()
+                done.wait(5)
+                raise OSError("broken")
+
+    thread = threading.Thread(target=fail_while_holding)
+    thread.start()
+    assert holding.wait(5)
+    waiter = threading.Thread(target=lambda: client.put("key1", "value1"))
+    waiter.start()
+    done.set()
+    waiter.join(5)
+    thread.join()
+    assert not waiter.is_alive()
+    assert client.get("key1") == "value1"
+    client.close()
+
+def test_async_client(address):
+    """Test the asyncio client, its pipeline and its transactions."""
+    async def scenario():
+        async with AsyncClient(address, pool_size=4) as client:
+            await asyncio.gather(*(client.put(f"key{i}", f"value{i}") for i in range(20)))
+            assert client.pool._opened <= 4
+            assert await client.get("key3") == "value3"
+            assert await client.pipeline().get("key1").delete("key1").get("key1").execute() == ["value1", True, None]
+            async with client.transaction() as txn:
+                await txn.put("key2", "changed")
+            assert await client.get("key2") == "changed"
+            with pytest.raises(RuntimeError):
+                async with client.transaction() as txn:
+                    await txn.put("key2", "rolled back")
+                    raise RuntimeError("oops")
+            assert await client.get("key2") == "changed"
+            assert len(client.pool._idle) == client.pool._opened  # the rolled back transaction kept its connection
+            assert await client.get_many(["key4", "missing"]) == {"key4": "value4", "missing": None}
+    asyncio.run(scenario())
+
+def test_counters_and_watched_transactions(client):
+    """Test INCR/CAS from the client, and a watched transaction failing on a concurrent write."""
+    assert client.incr("counter", 5) == 5
+    assert client.decr("counter") == 4
+    assert client.cas("counter", "4", "40") is True
+    assert client.cas("counter", "4", "41") is False
+    client.put("name", "bob")
+    with pytest.raises(RuntimeError, match="not an integer"):
+        client.incr("name")
+    with pytest.raises(RuntimeError, match="Transaction conflict"):
+        with client.transaction(watch=["counter"]) as txn:
+            value = int(txn.get("counter"))
+            client.put("counter", "0")  # another connection of the pool
+            txn.put("counter", str(value + 1))
+    assert client.get("counter") == "0"
+    assert client.pool._opened == 2 and len(client.pool._idle) == 2  # a conflict doesn't cost a connection
+
+def test_subscribe(client):
+    """Test a subscriber gets the changes of its keys, a transaction as one change set."""
+    with client.subscribe(["config", "user:*"], timeout=5) as subscriber:
+        client.put("config", "v1")
+        client.put("other", "ignored")
+        with client.transaction() as txn:
+            txn.put("user:1", "alice")
+            txn.delete("config")
+        assert subscriber.get() == {"config": "v1"}
+        assert subscriber.get() == {"user:1": "alice", "config": None}
+        assert subscriber.unsubscribe(["config"]) == 1
+        client.put("config", "v2")
+        client.put("user:2", "bob")
+        assert subscriber.get() == {"user:2": "bob"}
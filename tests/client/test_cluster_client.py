@@ -0,0 +1,94 @@
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from src.client.cluster_client import ClusterClient
+from src.client.connection import Connection
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_node(port, ring):
+    return subprocess.Popen(
+        [sys.executable, "-m", "src.main", "--host", "127.0.0.1", "--port", str(port), "--cluster", ",".join(ring)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+@pytest.fixture
+def cluster():
+    """Three nodes in their own processes, plus room for a fourth one."""
+    ports = [free_port() for _ in range(4)]
+    nodes = [f"127.0.0.1:{port}" for port in ports]
+    processes = [start_node(port, nodes[:3]) for port in ports]  # the fourth one isn't in the ring yet
+    try:
+        client = None
+        for _ in range(200):
+            try:
+                client = ClusterClient(nodes[:3])
+                client.wait_rebalanced(nodes=nodes)  # every node answers
+                break
+            except (OSError, RuntimeError):
+                if client is not None:
+                    client.close()
+                client = None
+                time.sleep(0.05)
+        assert client is not None, "cluster didn't start"
+        yield client, nodes
+        client.close()
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+def test_commands_go_to_the_owner(cluster):
+    """Test the client spreads keys over the nodes and each node only holds its own."""
+    client, nodes = cluster
+    client.mput({f"key{i}": f"value{i}" for i in range(300)})
+    client.put("spaced", "a value with spaces", ex=100)
+    assert client.mget([f"key{i}" for i in range(300)]) == [f"value{i}" for i in range(300)]
+    assert client.get("spaced") == "a value with spaces"
+    assert 0 < client.ttl("spaced") <= 100
+    assert client.get("missing") is None
+    assert client.delete("key0") is True
+    assert client.delete("key0") is False
+    with pytest.raises(ValueError, match="spaces in a batch"):
+        client.mput({"k1": "a b", "k2": "c d"})  # would store k1=a, b=k2 and c=d
+    with pytest.raises(ValueError, match="newlines"):
+        client.put("key1", "two\nlines")
+    with pytest.raises(ValueError, match="whitespace"):
+        client.mget(["key1", "a key"])
+    assert client.mget(["k1", "b", "key1"]) == [None, None, "value1"]
+
+    owner = client.ring.owner("key1")
+    other = next(node for node in nodes[:3] if node != owner)
+    connection = Connection(other)
+    assert connection.call("GET key1") == {"status": "Moved", "result": owner, "mesg": f"Owned by {owner}."}
+    connection.close()
+
+def test_adding_a_node_rebalances_online(cluster):
+    """Test keys stay readable and writable while a fourth node joins, and it ends up with its share."""
+    client, nodes = cluster
+    items = {f"key{i}": f"value{i}" for i in range(2000)}
+    client.mput(items)
+
+    client.add_node(nodes[3])
+    client.put("key1", "new value")  # may land before its import
+    items["key1"] = "new value"
+    assert client.mget(list(items)) == list(items.values())
+    client.wait_rebalanced()
+
+    assert client.mget(list(items)) == list(items.values())
+    moved = [key for key in items if client.ring.owner(key) == nodes[3]]
+    assert 200 < len(moved) < 1000
+    connection = Connection(nodes[3])
+    assert connection.call("MGET " + " ".join(moved))["result"] == [items[key] for key in moved]
+    connection.close()
+
+    stale = ClusterClient(nodes[:1])  # learns about the new node from the redirects
+    assert stale.mget(list(items)) == list(items.values())
+    stale.close()
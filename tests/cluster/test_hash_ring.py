@@ -0,0 +1,34 @@
+import pytest
+
+from src.cluster.hash_ring import HashRing
+
+NODES = ["127.0.0.1:4000", "127.0.0.1:4001", "127.0.0.1:4002"]
+
+def test_keys_are_spread_over_every_node():
+    """Test every node gets a fair share of the keys."""
+    ring = HashRing(NODES)
+    counts = {node: 0 for node in NODES}
+    for i in range(30_000):
+        counts[ring.owner(f"key{i}")] += 1
+    assert all(7_000 < count < 13_000 for count in counts.values())
+
+def test_owner_is_stable():
+    """Test the owner doesn't depend on the order of the nodes or on the process."""
+    assert HashRing(NODES).owner("key1") == HashRing(NODES[::-1]).owner("key1")
+    assert HashRing(NODES) == HashRing(NODES[::-1])
+
+def test_adding_a_node_only_moves_keys_to_it():
+    """Test a joining node takes about its share of the keys, and only from the others."""
+    before, after = HashRing(NODES), HashRing([*NODES, "127.0.0.1:4003"])
+    moved = 0
+    for i in range(20_000):
+        old, new = before.owner(f"key{i}"), after.owner(f"key{i}")
+        if old != new:
+            assert new == "127.0.0.1:4003"
+            moved += 1
+    assert 3_000 < moved < 7_000
+
+def test_empty_ring():
+    """Test a ring needs nodes."""
+    with pytest.raises(ValueError):
+        HashRing([])
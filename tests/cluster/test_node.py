@@ -0,0 +1,107 @@
+import time
+
+import pytest
+
+from src.cluster.hash_ring import HashRing
+from src.cluster.node import ClusterNode
+from src.datastore.key_value_store import KeyValueStore
+
+A, B = "127.0.0.1:4000", "127.0.0.1:4001"
+
+def keys_of(ring, node, count):
+    keys = (f"key{i}" for i in range(10_000))
+    return [key for key in keys if ring.owner(key) == node][:count]
+
+@pytest.fixture
+def node():
+    return ClusterNode(KeyValueStore(), A, [A, B])
+
+def test_route(node):
+    """Test route answers the owners of the keys."""
+    a_key, b_key = keys_of(node.ring, A, 1)[0], keys_of(node.ring, B, 1)[0]
+    assert node.route([a_key]) == {A}
+    assert node.route([b_key]) == {B}
+    assert node.route([a_key, b_key]) == {A, B}
+
+def test_take_hands_over_keys_in_batches(node):
+    """Test take pages through the keys of the requester, forget then deletes them."""
+    store = node.store
+    b_keys = keys_of(node.ring, B, 30)
+    a_keys = keys_of(node.ring, A, 30)
+    store.mput({key: f"value_{key}" for key in a_keys + b_keys})
+    store.put_ex(b_keys[0], "expiring", 100)
+
+    taken, cursor = [], "-"
+    while cursor is not None:
+        cursor, entries = node.take(0, B, None if cursor == "-" else cursor, 7)
+        taken += entries
+    assert sorted(key for key, _, _ in taken) == sorted(b_keys)
+    assert dict((key, value) for key, value, _ in taken)[b_keys[1]] == f"value_{b_keys[1]}"
+    assert [deadline is not None for key, _, deadline in taken if key == b_keys[0]] == [True]
+    assert store.get(b_keys[1]) == f"value_{b_keys[1]}"  # only copied so far
+    assert node.forget(0, [key for key, _, _ in taken] + a_keys) == 30
+    assert store.mget(b_keys) == [None] * 30
+    assert store.mget(a_keys) == [f"value_{key}" for key in a_keys]
+
+def test_take_keys_only_hands_over_foreign_keys(node):
+    """Test take_keys never gives away a key this node owns."""
+    a_key, b_key = keys_of(node.ring, A, 1)[0], keys_of(node.ring, B, 1)[0]
+    node.store.mput({a_key: "a", b_key: "b"})
+    assert node.take_keys(0, [a_key, b_key, "missing"]) == [(b_key, "b", None)]
+    assert node.forget(0, [a_key, b_key]) == 1
+    assert node.store.get(a_key) == "a"
+
+def test_epochs():
+    """Test a ring only replaces an older one, and transfers check the epoch."""
+    node = ClusterNode(KeyValueStore(), A, [A])
+    with pytest.raises(RuntimeError, match="not newer"):
+        node.set_ring(0, [A])
+    with pytest.raises(RuntimeError, match="doesn't match"):
+        node.take(1, B, None, 10)
+    node.set_ring(1, [A, B])
+    assert node.ring == HashRing([A, B])
+    assert node.info()["epoch"] == 1
+
+def test_joining_node_owns_keys_once_imported():
+    """Test a node only reports the new ring rebalanced once its import is done, here from nobody."""
+    node = ClusterNode(KeyValueStore(), B, [B])
+    node.set_ring(1, [A, B])
+    deadline = time.monotonic() + 5
+    while node.info()["importing"]:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert node.info() == {"node": B, "epoch": 1, "nodes": [A, B], "importing": False}
+
+def test_lost_responses_lose_no_keys():
+    """Test a TAKE and a FORGET whose responses are lost are retried without losing or resurrecting keys."""
+    source = ClusterNode(KeyValueStore(), A, [A])
+    target = ClusterNode(KeyValueStore(), B, [A], retry_interval=0.01, migrate_batch=10)
+    b_keys = keys_of(HashRing([A, B]), B, 30)
+    source.store.mput({key: f"value_{key}" for key in b_keys})
+    lost = {"TAKE": 1, "FORGET": 1}
+
+    def call(node, command):  # straight to the source node, dropping the first response of each kind
+        _, sub, epoch, *args = command.split()
+        if sub == "TAKE":
+            result = source.take(int(epoch), args[0], None if args[1] == "-" else args[1], int(args[2]))
+        elif sub == "TAKEKEYS":
+            result = source.take_keys(int(epoch), args)
+        else:
+            result = source.forget(int(epoch), args)
+        if lost.get(sub):
+            lost[sub] -= 1
+            return None
+        return result
+
+    target._call = call
+    source.set_ring(1, [A, B])
+    target.set_ring(1, [A, B])
+    target.route([b_keys[0]])  # a client asking for a key takes it right away
+    target.store.delete(b_keys[0])  # and deletes it, a batch sent again must not bring it back
+    deadline = time.monotonic() + 5
+    while target.info()["importing"]:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert lost == {"TAKE": 0, "FORGET": 0}
+    assert target.store.mget(b_keys) == [None] + [f"value_{key}" for key in b_keys[1:]]
+    assert source.store.mget(b_keys) == [None] * 30
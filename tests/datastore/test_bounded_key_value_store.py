@@ -0,0 +1,67 @@
+import pytest
+
+from src.datastore.bounded_key_value_store import BoundedKeyValueStore, LFUPolicy, RandomPolicy, entry_size
+
+def test_lru_evicts_least_recently_used():
+    """Test reads keep a key alive and the oldest untouched key goes first."""
+    size = entry_size("key0", "value")
+    store = BoundedKeyValueStore(3 * size, policy="lru")
+    for i in range(3):
+        store.put(f"key{i}", "value")
+    assert store.get("key0") == "value"
+    store.put("key3", "value")
+    assert store.mget(["key0", "key1", "key2", "key3"]) == ["value", None, "value", "value"]
+    assert store.stats() == {"keys": 3, "used_memory": 3 * size, "max_memory": 3 * size, "evicted_keys": 1, "evicted_bytes": size}
+
+def test_memory_is_counted_in_bytes():
+    """Test overwrites and deletes give memory back, big values evict several keys."""
+    small = entry_size("key0", "v")
+    store = BoundedKeyValueStore(10 * small)
+    store.mput({f"key{i}": "v" for i in range(5)})
+    store.put("key0", "v" * 10)
+    store.delete("key1")
+    assert store.used_memory == entry_size("key0", "v" * 10) + 3 * small
+    store.put("big", "v" * (8 * small))
+    assert store.get("big") is not None
+    assert store.used_memory <= store.max_memory
+    assert store.evicted_keys >= 3
+
+def test_value_bigger_than_the_limit():
+    """Test a value that can never fit is refused instead of evicting everything."""
+    store = BoundedKeyValueStore(1000)
+    store.put("key1", "value1")
+    with pytest.raises(RuntimeError):
+        store.put("key2", "v" * 1000)
+    assert store.get("key1") == "value1"
+    assert store.evicted_keys == 0
+
+def test_transactions_and_expiry_are_accounted():
+    """Test committed transactions and expired keys go through the same accounting."""
+    store = BoundedKeyValueStore(1_000_000, policy="random")
+    store.start()
+    store.put("key1", "value1")
+    store.commit()
+    store.put_ex("key2", "value2", 60)
+    store.expire("key2", 0)
+    assert store.used_memory == entry_size("key1", "value1")
+
+def test_random_policy_removal():
+    """Test removing keys keeps the dense key list consistent."""
+    policy = RandomPolicy()
+    for key in ("a", "b", "c"):
+        policy.add(key)
+    policy.remove("a")
+    policy.remove("c")
+    assert policy.victim() == "b"
+
+def test_lfu_keeps_frequently_used_keys():
+    """Test the sampled LFU picks keys that were barely used."""
+    policy = LFUPolicy(samples=10)
+    for key in ("hot", "cold"):
+        policy.add(key)
+    for _ in range(1000):
+        policy.touch("hot")
+    assert policy._counters["hot"][0] > LFUPolicy.INITIAL
+    assert policy.victim() == "cold"
+    policy.decay_seconds = 1e-9  # every counter decayed to 0
+    assert policy._decayed("hot", policy._counters["hot"][1] + 1) == 0
@@ -0,0 +1,55 @@
+import random
+
+from src.datastore.compact_key_value_store import CompactKeyValueStore
+
+def test_put_get_delete():
+    """Test the basic operations, with keys and values that aren't plain ASCII."""
+    store = CompactKeyValueStore()
+    store.put("key1", "value1")
+    store.put("clé\udcff", "välue\x00")
+    assert store.get("key1") == "value1"
+    assert store.get("clé\udcff") == "välue\x00"
+    assert store.get("missing") is None
+    assert store.delete("key1") is True
+    assert store.delete("key1") is False
+    assert store.get("key1") is None
+    assert len(store) == 1
+
+def test_matches_a_dict_under_random_operations():
+    """Test growth, tombstones and arena compaction against a plain dict."""
+    store = CompactKeyValueStore()
+    expected = {}
+    for _ in range(20000):
+        key = f"key{random.randrange(2000)}"
+        if random.random() < 0.7:
+            value = "v" * random.randrange(50)
+            store.put(key, value)
+            expected[key] = value
+        else:
+            assert store.delete(key) is (expected.pop(key, None) is not None)
+    assert store.mget(list(expected)) == list(expected.values())
+    assert len(store) == len(expected)
+    assert store._garbage * 2 <= len(store._arena) + 4096  # compacted along the way
+
+def test_compression():
+    """Test big values are compressed in the arena and come back unchanged."""
+    store = CompactKeyValueStore(compress_threshold=100)
+    value = "abc" * 1000
+    store.put("big", value)
+    store.put("small", "abc")
+    assert len(store._arena) < 200
+    assert store.mget(["big", "small"]) == [value, "abc"]
+
+def test_transactions():
+    """Test transactions are buffered and applied atomically on commit."""
+    store = CompactKeyValueStore()
+    store.mput({"key1": "value1", "key2": "value2"})
+    store.start()
+    store.put("key1", "txn_value")
+    assert store.mdelete(["key2", "missing"]) == 1
+    assert store.mget(["key1", "key2"]) == ["txn_value", None]
+    store.start()
+    store.put("key3", "value3")
+    store.rollback()
+    store.commit()
+    assert store.mget(["key1", "key2", "key3"]) == ["txn_value", None, None]
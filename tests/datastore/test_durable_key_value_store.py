@@ -0,0 +1,107 @@
+import os
+import time
+
+from src.datastore.durable_key_value_store import DurableKeyValueStore
+from src.datastore.snapshot import list_snapshots
+from src.datastore.wal import list_segments
+
+def reopen(store, directory, **kwargs):
+    store.close()
+    return DurableKeyValueStore(directory, **kwargs)
+
+def test_writes_survive_restart(tmp_path):
+    """Test puts and deletes are replayed after a restart."""
+    store = DurableKeyValueStore(str(tmp_path), fsync="always")
+    store.put("key1", "value1")
+    store.put("key2", "value2")
+    store.delete("key1")
+    store = reopen(store, str(tmp_path))
+    assert store.get("key1") is None
+    assert store.get("key2") == "value2"
+
+def test_only_committed_transactions_survive(tmp_path):
+    """Test committed transactions are logged as one batch, rolled back ones not at all."""
+    store = DurableKeyValueStore(str(tmp_path), fsync="never")
+    store.put("key1", "value1")
+    store.start()
+    store.put("key2", "value2")
+    store.delete("key1")
+    store.commit()
+    store.start()
+    store.put("key3", "value3")
+    store.rollback()
+    store.start()
+    store.put("key4", "uncommitted")
+    store = reopen(store, str(tmp_path))
+    assert store.get("key1") is None
+    assert store.get("key2") == "value2"
+    assert store.get("key3") is None
+    assert store.get("key4") is None
+
+def test_snapshot_compacts_the_log(tmp_path):
+    """Test snapshots replace the log segments they cover and are loaded on restart."""
+    store = DurableKeyValueStore(str(tmp_path), fsync="never", snapshot_every=10)
+    for i in range(35):
+        store.put(f"key{i % 5}", str(i))
+    store.snapshot()
+    assert list_snapshots(str(tmp_path)) == [store._wal.generation]
+    assert list_segments(str(tmp_path)) == [store._wal.generation]
+
+    store.put("key0", "after snapshot")
+    store = reopen(store, str(tmp_path))
+    assert store.get("key0") == "after snapshot"
+    assert [store.get(f"key{i}") for i in range(1, 5)] == ["31", "32", "33", "34"]
+
+def test_log_after_snapshot_is_replayed_when_cleanup_was_interrupted(tmp_path):
+    """Test leftover segments older than the snapshot are ignored."""
+    store = DurableKeyValueStore(str(tmp_path), fsync="never")
+    store.put("key1", "old")
+    store.snapshot()
+    store.put("key1", "new")
+    store.close()
+    # recreate an old segment as if the cleanup had not happened
+    with open(os.path.join(str(tmp_path), "wal-00000001.log"), "w") as f:
+        f.write('{"key1": "stale"}\n')
+    store = DurableKeyValueStore(str(tmp_path))
+    assert store.get("key1") == "new"
+
+def test_restart_maps_the_snapshot(tmp_path):
+    """Test a restart serves snapshot values without loading them up front."""
+    store = DurableKeyValueStore(str(tmp_path), fsync="never")
+    for i in range(100):
+        store.put(f"key{i}", f"value{i}")
+    store.snapshot()
+    store.delete("key5")
+    store = reopen(store, str(tmp_path))
+    assert store._store._data == {}  # only the log tail was applied, nothing read yet
+    assert store.get("key42") == "value42"
+    assert store.get("key5") is None
+    store.put("key42", "changed")
+    store.snapshot()
+    store = reopen(store, str(tmp_path))
+    assert store.get("key42") == "changed"
+    assert store.get("key5") is None
+    assert len(store._store) == 99
+
+def test_batch_writes_survive_restart(tmp_path):
+    """Test batch writes are logged and replayed."""
+    store = DurableKeyValueStore(str(tmp_path), fsync="always")
+    store.mput({"key1": "value1", "key2": "value2", "key3": "value3"})
+    store.mdelete(["key1", "key2"])
+    store = reopen(store, str(tmp_path))
+    assert store.mget(["key1", "key2", "key3"]) == [None, None, "value3"]
+
+def test_ttls_survive_restart_and_snapshots(tmp_path):
+    """Test deadlines are logged, and carried over when a snapshot replaces the log."""
+    store = DurableKeyValueStore(str(tmp_path), fsync="always")
+    store.put_ex("key1", "value1", 60)
+    store.put_ex("key2", "value2", 0.05)
+    store.put("key3", "value3")
+    store = reopen(store, str(tmp_path))
+    assert store.ttl("key1") == 60
+    store.snapshot()
+    store = reopen(store, str(tmp_path))
+    assert store.ttl("key1") == 60
+    assert store.ttl("key3") == -1
+    time.sleep(0.1)
+    assert store.get("key2") is None
@@ -2,6 +2,7 @@ import time
 import threading
 import pytest
 
+from src.datastore import key_value_store
 from src.datastore.key_value_store import KeyValueStore
 
 def test_put_get():
@@ -163,3 +164,242 @@ def test_concurrent_isolated_transactions():
         elif tid == 4:
             assert observed == "v4"
 
+
+def test_mput_mget():
+    """Test batch writes and reads, missing keys included."""
+    store = KeyValueStore()
+    store.mput({"key1": "value1", "key2": "value2"})
+    assert store.mget(["key2", "missing", "key1"]) == ["value2", None, "value1"]
+
+def test_mdelete():
+    """Test batch deletes count only the keys that existed."""
+    store = KeyValueStore()
+    store.mput({"key1": "value1", "key2": "value2"})
+    assert store.mdelete(["key1", "key2", "missing", "key1"]) == 2
+    assert store.mget(["key1", "key2"]) == [None, None]
+
+def test_batch_commands_in_transaction():
+    """Test batch commands see and write the transaction overlays."""
+    store = KeyValueStore()
+    store.mput({"key1": "value1", "key2": "value2"})
+    store.start()
+    store.mput({"key2": "txn_value", "key3": "value3"})
+    assert store.mdelete(["key1", "missing"]) == 1
+    assert store.mget(["key1", "key2", "key3"]) == [None, "txn_value", "value3"]
+    assert store._store == {"key1": "value1", "key2": "value2"}
+    store.commit()
+    assert store._store == {"key2": "txn_value", "key3": "value3"}
+
+def test_put_ex_expires_lazily():
+    """Test a key read after its deadline is gone, even before the sweeper runs."""
+    store = KeyValueStore(sweep_interval=60)
+    store.put_ex("key1", "value1", 0.05)
+    store.put("key2", "value2")
+    assert store.get("key1") == "value1"
+    assert store.ttl("key1") == 1
+    assert store.ttl("key2") == -1
+    time.sleep(0.1)
+    assert store.ttl("key1") == -2
+    assert store.get("key1") is None
+    assert "key1" not in store._store and not store._expires
+
+def test_expired_keys_are_swept():
+    """Test the sweeper deletes expired keys in batches without anybody reading them."""
+    store = KeyValueStore(sweep_interval=0.01, sweep_batch=10)
+    store.mput({f"key{i}": "value" for i in range(100)})
+    for i in range(50):
+        assert store.expire(f"key{i}", 0.05) is True
+    assert store.expire("missing", 10) is False
+    time.sleep(0.3)
+    assert len(store._store) == 50
+    assert store.get("key50") == "value"
+
+def test_write_clears_ttl():
+    """Test overwriting or re-expiring a key replaces its deadline."""
+    store = KeyValueStore(sweep_interval=0.01)
+    store.put_ex("key1", "value1", 0.05)
+    store.put("key1", "value2")  # plain write, no TTL anymore
+    store.put_ex("key2", "value1", 0.05)
+    store.expire("key2", 60)
+    store.put_ex("key3", "value1", 60)
+    store.expire("key3", 0)  # expires right away
+    time.sleep(0.1)
+    assert store.mget(["key1", "key2", "key3"]) == ["value2", "value1", None]
+    assert store.ttl("key2") == 60
+
+def test_expiry_in_transaction():
+    """Test TTLs can't be set inside a transaction, and committed writes drop them."""
+    store = KeyValueStore()
+    store.put_ex("key1", "value1", 60)
+    store.start()
+    with pytest.raises(RuntimeError):
+        store.put_ex("key2", "value2", 60)
+    with pytest.raises(RuntimeError):
+        store.expire("key1", 10)
+    assert store.ttl("key1") == 60
+    store.put("key1", "value2")
+    assert store.ttl("key1") == -1
+    store.commit()
+    assert store.ttl("key1") == -1
+    with pytest.raises(ValueError):
+        store.put_ex("key1", "value1", 0)
+
+def test_scan_pages_through_a_range():
+    """Test scans return sorted pages and a cursor, and follow later writes."""
+    store = KeyValueStore()
+    store.mput({f"user:{i}": str(i) for i in range(10)})
+    store.put("other", "value")
+    entries, cursor = store.scan("user:", "user;", 4)
+    assert entries == [(f"user:{i}", str(i)) for i in range(4)]
+    assert cursor == "user:4"
+    store.delete("user:5")
+    store.put("user:55", "55")
+    entries, cursor = store.scan(cursor, "user;", 4)
+    assert [key for key, _ in entries] == ["user:4", "user:55", "user:6", "user:7"]
+    assert store.scan(cursor, "user;", 4) == ([("user:8", "8"), ("user:9", "9")], None)
+
+def test_scan_index_is_sorted_without_the_lock(monkeypatch):
+    """Test writers aren't blocked while the first scan sorts the keys, and their keys end up in the index."""
+    store = KeyValueStore()
+    store.mput({"a": "1", "b": "2", "c": "3"})
+    sort = key_value_store.SortedKeys
+
+    def sort_while_writing(keys):
+        writer = threading.Thread(target=lambda: store.mput({"b": None, "bb": "22", "d": "4"}))
+        writer.start()
+        writer.join(timeout=5)
+        assert not writer.is_alive()  # would be stuck behind the store lock
+        return sort(keys)
+
+    monkeypatch.setattr(key_value_store, "SortedKeys", sort_while_writing)
+    assert store.scan(None, None, 10) == ([("a", "1"), ("bb", "22"), ("c", "3"), ("d", "4")], None)
+    assert store._index_changes is None
+
+def test_scan_sees_transaction_and_skips_expired():
+    """Test scans inside a transaction see its writes, and expired keys are left out."""
+    store = KeyValueStore(sweep_interval=60)
+    store.mput({"a": "1", "b": "2", "c": "3"})
+    store.put_ex("d", "4", 0.01)
+    time.sleep(0.02)
+    store.start()
+    store.delete("b")
+    store.put("bb", "22")
+    assert store.scan(None, None, 10) == ([("a", "1"), ("bb", "22"), ("c", "3")], None)
+    store.rollback()
+    assert store.scan(None, None, 10) == ([("a", "1"), ("b", "2"), ("c", "3")], None)
+
+def in_other_session(action):
+    """Runs action on a thread of its own, so in a session of its own."""
+    thread = threading.Thread(target=action)
+    thread.start()
+    thread.join()
+
+def test_watch_fails_commit_on_conflict():
+    """Test a commit fails and rolls back when a watched key was written by another client."""
+    store = KeyValueStore()
+    store.put("counter", "1")
+    store.watch(["counter"])
+    store.start()
+    store.put("counter", str(int(store.get("counter")) + 1))
+    in_other_session(lambda: store.put("counter", "10"))
+    with pytest.raises(RuntimeError, match="Transaction conflict"):
+        store.commit()
+    assert store.get("counter") == "10"
+    assert not store.transactions
+
+    store.watch(["counter"])  # a clean retry commits, and the watch is gone after it
+    store.start()
+    store.put("counter", "11")
+    store.commit()
+    assert store.get("counter") == "11"
+    assert store._watches == {}
+
+def test_watch_ignores_other_keys_and_unwatch():
+    """Test writes to unwatched keys, and to keys after UNWATCH, don't fail the commit."""
+    store = KeyValueStore()
+    store.watch(["key1", "key2"])
+    in_other_session(lambda: store.put("key3", "value3"))
+    store.unwatch()
+    in_other_session(lambda: store.put("key1", "value1"))
+    store.start()
+    store.put("key2", "mine")
+    store.commit()
+    assert store.get("key2") == "mine"
+    store.start()
+    with pytest.raises(RuntimeError, match="WATCH must come before START"):
+        store.watch(["key1"])
+
+def test_cas():
+    """Test CAS only swaps the expected value."""
+    store = KeyValueStore()
+    assert store.cas("key1", "old", "new") is False
+    store.put("key1", "old")
+    assert store.cas("key1", "other", "new") is False
+    assert store.cas("key1", "old", "new value") is True
+    assert store.get("key1") == "new value"
+
+def test_incr_and_decr():
+    """Test INCR counts from 0, keeps the TTL outside transactions, works in them and refuses non integers."""
+    store = KeyValueStore()
+    assert store.incr("counter") == 1
+    assert store.incr("counter", -5) == -4
+    store.put_ex("hits", "7", 100)
+    assert store.incr("hits") == 8
+    assert store.ttl("hits") > 0
+    store.start()
+    assert store.incr("counter", 10) == 6
+    store.rollback()
+    assert store.get("counter") == "-4"
+    store.start()
+    assert store.incr("hits") == 9
+    store.commit()
+    assert store.ttl("hits") == -1  # written by a transaction, like a PUT in one
+    store.put("name", "bob")
+    with pytest.raises(RuntimeError, match="not an integer"):
+        store.incr("name")
+    for value in ["1_000", " 5 ", "+5", "", "\u0665"]:  # int() would take all but the empty one
+        store.put("loose", value)
+        with pytest.raises(RuntimeError, match="not an integer"):
+            store.incr("loose")
+
+def test_concurrent_incr_loses_no_update():
+    """Test many clients incrementing the same counter at once."""
+    store = KeyValueStore()
+    threads = [threading.Thread(target=lambda: [store.incr("counter") for _ in range(500)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.get("counter") == "4000"
+
+def test_load_and_dump():
+    """Test records round trip chunk by chunk with their deadlines, expired ones are skipped."""
+    source = KeyValueStore()
+    source.mput({f"key{i}": f"value {i}" for i in range(5)})
+    source.put_ex("key2", "expiring", 100)
+    records, cursor, chunks = [], None, 0
+    while True:
+        chunk, cursor = source.dump(cursor, 2)
+        records += chunk
+        chunks += 1
+        if cursor is None:
+            break
+    assert chunks == 3
+    assert [key for key, _, _ in records] == [f"key{i}" for i in range(5)]
+    assert records[2][1] == "expiring" and records[2][2] > time.time()
+    assert records[0] == ("key0", "value 0", None)
+
+    target = KeyValueStore()
+    assert target.load(records + [("gone", "value", time.time() - 1)]) == 5
+    assert target.mget(["key0", "key2", "gone"]) == ["value 0", "expiring", None]
+    assert 0 < target.ttl("key2") <= 100
+    assert target.ttl("key0") == -1
+
+def test_load_and_dump_refuse_transactions():
+    """Test LOAD and DUMP work on committed data only."""
+    store = KeyValueStore()
+    store.start()
+    with pytest.raises(RuntimeError, match="LOAD can't be used inside a transaction."):
+        store.load([("key1", "value1", None)])
+    with pytest.raises(RuntimeError, match="DUMP can't be used inside a transaction."):
+        store.dump(None, 10)
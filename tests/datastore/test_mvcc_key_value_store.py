@@ -0,0 +1,149 @@
+import threading
+import pytest
+
+from src.datastore.mvcc_key_value_store import MVCCKeyValueStore
+
+def in_thread(fn):
+    """Runs fn in another thread (so another session) and returns its result."""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+def test_put_get_delete():
+    """Test plain operations outside transactions."""
+    store = MVCCKeyValueStore()
+    store.put("key1", "value1")
+    assert store.get("key1") == "value1"
+    assert store.delete("key1") is True
+    assert store.delete("key1") is False
+    assert store.get("key1") is None
+
+def test_transaction_reads_its_snapshot():
+    """Test a transaction keeps seeing the data as of its start."""
+    store = MVCCKeyValueStore()
+    store.put("key1", "before")
+    store.start()
+    in_thread(lambda: store.mput({"key1": "after", "key2": "new"}))
+    assert store.get("key1") == "before"
+    assert store.mget(["key1", "key2"]) == ["before", None]
+    store.commit()
+    assert store.get("key1") == "after"
+
+def test_uncommitted_writes_are_isolated():
+    """Test other sessions don't see writes until commit."""
+    store = MVCCKeyValueStore()
+    store.start()
+    store.put("key1", "value1")
+    assert in_thread(lambda: store.get("key1")) is None
+    store.commit()
+    assert in_thread(lambda: store.get("key1")) == "value1"
+
+def test_write_write_conflict():
+    """Test the second of two transactions writing the same key fails and changes nothing."""
+    store = MVCCKeyValueStore()
+    store.put("counter", "1")
+    store.start()
+    store.put("counter", "2")
+    store.put("other", "x")
+    in_thread(lambda: store.put("counter", "10"))
+    with pytest.raises(RuntimeError, match="Transaction conflict: 'counter' was modified by another client"):
+        store.commit()
+    assert not store.transactions
+    assert store.get("counter") == "10"
+    assert store.get("other") is None
+
+def test_conflict_with_a_collected_delete():
+    """Test GC running right before the conflict check keeps the tombstone of a concurrent delete."""
+    store = MVCCKeyValueStore()
+    store.put("key1", "before")
+    store.start()
+    store.put("key1", "mine")
+    in_thread(lambda: store.delete("key1"))
+    commit = store._commit
+
+    def collected_then_commit(changes, snapshot=None):
+        store.collect_garbage()  # another writer's collection, just before ours checks
+        commit(changes, snapshot)
+
+    store._commit = collected_then_commit
+    with pytest.raises(RuntimeError, match="Transaction conflict: 'key1' was modified by another client"):
+        store.commit()
+    assert store.get("key1") is None
+    assert not store._active  # the snapshot is released even though the commit failed
+
+def test_disjoint_transactions_both_commit():
+    """Test transactions writing different keys don't conflict."""
+    store = MVCCKeyValueStore()
+    store.start()
+    store.put("key1", "a")
+    in_thread(lambda: (store.start(), store.put("key2", "b"), store.commit()))
+    store.commit()
+    assert store.mget(["key1", "key2"]) == ["a", "b"]
+
+def test_nested_transactions():
+    """Test nested transactions fold into their parent and roll back together."""
+    store = MVCCKeyValueStore()
+    store.put("key1", "value1")
+    store.start()
+    store.put("key1", "temp_value")
+    store.start()
+    assert store.delete("key1") is True
+    store.commit()
+    assert store.get("key1") is None
+    store.rollback()
+    assert store.get("key1") == "value1"
+    with pytest.raises(RuntimeError, match="No active transaction to rollback."):
+        store.rollback()
+
+def test_garbage_collection_keeps_what_snapshots_need():
+    """Test old versions are dropped, except the ones a running transaction still reads."""
+    store = MVCCKeyValueStore(gc_every=10_000)
+    store.put("key1", "v0")
+    store.put("doomed", "x")
+    store.start()
+    for i in range(1, 5):
+        in_thread(lambda i=i: store.put("key1", f"v{i}"))
+    in_thread(lambda: store.delete("doomed"))
+
+    store.collect_garbage()
+    assert [value for _, value in store._versions["key1"]] == ["v0", "v1", "v2", "v3", "v4"]
+    assert store.get("key1") == "v0"
+    assert store.get("doomed") == "x"
+
+    store.rollback()
+    store.collect_garbage()
+    assert store._versions["key1"] == [(store._versions["key1"][0][0], "v4")]
+    assert "doomed" not in store._versions
+    assert store.get("key1") == "v4"
+
+def test_concurrent_increments_never_lose_updates():
+    """Test read-modify-write loops retried on conflict end with the exact total."""
+    store = MVCCKeyValueStore(gc_every=10)
+    store.put("counter", "0")
+
+    def worker():
+        for _ in range(50):
+            while True:
+                store.start()
+                store.put("counter", str(int(store.get("counter")) + 1))
+                try:
+                    store.commit()
+                    break
+                except RuntimeError:
+                    pass  # someone else won, retry on a fresh snapshot
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert store.get("counter") == "200"
+
+def test_mget_outside_transaction_is_consistent():
+    """Test a batch read registers its snapshot for the time of the read only."""
+    store = MVCCKeyValueStore()
+    store.mput({"key1": "a", "key2": "b"})
+    assert store.mget(["key1", "key2", "missing"]) == ["a", "b", None]
+    assert store._active == {}
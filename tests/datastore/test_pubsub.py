@@ -0,0 +1,131 @@
+import gc
+import json
+import time
+
+import pytest
+
+from src.datastore.key_value_store import KeyValueStore
+from src.datastore.pubsub import PubSub
+from src.datastore.session import new_session
+
+@pytest.fixture
+def store():
+    return KeyValueStore()
+
+def subscriber(pubsub, patterns):
+    """A fresh session subscribed to patterns, with a wake counter."""
+    session = new_session()
+    session.wake = lambda: woken.append(1)
+    woken = []
+    pubsub.subscribe(patterns)
+    return session, woken
+
+def events(pubsub, session):
+    """The events pushed to session once the dispatcher caught up."""
+    assert pubsub.join(5)
+    return [json.loads(line) for line in session.subscription.drain().splitlines()]
+
+def test_put_and_delete_events(store):
+    """Test writes to a subscribed key are pushed as events and wake the subscriber."""
+    pubsub = PubSub(store)
+    session, woken = subscriber(pubsub, ["key1"])
+    store.put("key1", "value1")
+    store.put("key2", "value2")  # not subscribed
+    store.delete("key1")
+    assert events(pubsub, session) == [
+        {"status": "Event", "result": {"key1": "value1"}},
+        {"status": "Event", "result": {"key1": None}},
+    ]
+    assert len(woken) == 2
+
+def test_fan_out_happens_off_the_store_lock(store):
+    """Test writers only queue change sets, a stuck dispatcher never blocks them."""
+    pubsub = PubSub(store)
+    session, _ = subscriber(pubsub, ["key*"])
+    other, _ = subscriber(pubsub, ["key*", "key1"])
+    with pubsub._lock:  # the dispatcher can't match anything meanwhile
+        store.mput({f"key{i}": "value" for i in range(100)})
+        store.put("key1", "again")
+        assert session.subscription.drain() == b""
+    first = events(pubsub, session)
+    assert [event["result"] for event in first] == [{f"key{i}": "value" for i in range(100)}, {"key1": "again"}]
+    assert [json.loads(line) for line in other.subscription.drain().splitlines()] == first
+
+def test_dispatcher_overflow_drops_every_subscriber(store):
+    """Test change sets past max_queued drop the subscribers rather than losing their events silently."""
+    pubsub = PubSub(store, max_queued=2)
+    session, woken = subscriber(pubsub, ["key1"])
+    with pubsub._lock:
+        for i in range(5):
+            store.put("key1", str(i))
+    assert pubsub.join(5)
+    wait_until(lambda: session.subscription.closed)
+
+def test_prefix_subscription(store):
+    """Test a pattern ending with * matches every key with that prefix."""
+    pubsub = PubSub(store)
+    session, _ = subscriber(pubsub, ["user:*"])
+    store.mput({"user:1": "a", "user:2": "b", "order:1": "c"})
+    assert events(pubsub, session) == [{"status": "Event", "result": {"user:1": "a", "user:2": "b"}}]
+
+def test_transaction_is_one_event(store):
+    """Test a committed transaction is pushed as one event, a rolled back one not at all."""
+    pubsub = PubSub(store)
+    session, _ = subscriber(pubsub, ["key1", "key2"])
+    writer = new_session()
+    store.start()
+    store.put("key1", "value1")
+    store.put("key2", "value2")
+    store.put("key1", "value3")
+    assert events(pubsub, session) == []
+    store.commit()
+    store.start()
+    store.put("key1", "discarded")
+    store.rollback()
+    assert events(pubsub, session) == [{"status": "Event", "result": {"key1": "value3", "key2": "value2"}}]
+    assert writer.subscription is None
+
+def test_unsubscribe(store):
+    """Test unsubscribed patterns stop getting events, no patterns unsubscribes from all."""
+    pubsub = PubSub(store)
+    session, _ = subscriber(pubsub, ["key1", "key2", "key*"])
+    assert pubsub.unsubscribe(["key*"]) == 2
+    store.put("key3", "value")
+    assert pubsub.unsubscribe() == 0
+    store.put("key1", "value")
+    assert events(pubsub, session) == []
+    assert not pubsub._keys and not pubsub._prefixes
+
+def test_slow_consumer_is_closed(store):
+    """Test a subscriber past max_pending events is closed instead of buffering more."""
+    pubsub = PubSub(store, max_pending=3)
+    session, woken = subscriber(pubsub, ["counter"])
+    for i in range(5):
+        store.put("counter", str(i))
+    assert pubsub.join(5)
+    assert session.subscription.closed
+    assert [event["result"]["counter"] for event in events(pubsub, session)] == ["0", "1", "2"]
+    assert len(woken) == 4  # the last wake up is for the server to disconnect it
+
+def test_subscriptions_are_dropped_with_their_session(store):
+    """Test the hub doesn't keep subscriptions of clients that went away."""
+    pubsub = PubSub(store)
+    subscriber(pubsub, ["key1"])
+    new_session()
+    gc.collect()
+    store.put("key1", "value")
+    assert pubsub.join(5)
+    assert not list(pubsub._keys["key1"])
+
+def test_subscribe_needs_a_connection_that_can_push(store):
+    """Test subscribing outside a server connection is refused."""
+    pubsub = PubSub(store)
+    new_session()
+    with pytest.raises(RuntimeError, match="isn't supported"):
+        pubsub.subscribe(["key1"])
+
+def wait_until(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
@@ -0,0 +1,140 @@
+import json
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from src.datastore.key_value_store import KeyValueStore
+from src.datastore.replication import ReplicaKeyValueStore, ReplicationSource
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+@pytest.fixture
+def source():
+    """Fixture streaming a fresh KeyValueStore from a background thread."""
+    source = ReplicationSource(KeyValueStore(), backlog_size=10)
+    threading.Thread(target=source.serve_forever, daemon=True).start()
+    yield source
+    source.close()
+
+@pytest.fixture
+def replica(source):
+    replica = ReplicaKeyValueStore(("127.0.0.1", source.port), retry_interval=0.05)
+    assert replica.synced.wait(5)
+    yield replica
+    replica.close()
+
+def test_full_sync_copies_existing_data(source):
+    """Test a new replica starts from a copy of the data, expiry deadlines included."""
+    source.store.mput({"key1": "value1", "key2": "value2"})
+    source.store.put_ex("key3", "value3", 100)
+    replica = ReplicaKeyValueStore(("127.0.0.1", source.port))
+    assert replica.synced.wait(5)
+    assert replica.mget(["key1", "key2", "key3"]) == ["value1", "value2", "value3"]
+    assert 99 <= replica.ttl("key3") <= 100
+    assert replica.offset == source.offset
+    replica.close()
+
+def test_committed_writes_are_streamed(source, replica):
+    """Test puts, deletes, expiries and committed transactions reach the replica, uncommitted ones don't."""
+    store = source.store
+    store.put("key1", "value1")
+    store.put("key2", "value2")
+    store.delete("key2")
+    store.expire("key1", 100)
+    store.start()
+    store.put("key3", "value3")
+    wait_until(lambda: replica.offset == source.offset)
+    assert replica.get("key3") is None
+    store.commit()
+    wait_until(lambda: replica.get("key3") == "value3")
+    assert replica.get("key1") == "value1"
+    assert replica.get("key2") is None
+    assert replica.ttl("key1") > 0
+
+def test_replica_refuses_writes(replica):
+    """Test every write on a replica raises, reads don't."""
+    for write in (
+        lambda: replica.put("key1", "value1"),
+        lambda: replica.delete("key1"),
+        lambda: replica.mput({"key1": "value1"}),
+        lambda: replica.mdelete(["key1"]),
+        lambda: replica.put_ex("key1", "value1", 10),
+        lambda: replica.expire("key1", 10),
+    ):
+        with pytest.raises(RuntimeError, match="read only replica"):
+            write()
+    assert replica.get("key1") is None
+
+def test_reconnect_resumes_from_offset(source, replica):
+    """Test a replica losing its connection catches up from the backlog, without a new copy."""
+    source.store.put("key1", "value1")
+    wait_until(lambda: replica.offset == source.offset)
+    sent = []
+    original = source._send_snapshot
+    source._send_snapshot = lambda sock: sent.append(1) or original(sock)
+    replica._socket.shutdown(socket.SHUT_RDWR)
+    source.store.put("key2", "value2")
+    wait_until(lambda: replica.get("key2") == "value2")
+    assert replica.get("key1") == "value1"
+    assert sent == []
+
+def test_lagging_replica_gets_a_new_copy(source):
+    """Test a replica resuming from an offset that left the backlog is synchronized from scratch."""
+    with socket.create_connection(("127.0.0.1", source.port)) as sock:
+        sock.sendall(json.dumps({"id": source.id, "offset": 0}).encode() + b"\n")
+        stream = sock.makefile("rb")
+        assert json.loads(stream.readline()) == {"partial": 0, "id": source.id}
+    for i in range(20):  # twice the backlog
+        source.store.put(f"key{i}", "value")
+    with socket.create_connection(("127.0.0.1", source.port)) as sock:
+        sock.sendall(json.dumps({"id": source.id, "offset": 0}).encode() + b"\n")
+        stream = sock.makefile("rb")
+        assert json.loads(stream.readline()) == {"full": 20, "id": source.id}
+        assert len(json.loads(stream.readline())["data"]) == 20
+        assert json.loads(stream.readline()) == {"expires": {}}
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def send(port, command):
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            with socket.create_connection(("127.0.0.1", port)) as sock:
+                sock.sendall(command.encode() + b"\n")
+                return json.loads(sock.makefile("rb").readline())
+        except OSError:
+            assert time.monotonic() < deadline, "server didn't start"
+            time.sleep(0.05)
+
+def server(*args):
+    return subprocess.Popen([sys.executable, "-m", "src.main", *args], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def test_primary_and_replicas_in_separate_processes():
+    """Test replicas started before and after the writes both serve them, and refuse writes."""
+    primary_port, replication_port = free_port(), free_port()
+    replica_ports = [free_port(), free_port()]
+    processes = [server("--port", str(primary_port), "--replication-port", str(replication_port))]
+    try:
+        send(primary_port, "PUT key1 value1")
+        processes.append(server("--port", str(replica_ports[0]), "--replica-of", f"127.0.0.1:{replication_port}"))
+        send(primary_port, "PUT key2 value2")
+        processes.append(server("--port", str(replica_ports[1]), "--replica-of", f"127.0.0.1:{replication_port}"))
+        for port in replica_ports:
+            wait_until(lambda: send(port, "GET key2")["result"] == "value2", timeout=10)
+            assert send(port, "GET key1")["result"] == "value1"
+            assert send(port, "PUT key3 value3")["status"] == "Error"
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
@@ -0,0 +1,30 @@
+import threading
+
+from src.datastore.session import current_session, new_session
+
+def test_current_session_is_stable():
+    """Test the same session is returned until a new one is started."""
+    session = current_session()
+    assert current_session() is session
+    assert new_session() is not session
+    assert current_session() is not session
+
+def test_session_state_per_owner():
+    """Test state is created lazily and kept separately for every owner."""
+    class Owner:
+        pass
+
+    session = new_session()
+    first, second = Owner(), Owner()
+    session.state(first, list).append("x")
+    assert session.state(first, list) == ["x"]
+    assert session.state(second, list) == []
+
+def test_threads_get_their_own_session():
+    """Test two threads never share a session."""
+    seen = []
+    main = current_session()
+    thread = threading.Thread(target=lambda: seen.append(current_session()))
+    thread.start()
+    thread.join()
+    assert seen[0] is not main
@@ -0,0 +1,126 @@
+import threading
+import pytest
+
+from src.datastore.sharded_key_value_store import ShardedKeyValueStore
+
+def test_put_get():
+    """Test storing and retrieving values across shards."""
+    store = ShardedKeyValueStore(shards=4)
+    for i in range(100):
+        store.put(f"key{i}", f"value{i}")
+    assert all(store.get(f"key{i}") == f"value{i}" for i in range(100))
+    assert store.get("missing_key") is None
+
+def test_delete():
+    """Test deleting existing and missing keys."""
+    store = ShardedKeyValueStore(shards=4)
+    store.put("key1", "value1")
+    assert store.delete("key1") is True
+    assert store.delete("key1") is False
+    assert store.get("key1") is None
+
+def test_invalid_shard_count():
+    """Test a store can't be built without shards."""
+    with pytest.raises(ValueError):
+        ShardedKeyValueStore(shards=0)
+
+def test_transaction_spanning_shards():
+    """Test a transaction touching many shards is invisible until committed, then fully applied."""
+    store = ShardedKeyValueStore(shards=8)
+    store.put("doomed", "value")
+    store.start()
+    for i in range(50):
+        store.put(f"key{i}", str(i))
+    assert store.delete("doomed") is True
+
+    seen = []
+    reader = threading.Thread(target=lambda: seen.extend([store.get("key0"), store.get("doomed")]))
+    reader.start()
+    reader.join()
+    assert seen == [None, "value"]  # other sessions don't see uncommitted writes
+
+    store.commit()
+    assert all(store.get(f"key{i}") == str(i) for i in range(50))
+    assert store.get("doomed") is None
+
+def test_nested_transactions():
+    """Test nested transactions fold into their parent and roll back together."""
+    store = ShardedKeyValueStore()
+    store.put("key1", "value1")
+    store.start()
+    store.put("key1", "temp_value")
+    store.start()
+    store.put("key1", "nested_value")
+    store.commit()
+    assert store.get("key1") == "nested_value"
+    store.rollback()
+    assert store.get("key1") == "value1"
+
+def test_commit_and_rollback_without_transaction():
+    """Test the same errors as KeyValueStore are raised without a transaction."""
+    store = ShardedKeyValueStore()
+    with pytest.raises(RuntimeError, match="No active transaction to commit."):
+        store.commit()
+    with pytest.raises(RuntimeError, match="No active transaction to rollback."):
+        store.rollback()
+
+def test_concurrent_cross_shard_commits():
+    """Test concurrent transactions writing overlapping shards in different orders don't deadlock."""
+    store = ShardedKeyValueStore(shards=4)
+    keys = [f"key{i}" for i in range(20)]
+
+    def worker(order):
+        for _ in range(50):
+            store.start()
+            for key in order:
+                store.put(key, "x")
+            store.commit()
+
+    threads = [threading.Thread(target=worker, args=(keys if i % 2 else keys[::-1],)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+    assert not any(t.is_alive() for t in threads)
+    assert all(store.get(key) == "x" for key in keys)
+
+def test_batch_commands():
+    """Test batch commands across shards, with and without a transaction."""
+    store = ShardedKeyValueStore(shards=4)
+    store.mput({f"key{i}": str(i) for i in range(20)})
+    assert store.mget([f"key{i}" for i in range(21)]) == [str(i) for i in range(20)] + [None]
+    assert store.mdelete(["key0", "key1", "missing"]) == 2
+
+    store.start()
+    store.mput({"key2": "txn_value"})
+    assert store.mdelete(["key3", "key3"]) == 1
+    assert store.mget(["key2", "key3", "key4"]) == ["txn_value", None, "4"]
+    store.rollback()
+    assert store.mget(["key2", "key3"]) == ["2", "3"]
+
+def test_mget_never_sees_half_a_commit():
+    """Test MGET of keys in different shards holds their locks together, an MPUT can't land in between."""
+    store = ShardedKeyValueStore(shards=4)
+    keys = [next(f"key{i}" for i in range(100) if store._shard_of(f"key{i}") == shard) for shard in range(4)]
+    store.mput(dict.fromkeys(keys, "old"))
+    writer = threading.Thread(target=lambda: store.mput(dict.fromkeys(keys, "new")))
+    reader = threading.current_thread()
+
+    class Pausing:
+        """The last shard's lock: MGET taking it lets the MPUT run first, if it can."""
+        def __init__(self, lock):
+            self.lock = lock
+
+        def __enter__(self):
+            if threading.current_thread() is reader and not writer.is_alive() and writer.ident is None:
+                writer.start()
+                writer.join(timeout=0.2)  # only blocks for good if MGET still holds the other shards
+            return self.lock.__enter__()
+
+        def __exit__(self, *exc_info):
+            return self.lock.__exit__(*exc_info)
+
+    store._locks[3] = Pausing(store._locks[3])
+    assert len(set(store.mget(keys))) == 1
+    writer.join()
+    assert store.mget(keys) == ["new"] * 4
@@ -0,0 +1,85 @@
+import os
+import pytest
+
+from src.datastore.snapshot import MappedSnapshot, SnapshotOverlay, list_snapshots, read_snapshot, snapshot_path, write_snapshot
+
+@pytest.fixture
+def snapshot(tmp_path):
+    """Fixture providing a mapped snapshot of a few hundred keys."""
+    write_snapshot(str(tmp_path), 1, [(f"key{i}", f"value{i}") for i in range(300)])
+    mapped = MappedSnapshot(snapshot_path(str(tmp_path), 1))
+    yield mapped
+    mapped.close()
+
+def test_write_and_read(tmp_path):
+    """Test a snapshot holds every pair, in key order."""
+    write_snapshot(str(tmp_path), 2, [("key 2", "välue\n2"), ("key1", "value1")])
+    assert list_snapshots(str(tmp_path)) == [2]
+    assert list(read_snapshot(str(tmp_path), 2)) == [("key 2", "välue\n2"), ("key1", "value1")]
+
+def test_unfinished_snapshot_is_not_listed(tmp_path):
+    """Test a temporary file left by a crash is not mistaken for a snapshot."""
+    (tmp_path / "snapshot-00000005.bin.tmp").write_bytes(b"HKVS")
+    write_snapshot(str(tmp_path), 4, [])
+    assert list_snapshots(str(tmp_path)) == [4]
+    assert not os.path.exists(tmp_path / "snapshot-00000004.bin.tmp")
+
+def test_mapped_lookups(snapshot):
+    """Test the index finds every key and nothing else."""
+    assert len(snapshot) == 300
+    assert all(snapshot.get(f"key{i}") == f"value{i}" for i in range(300))
+    assert snapshot.get("key300") is None
+    assert snapshot.get("") is None
+
+def test_empty_snapshot(tmp_path):
+    """Test a snapshot of no data can be mapped and queried."""
+    write_snapshot(str(tmp_path), 1, [])
+    mapped = MappedSnapshot(snapshot_path(str(tmp_path), 1))
+    assert len(mapped) == 0
+    assert mapped.get("key1") is None
+    assert list(mapped.items()) == []
+
+def test_not_a_snapshot(tmp_path):
+    """Test garbage is refused instead of misread."""
+    path = tmp_path / "snapshot-00000001.bin"
+    path.write_bytes(bytes(64))
+    with pytest.raises(ValueError, match="is not a version 1 snapshot"):
+        MappedSnapshot(str(path))
+
+def test_overlay_faults_values_in(snapshot):
+    """Test values are read from the snapshot once, then served from memory."""
+    overlay = SnapshotOverlay(snapshot)
+    assert len(overlay) == 300
+    assert overlay._data == {}
+    assert overlay.get("key7") == "value7"
+    assert overlay._data == {"key7": "value7"}
+    assert overlay.get("missing") is None
+
+def test_overlay_writes_and_deletes(snapshot):
+    """Test the overlay behaves like a dict on top of the snapshot."""
+    overlay = SnapshotOverlay(snapshot)
+    overlay["key1"] = "new"
+    overlay["extra"] = "value"
+    assert overlay.pop("key2", None) == "value2"
+    assert overlay.pop("key2", None) is None
+    assert "key2" not in overlay
+    assert overlay["key1"] == "new"
+    assert len(overlay) == 300
+    assert dict(overlay.items()) == {
+        **{f"key{i}": f"value{i}" for i in range(300) if i != 2}, "key1": "new", "extra": "value"
+    }
+
+    overlay["key2"] = "back"
+    assert overlay.get("key2") == "back"
+    assert len(overlay) == 301
+
+def test_overlay_copy_is_independent(snapshot):
+    """Test a copy doesn't see later changes, as needed to write the next snapshot."""
+    overlay = SnapshotOverlay(snapshot)
+    overlay["key1"] = "before"
+    copy = overlay.copy()
+    overlay["key1"] = "after"
+    del overlay["key3"]
+    assert copy["key1"] == "before"
+    assert copy["key3"] == "value3"
+    assert len(copy) == 300
@@ -0,0 +1,44 @@
+import random
+
+from src.datastore.sorted_index import SortedKeys, prefix_end, scan_page
+
+def test_sorted_keys_stay_sorted():
+    """Test random adds and discards against a plain sorted list, across chunk splits."""
+    keys = SortedKeys(chunk_size=4)
+    expected = set()
+    for _ in range(2000):
+        key = str(random.randrange(300))
+        if random.random() < 0.6:
+            keys.add(key)
+            expected.add(key)
+        else:
+            keys.discard(key)
+            expected.discard(key)
+    assert list(keys) == sorted(expected)
+    assert len(keys) == len(expected)
+    assert all(key in keys for key in expected)
+    assert "missing" not in keys
+
+def test_irange_bounds():
+    """Test start is included, end excluded, and None is unbounded."""
+    keys = SortedKeys([f"key{i:02d}" for i in range(20)], chunk_size=3)
+    assert list(keys.irange("key05", "key08")) == ["key05", "key06", "key07"]
+    assert list(keys.irange("key045", "key06")) == ["key05"]
+    assert list(keys.irange("key18")) == ["key18", "key19"]
+    assert list(keys.irange(None, "key02")) == ["key00", "key01"]
+    assert list(keys.irange("zzz")) == []
+
+def test_prefix_end():
+    """Test the end of a prefix range sorts after every key with that prefix."""
+    assert prefix_end("user:1:") == "user:1;"
+    assert prefix_end("a\U0010ffff") == "b"
+    assert prefix_end("\U0010ffff") is None
+    assert prefix_end("") is None
+
+def test_scan_page_overlays_changes():
+    """Test uncommitted writes show up in order and deletes hide committed keys."""
+    committed = [("a", "1"), ("c", "3"), ("e", "5")]
+    changes = {"b": "2", "c": None, "e": "new", "z": "26"}
+    assert scan_page(committed, changes, None, None, 10) == ([("a", "1"), ("b", "2"), ("e", "new"), ("z", "26")], None)
+    assert scan_page(committed[1:], changes, "b", "z", 2) == ([("b", "2"), ("e", "new")], None)
+    assert scan_page(committed, changes, None, None, 2) == ([("a", "1"), ("b", "2")], "e")
@@ -0,0 +1,117 @@
+import multiprocessing
+import threading
+import pytest
+
+from src.datastore.key_value_store import KeyValueStore
+from src.datastore.store_process import RemoteKeyValueStore, StoreServer
+
+@pytest.fixture
+def store_server():
+    """Fixture serving a fresh KeyValueStore from a background thread."""
+    server = StoreServer(KeyValueStore())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.close()
+
+@pytest.fixture
+def remote(store_server):
+    return RemoteKeyValueStore(store_server.address, store_server.authkey)
+
+def test_put_get_delete(remote, store_server):
+    """Test single operations go straight to the served store."""
+    remote.put("key1", "value1")
+    assert store_server.store.get("key1") == "value1"
+    assert remote.get("key1") == "value1"
+    assert remote.delete("key1") is True
+    assert remote.delete("key1") is False
+    assert remote.get("key1") is None
+
+def test_transaction_is_buffered_until_commit(remote, store_server):
+    """Test transactional writes only reach the store process on the outermost commit."""
+    remote.put("key1", "value1")
+    remote.start()
+    remote.put("key2", "value2")
+    assert remote.delete("key1") is True
+    remote.start()
+    remote.put("key3", "value3")
+    remote.commit()
+    assert store_server.store.get("key2") is None
+    assert remote.get("key2") == "value2"
+
+    remote.commit()
+    assert store_server.store.get("key1") is None
+    assert store_server.store.get("key2") == "value2"
+    assert store_server.store.get("key3") == "value3"
+
+def test_rollback(remote, store_server):
+    """Test rolled back transactions never reach the store process."""
+    remote.start()
+    remote.put("key1", "value1")
+    remote.rollback()
+    assert remote.get("key1") is None
+
+def test_errors_are_raised_locally(remote):
+    """Test transaction errors keep the usual messages."""
+    with pytest.raises(RuntimeError, match="No active transaction to commit."):
+        remote.commit()
+
+def test_workers_in_other_processes_share_data(store_server):
+    """Test writes from several forked processes all land in the one store."""
+    def worker(i):
+        RemoteKeyValueStore(store_server.address, store_server.authkey).put(f"key{i}", str(i))
+
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=worker, args=(i,)) for i in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert [store_server.store.get(f"key{i}") for i in range(4)] == ["0", "1", "2", "3"]
+
+def test_batch_commands(remote, store_server):
+    """Test batch commands make one round trip and resolve transactions locally first."""
+    remote.mput({"key1": "value1", "key2": "value2"})
+    assert remote.mget(["key1", "missing", "key2"]) == ["value1", None, "value2"]
+    remote.start()
+    remote.mput({"key1": "txn_value"})
+    assert remote.mdelete(["key2"]) == 1
+    assert remote.mget(["key1", "key2"]) == ["txn_value", None]
+    remote.commit()
+    assert store_server.store.mget(["key1", "key2"]) == ["txn_value", None]
+    assert remote.mdelete(["key1", "key2"]) == 1
+
+def test_expiry(remote, store_server):
+    """Test TTL commands are forwarded, and refused inside a transaction."""
+    remote.put_ex("key1", "value1", 60)
+    assert remote.ttl("key1") == 60
+    assert remote.expire("missing", 10) is False
+    remote.start()
+    with pytest.raises(RuntimeError):
+        remote.expire("key1", 10)
+    remote.rollback()
+
+def test_scan_in_transaction(remote, store_server):
+    """Test remote scans page correctly even when the transaction hides committed keys."""
+    remote.mput({f"key{i}": str(i) for i in range(6)})
+    remote.start()
+    remote.mdelete(["key0", "key1"])
+    remote.put("key10", "10")
+    entries, cursor = remote.scan(None, None, 2)
+    assert entries == [("key10", "10"), ("key2", "2")]
+    entries, cursor = remote.scan(cursor, None, 10)
+    assert entries == [("key3", "3"), ("key4", "4"), ("key5", "5")]
+    assert cursor is None
+    remote.rollback()
+
+def test_cas_and_incr_are_atomic_in_the_store_process(remote, store_server):
+    """Test CAS and INCR run in the store process, or against the session's transaction."""
+    assert remote.incr("counter", 2) == 2
+    assert store_server.store.get("counter") == "2"
+    assert remote.cas("counter", "2", "5") is True
+    assert remote.cas("counter", "2", "6") is False
+    remote.start()
+    assert remote.incr("counter") == 6
+    assert store_server.store.get("counter") == "5"
+    remote.commit()
+    assert store_server.store.get("counter") == "6"
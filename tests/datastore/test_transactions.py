@@ -0,0 +1,87 @@
+import pytest
+
+from src.datastore.transactions import MISSING, TransactionStack
+
+def test_lookup_untouched_key():
+    """Test keys never written in a transaction are reported as missing."""
+    stack = TransactionStack()
+    stack.begin()
+    assert stack.lookup("key1") is MISSING
+    assert stack.lookup("key1", "default") == "default"
+
+def test_innermost_write_wins():
+    """Test lookups see the innermost value, including deletes."""
+    stack = TransactionStack()
+    stack.begin()
+    stack.write("key1", "outer")
+    stack.begin()
+    stack.write("key1", None)
+    assert stack.lookup("key1") is None
+    stack.rollback()
+    assert stack.lookup("key1") == "outer"
+
+def test_commit_returns_changes_only_when_outermost():
+    """Test nested commits fold into the parent and the outermost one hands back every change."""
+    stack = TransactionStack()
+    stack.begin()
+    stack.write("key1", "value1")
+    stack.begin()
+    stack.write("key2", None)
+    assert stack.commit() is None
+    assert len(stack) == 1
+    assert stack.commit() == {"key1": "value1", "key2": None}
+    assert not stack
+
+def test_errors_without_transaction():
+    """Test commit and rollback need an active transaction."""
+    stack = TransactionStack()
+    with pytest.raises(RuntimeError, match="No active transaction to commit."):
+        stack.commit()
+    with pytest.raises(RuntimeError, match="No active transaction to rollback."):
+        stack.rollback()
+
+def test_changes_merges_levels():
+    """Test changes() returns what the session sees for every key it touched."""
+    stack = TransactionStack()
+    stack.begin()
+    stack.write("key1", "outer")
+    stack.write("key2", "outer")
+    stack.begin()
+    stack.write("key1", None)
+    assert stack.changes() == {"key1": None, "key2": "outer"}
+
+def test_rollback_restores_every_level():
+    """Test rolling back nested levels one by one restores what each of them saw."""
+    stack = TransactionStack()
+    stack.begin()
+    stack.write("key1", "level1")
+    stack.begin()
+    stack.write("key1", "level2")
+    stack.write("key2", "level2")
+    stack.begin()
+    stack.write("key1", "level3")
+    stack.write("key1", None)
+    stack.write("key3", "level3")
+    stack.rollback()
+    assert stack.changes() == {"key1": "level2", "key2": "level2"}
+    stack.rollback()
+    assert stack.changes() == {"key1": "level1"}
+    stack.rollback()
+    assert stack.changes() == {}
+    assert stack.lookup("key1") is MISSING
+
+def test_rollback_after_nested_commit():
+    """Test a level committed into its parent is undone with it."""
+    stack = TransactionStack()
+    stack.begin()
+    stack.write("key1", "outer")
+    stack.begin()
+    stack.begin()
+    stack.write("key1", "inner")
+    stack.write("key2", "inner")
+    assert stack.commit() is None
+    assert stack.lookup("key1") == "inner"
+    stack.rollback()
+    assert stack.changes() == {"key1": "outer"}
+    assert stack.commit() == {"key1": "outer"}
+    assert stack.lookup("key1") is MISSING
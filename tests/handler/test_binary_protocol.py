@@ -0,0 +1,123 @@
+import pytest
+from unittest.mock import MagicMock
+
+from src.handler.binary_protocol import (
+    LENGTH, OP_CAS, OP_DEL, OP_DUMP, OP_EXIT, OP_INCR, OP_LOAD, OP_WATCH, OP_GET, OP_MGET, OP_MPUT, OP_PUT, OP_PUTEX, OP_START, OP_TTL, BinaryProtocol, decode_response, decode_value, encode_request, encode_value,
+)
+from src.model.response import Response
+
+@pytest.fixture
+def api():
+    """Fixture to provide a mock KeyValueAPI."""
+    mock_api = MagicMock()
+    mock_api.put.return_value = Response("Ok")
+    mock_api.get.return_value = Response("Ok", result="value\x00\udcff")
+    mock_api.delete.return_value = Response("Ok", result="True")
+    mock_api.start.return_value = Response("Ok")
+    return mock_api
+
+def frames(data: bytes):
+    """Splits a stream of response frames and decodes each one."""
+    decoded = []
+    while data:
+        (size,) = LENGTH.unpack_from(data)
+        decoded.append(decode_response(data[LENGTH.size:LENGTH.size + size]))
+        data = data[LENGTH.size + size:]
+    return decoded
+
+def test_value_round_trip():
+    """Test every value type survives encoding."""
+    value = [b"a", None, [b"", b"\xff"]]
+    assert decode_value(encode_value(value)) == (value, len(encode_value(value)))
+
+def test_binary_safe_put_get(api):
+    """Test arbitrary bytes reach the API and come back unchanged."""
+    protocol = BinaryProtocol(api)
+    responses = frames(protocol.feed(encode_request(OP_PUT, b"k\x00ey", b"value\x00\xff") + encode_request(OP_GET, b"k\x00ey")))
+    api.put.assert_called_once_with("k\x00ey", "value\x00\udcff")
+    api.get.assert_called_once_with("k\x00ey")
+    assert responses == [("Ok", None, None), ("Ok", b"value\x00\xff", None)]
+
+def test_frame_split_across_feeds(api):
+    """Test a frame is only handled once all of it arrived."""
+    protocol = BinaryProtocol(api)
+    frame = encode_request(OP_DEL, b"key1")
+    assert protocol.feed(frame[:2]) == b""
+    assert protocol.feed(frame[2:7]) == b""
+    assert frames(protocol.feed(frame[7:] + encode_request(OP_START))) == [("Ok", b"True", None), ("Ok", None, None)]
+
+def test_errors(api):
+    """Test bad requests get an error and leave the connection usable."""
+    protocol = BinaryProtocol(api)
+    responses = frames(protocol.feed(encode_request(99) + encode_request(OP_GET) + LENGTH.pack(3) + bytes((OP_GET, 0, 0))))
+    assert responses[:2] == [("Error", None, "Unknown opcode 99."), ("Error", None, "GET takes 1 argument(s), got 0.")]
+    assert responses[2][0] == "Error" and responses[2][2].startswith("Malformed frame")
+    assert not protocol.closed
+
+def test_api_exception(api):
+    """Test exceptions raised by the API are turned into errors."""
+    api.put.side_effect = Exception("Unexpected Error")
+    protocol = BinaryProtocol(api)
+    assert frames(protocol.feed(encode_request(OP_PUT, b"key", b"value"))) == [("Error", None, "Unexpected Error")]
+
+def test_exit_and_oversized_frames(api):
+    """Test EXIT and frames over the limit close the connection."""
+    protocol = BinaryProtocol(api)
+    assert frames(protocol.feed(encode_request(OP_EXIT) + encode_request(OP_GET, b"key"))) == [("Ok", None, None)]
+    assert protocol.closed
+    api.get.assert_not_called()
+
+    protocol = BinaryProtocol(api, max_frame_size=10)
+    assert frames(protocol.feed(LENGTH.pack(11))) == [("Error", None, "Frame exceeds 10 bytes.")]
+    assert protocol.closed
+
+def test_batch_commands(api):
+    """Test batch opcodes pass lists (or pairs) and return lists."""
+    api.mget.return_value = Response("Ok", result=["value1", None])
+    api.mput.return_value = Response("Ok")
+    protocol = BinaryProtocol(api)
+    responses = frames(protocol.feed(
+        encode_request(OP_MPUT, b"key1", b"value1", b"key2", b"value2") + encode_request(OP_MGET, b"key1", b"key2") + encode_request(OP_MPUT, b"key1")
+    ))
+    api.mput.assert_called_once_with({"key1": "value1", "key2": "value2"})
+    api.mget.assert_called_once_with(["key1", "key2"])
+    assert responses == [
+        ("Ok", None, None),
+        ("Ok", [b"value1", None], None),
+        ("Error", None, "Batch commands take a non empty list of 2 argument(s) per item."),
+    ]
+
+def test_expiry_commands(api):
+    """Test PUTEX and TTL go to the API with text arguments."""
+    api.put_ex.return_value = Response("Ok")
+    api.ttl.return_value = Response("Ok", result="10")
+    protocol = BinaryProtocol(api)
+    responses = frames(protocol.feed(encode_request(OP_PUTEX, b"key1", b"value1", b"10") + encode_request(OP_TTL, b"key1")))
+    api.put_ex.assert_called_once_with("key1", "value1", "10")
+    assert responses == [("Ok", None, None), ("Ok", b"10", None)]
+
+def test_cas_incr_and_watch_commands(api):
+    """Test CAS and INCR take fixed arguments, WATCH a list of keys."""
+    api.cas.return_value = Response("Ok", result="True")
+    api.incr.return_value = Response("Ok", result="3")
+    api.watch.return_value = Response("Ok")
+    protocol = BinaryProtocol(api)
+    responses = frames(protocol.feed(
+        encode_request(OP_CAS, b"key1", b"old", b"new") + encode_request(OP_INCR, b"counter", b"3") + encode_request(OP_WATCH, b"key1", b"key2")
+    ))
+    api.cas.assert_called_once_with("key1", "old", "new")
+    api.incr.assert_called_once_with("counter", "3")
+    api.watch.assert_called_once_with(["key1", "key2"])
+    assert responses == [("Ok", b"True", None), ("Ok", b"3", None), ("Ok", None, None)]
+
+def test_load_and_dump_commands(api):
+    """Test LOAD takes three arguments per record and DUMP a cursor and a limit."""
+    api.load.return_value = Response("Ok", result="2")
+    api.dump.return_value = Response("Ok", result=[None, [["key1", "value1", None]]])
+    protocol = BinaryProtocol(api)
+    responses = frames(protocol.feed(
+        encode_request(OP_LOAD, b"key1", b"value1", b"", b"key2", b"value2", b"1900000000") + encode_request(OP_DUMP, b"-", b"10")
+    ))
+    api.load.assert_called_once_with([["key1", "value1", ""], ["key2", "value2", "1900000000"]])
+    api.dump.assert_called_once_with("-", "10")
+    assert responses == [("Ok", b"2", None), ("Ok", [None, [[b"key1", b"value1", None]]], None)]
@@ -1,7 +1,10 @@
+import json
 import pytest
 import socket
 import threading
 from unittest.mock import MagicMock, patch
+from src.api.kv_api import KeyValueAPI
+from src.datastore.key_value_store import KeyValueStore
 from src.handler.client_handler import ClientHandler
 from src.model.response import Response
 
@@ -16,7 +19,7 @@ def mock_parser():
     """Fixture to provide a mock CommandParser."""
     with patch("src.handler.client_handler.CommandParser") as MockParser:
         mock_instance = MockParser.return_value
-        mock_instance.parse.side_effect = lambda cmd: str(Response("Ok", result=f"Response for {cmd.strip()}"))
+        mock_instance.execute.side_effect = lambda cmd: Response("Ok", result=f"Response for {cmd.strip()}").encode()
         yield mock_instance
 
 def test_client_handler_receives_data_and_sends_response(mock_socket, mock_parser):
@@ -26,17 +29,17 @@ def test_client_handler_receives_data_and_sends_response(mock_socket, mock_parse
     handler = ClientHandler(mock_socket, ("127.0.0.1", 12345))
     handler.run()  # Run the handler
 
-    # Ensure parse() was called with both commands
-    mock_parser.parse.assert_any_call("GET key1\n")
-    mock_parser.parse.assert_any_call("exit\n")
+    # Ensure execute() was called with both commands
+    mock_parser.execute.assert_any_call("GET key1\n")
+    mock_parser.execute.assert_any_call("exit\n")
 
     # Ensure responses were sent for both commands
     expected_response = str(Response("Ok", result="Response for GET key1")) + "\n"
     exit_response = str(Response("Ok", result="Response for exit")) + "\n"
 
-    assert mock_socket.send.call_count == 2
-    mock_socket.send.assert_any_call(expected_response.encode("utf-8"))  # First response
-    mock_socket.send.assert_any_call(exit_response.encode("utf-8"))  # Exit response
+    assert mock_socket.sendall.call_count == 2
+    mock_socket.sendall.assert_any_call(expected_response.encode("utf-8"))  # First response
+    mock_socket.sendall.assert_any_call(exit_response.encode("utf-8"))  # Exit response
 
     # Ensure socket was closed at the end
     mock_socket.close.assert_called_once()
@@ -48,9 +51,9 @@ def test_client_handler_handles_disconnection(mock_socket, mock_parser):
     handler = ClientHandler(mock_socket, ("127.0.0.1", 12345))
     handler.run()  # Run the handler
 
-    mock_parser.parse.assert_called_with("HELLO\n")  # Ensure parser received the command
+    mock_parser.execute.assert_called_with("HELLO\n")  # Ensure parser received the command
     expected_response = str(Response("Ok", result="Response for HELLO")) + "\n"
-    mock_socket.send.assert_called_with(expected_response.encode("utf-8"))  # Ensure response was sent
+    mock_socket.sendall.assert_called_with(expected_response.encode("utf-8"))  # Ensure response was sent
     mock_socket.close.assert_called_once()  # Ensure socket was closed after disconnection
 
 def test_client_handler_handles_unexpected_disconnection(mock_socket, mock_parser):
@@ -62,6 +65,19 @@ def test_client_handler_handles_unexpected_disconnection(mock_socket, mock_parse
 
     mock_socket.close.assert_called_once()  # Ensure socket was closed properly
 
+def test_client_handler_closes_when_a_send_fails(mock_socket, mock_parser):
+    """Test that a broken pipe while answering still closes the socket and counts the connection closed."""
+    mock_socket.recv.side_effect = [b"GET key1\n", b"GET key2\n"]
+    mock_socket.sendall.side_effect = BrokenPipeError  # e.g. shut down as a slow consumer
+
+    handler = ClientHandler(mock_socket, ("127.0.0.1", 12345))
+    with patch("src.handler.client_handler.METRICS") as metrics:
+        handler.run()
+
+    mock_socket.sendall.assert_called_once()
+    metrics.connection_closed.assert_called_once()
+    mock_socket.close.assert_called_once()
+
 def test_client_handler_stops_on_exit_command(mock_socket, mock_parser):
     """Test that ClientHandler stops execution when receiving 'exit'."""
     mock_socket.recv.side_effect = [b"exit\n"]  # Simulate exit command
@@ -69,9 +85,9 @@ def test_client_handler_stops_on_exit_command(mock_socket, mock_parser):
     handler = ClientHandler(mock_socket, ("127.0.0.1", 12345))
     handler.run()  # Run the handler
 
-    mock_parser.parse.assert_called_with("exit\n")  # Ensure parser was called
+    mock_parser.execute.assert_called_with("exit\n")  # Ensure parser was called
     expected_response = str(Response("Ok", result="Response for exit")) + "\n"
-    mock_socket.send.assert_called_with(expected_response.encode("utf-8"))  # Ensure response was sent
+    mock_socket.sendall.assert_called_with(expected_response.encode("utf-8"))  # Ensure response was sent
     mock_socket.close.assert_called_once()  # Ensure socket was closed after "exit"
 
 def test_client_handler_ignores_empty_messages(mock_socket, mock_parser):
@@ -81,8 +97,45 @@ def test_client_handler_ignores_empty_messages(mock_socket, mock_parser):
     handler = ClientHandler(mock_socket, ("127.0.0.1", 12345))
     handler.run()  # Run the handler
 
-    mock_parser.parse.assert_called_with("exit\n")  # Ensure parser was called for 'exit'
+    mock_parser.execute.assert_called_with("exit\n")  # Ensure parser was called for 'exit'
     expected_response = str(Response("Ok", result="Response for exit")) + "\n"
-    mock_socket.send.assert_called_with(expected_response.encode("utf-8"))  # Ensure response was sent
+    mock_socket.sendall.assert_called_with(expected_response.encode("utf-8"))  # Ensure response was sent
     mock_socket.close.assert_called_once()  # Ensure socket was closed properly
 
+
+def test_client_handler_batches_pipelined_commands(mock_socket, mock_parser):
+    """Test that several commands in one read are all parsed and answered with one write."""
+    mock_socket.recv.side_effect = [b"GET key1\nGET key2\nGET ke", b"y3\n", b""]
+
+    handler = ClientHandler(mock_socket, ("127.0.0.1", 12345))
+    handler.run()
+
+    assert [c.args[0] for c in mock_parser.execute.call_args_list] == ["GET key1\n", "GET key2\n", "GET key3\n"]
+    first_batch = (
+        str(Response("Ok", result="Response for GET key1")) + "\n" + str(Response("Ok", result="Response for GET key2")) + "\n"
+    )
+    assert mock_socket.sendall.call_count == 2
+    mock_socket.sendall.assert_any_call(first_batch.encode("utf-8"))
+    mock_socket.sendall.assert_called_with((str(Response("Ok", result="Response for GET key3")) + "\n").encode("utf-8"))
+
+def test_client_handler_pushes_subscribed_events():
+    """Test a subscribed connection gets events of other clients' writes, from the pusher thread."""
+    store = KeyValueStore()
+    KeyValueAPI.configure(store)
+    server_side, client_side = socket.socketpair()
+    handler = ClientHandler(server_side, ("127.0.0.1", 12345))
+    handler.start()
+    try:
+        reader = client_side.makefile("rb")
+        client_side.sendall(b"SUBSCRIBE key1\n")
+        assert json.loads(reader.readline()) == {"status": "Ok", "result": "1"}
+        store.put("key1", "value1")
+        assert json.loads(reader.readline()) == {"status": "Event", "result": {"key1": "value1"}}
+        client_side.sendall(b"exit\n")
+        assert json.loads(reader.readline())["status"] == "Error"
+        handler.join(timeout=5)
+        handler._pusher.join(timeout=5)
+        assert not handler.is_alive() and not handler._pusher.is_alive()
+    finally:
+        client_side.close()
+        KeyValueAPI.configure(KeyValueStore())
@@ -1,7 +1,7 @@
 import pytest
 from unittest.mock import MagicMock, patch
 import json
-from src.handler.parser import CommandParser
+from src.handler.parser import AVAILABLE_COMMANDS, COMMANDS, CommandParser
 from src.model.response import Response
 
 @pytest.fixture
@@ -14,13 +14,19 @@ def mock_api():
         mock_instance.start.return_value = Response("Ok")
         mock_instance.commit.return_value = Response("Ok")
         mock_instance.rollback.return_value = Response("Ok")
+        mock_instance.mget.return_value = Response("Ok", result=["v1", None])
+        mock_instance.mput.return_value = Response("Ok")
+        mock_instance.mdelete.return_value = Response("Ok", result="2")
+        mock_instance.put_ex.return_value = Response("Ok")
+        mock_instance.expire.return_value = Response("Ok", result="True")
+        mock_instance.ttl.return_value = Response("Ok", result="10")
         yield mock_instance
 
 def test_empty_command(mock_api):
     """Test handling of an empty command."""
     parser = CommandParser()
     response = parser.parse("")
-    assert json.loads(response) == {"status": "Error", "mesg": "Empty command. Available commands: PUT, GET, DEL, START, COMMIT, ROLLBACK"}
+    assert json.loads(response) == {"status": "Error", "mesg": "Empty command. Available commands: PUT, PUTEX, GET, DEL, MGET, MPUT, MDEL, EXPIRE, TTL, CAS, INCR, DECR, WATCH, UNWATCH, SCAN, PREFIX, LOAD, DUMP, SUBSCRIBE, UNSUBSCRIBE, STATS, CLUSTER, START, COMMIT, ROLLBACK"}
 
 def test_put_command(mock_api):
     """Test PUT command with correct arguments."""
@@ -76,7 +82,7 @@ def test_unknown_command(mock_api):
     """Test handling of an unknown command."""
     parser = CommandParser()
     response = parser.parse("UNKNOWN")
-    assert json.loads(response) == {"status": "Error", "mesg": "Unknown command 'UNKNOWN'. Available commands: PUT, GET, DEL, START, COMMIT, ROLLBACK"}
+    assert json.loads(response) == {"status": "Error", "mesg": "Unknown command 'UNKNOWN'. Available commands: PUT, PUTEX, GET, DEL, MGET, MPUT, MDEL, EXPIRE, TTL, CAS, INCR, DECR, WATCH, UNWATCH, SCAN, PREFIX, LOAD, DUMP, SUBSCRIBE, UNSUBSCRIBE, STATS, CLUSTER, START, COMMIT, ROLLBACK"}
 
 def test_exception_handling(mock_api):
     """Test that an exception inside the API is properly caught."""
@@ -85,3 +91,134 @@ def test_exception_handling(mock_api):
     response = parser.parse("PUT key1 value1")
     assert json.loads(response) == {"status": "Error", "mesg": "Unexpected Error"}
 
+
+def test_mget_command(mock_api):
+    """Test MGET passes every key and returns the list of values."""
+    parser = CommandParser()
+    response = parser.parse("MGET key1  key2\n")
+    assert json.loads(response) == {"status": "Ok", "result": ["v1", None]}
+    mock_api.mget.assert_called_once_with(["key1", "key2"])
+
+def test_mput_command(mock_api):
+    """Test MPUT pairs up its arguments."""
+    parser = CommandParser()
+    response = parser.parse("MPUT key1 value1 key2 value2")
+    assert json.loads(response) == {"status": "Ok"}
+    mock_api.mput.assert_called_once_with({"key1": "value1", "key2": "value2"})
+
+def test_mdel_command(mock_api):
+    """Test MDEL passes every key."""
+    parser = CommandParser()
+    response = parser.parse("mdel key1 key2")
+    assert json.loads(response) == {"status": "Ok", "result": "2"}
+    mock_api.mdelete.assert_called_once_with(["key1", "key2"])
+
+def test_batch_commands_usage(mock_api):
+    """Test batch commands with missing or unpaired arguments."""
+    parser = CommandParser()
+    assert json.loads(parser.parse("MGET"))["mesg"] == "MGET requires at least one key. Usage: MGET <key> [<key> ...]"
+    assert json.loads(parser.parse("MPUT key1 value1 key2"))["mesg"] == "MPUT requires key value pairs. Usage: MPUT <key> <value> [<key> <value> ...]"
+    assert json.loads(parser.parse("MDEL"))["mesg"] == "MDEL requires at least one key. Usage: MDEL <key> [<key> ...]"
+    mock_api.mput.assert_not_called()
+
+def test_put_with_expiry(mock_api):
+    """Test PUTEX takes the seconds before the value, which keeps its spaces."""
+    parser = CommandParser()
+    assert json.loads(parser.parse("PUTEX key1 10 hello world")) == {"status": "Ok"}
+    mock_api.put_ex.assert_called_once_with("key1", "hello world", "10")
+    assert json.loads(parser.parse("PUTEX key1 10"))["mesg"] == "PUTEX requires three arguments. Usage: PUTEX <key> <seconds> <value>"
+
+def test_put_values_ending_with_ex(mock_api):
+    """Test PUT stores values containing " ex " verbatim, never as an expiry."""
+    parser = CommandParser()
+    parser.parse("PUT key1 see you ex tomorrow")
+    parser.parse("PUT key2 price EX 5")
+    assert [c.args for c in mock_api.put.call_args_list] == [("key1", "see you ex tomorrow"), ("key2", "price EX 5")]
+    mock_api.put_ex.assert_not_called()
+
+def test_expire_and_ttl_commands(mock_api):
+    """Test EXPIRE and TTL forward their arguments."""
+    parser = CommandParser()
+    assert json.loads(parser.parse("EXPIRE key1 10")) == {"status": "Ok", "result": "True"}
+    mock_api.expire.assert_called_once_with("key1", "10")
+    assert json.loads(parser.parse("ttl key1")) == {"status": "Ok", "result": "10"}
+    mock_api.ttl.assert_called_once_with("key1")
+    assert json.loads(parser.parse("EXPIRE key1"))["mesg"] == "EXPIRE requires two arguments. Usage: EXPIRE <key> <seconds>"
+    assert json.loads(parser.parse("TTL"))["mesg"] == "TTL requires one argument. Usage: TTL <key>"
+
+def test_scan_and_prefix_commands(mock_api):
+    """Test SCAN and PREFIX parse their options."""
+    mock_api.scan.return_value = Response("Ok", result=[None, [["key1", "value1"]]])
+    mock_api.prefix.return_value = Response("Ok", result=["user:2", []])
+    parser = CommandParser()
+    assert json.loads(parser.parse("SCAN - + limit 10")) == {"status": "Ok", "result": [None, [["key1", "value1"]]]}
+    mock_api.scan.assert_called_once_with("-", "+", "10")
+    parser.parse("PREFIX user: FROM user:2")
+    mock_api.prefix.assert_called_once_with("user:", 100, "user:2")
+    assert json.loads(parser.parse("SCAN a"))["mesg"] == "SCAN requires a start and an end key. Usage: SCAN <start|-> <end|+> [LIMIT <n>]"
+    assert json.loads(parser.parse("PREFIX user: LIMIT"))["mesg"] == "PREFIX requires a prefix. Usage: PREFIX <prefix> [LIMIT <n>] [FROM <cursor>]"
+
+def test_stats_command(mock_api):
+    """Test STATS answers the metrics."""
+    mock_api.stats.return_value = Response("Ok", result={"connections": {"active": 1}})
+    parser = CommandParser()
+    assert json.loads(parser.parse("STATS")) == {"status": "Ok", "result": {"connections": {"active": 1}}}
+    assert json.loads(parser.parse("STATS now"))["mesg"] == "STATS does not take arguments."
+
+def test_cluster_command(mock_api):
+    """Test the CLUSTER subcommands reach the API with their arguments."""
+    mock_api.cluster_set_ring.return_value = Response("Ok")
+    mock_api.cluster_take.return_value = Response("Ok", result=[None, []])
+    parser = CommandParser()
+    assert json.loads(parser.parse("CLUSTER SETRING 2 127.0.0.1:4000 127.0.0.1:4001")) == {"status": "Ok"}
+    mock_api.cluster_set_ring.assert_called_once_with("2", ["127.0.0.1:4000", "127.0.0.1:4001"])
+    parser.parse("cluster take 2 127.0.0.1:4001 - 1000")
+    mock_api.cluster_take.assert_called_once_with("2", "127.0.0.1:4001", "-", "1000")
+    assert json.loads(parser.parse("CLUSTER SETRING 2"))["mesg"].startswith("Usage: CLUSTER INFO")
+
+def test_cas_incr_and_watch_commands(mock_api):
+    """Test CAS keeps spaces in the new value, INCR/DECR take an optional amount, WATCH any number of keys."""
+    mock_api.cas.return_value = Response("Ok", result="True")
+    mock_api.incr.return_value = Response("Ok", result="5")
+    mock_api.watch.return_value = Response("Ok")
+    parser = CommandParser()
+    assert json.loads(parser.parse("CAS key1 old a new value")) == {"status": "Ok", "result": "True"}
+    mock_api.cas.assert_called_once_with("key1", "old", "a new value")
+    parser.parse("INCR counter")
+    parser.parse("INCR counter 4")
+    assert mock_api.incr.call_args_list[0].args == ("counter",)
+    assert mock_api.incr.call_args_list[1].args == ("counter", "4")
+    parser.parse("DECR counter 2")
+    mock_api.decr.assert_called_once_with("counter", "2")
+    parser.parse("WATCH key1 key2")
+    mock_api.watch.assert_called_once_with(["key1", "key2"])
+    assert json.loads(parser.parse("CAS key1 old"))["mesg"] == "CAS requires three arguments. Usage: CAS <key> <expected> <value>"
+    assert json.loads(parser.parse("UNWATCH key1"))["mesg"] == "UNWATCH does not take arguments."
+
+def test_execute_returns_the_encoded_line(mock_api):
+    """Test execute answers bytes ready to send, usage errors without calling the API."""
+    parser = CommandParser()
+    assert parser.execute("GET key1\n") == b'{"status": "Ok", "result": "mocked_value"}\n'
+    assert parser.execute("START") == b'{"status": "Ok"}\n'
+    assert parser.execute("GET") is parser.execute("GET a b")  # encoded once
+    mock_api.get.assert_called_once_with("key1")
+
+def test_every_command_is_registered():
+    """Test the listed commands are the registered ones, each with its usage."""
+    assert AVAILABLE_COMMANDS.split(", ") == list(COMMANDS)
+    for name, spec in COMMANDS.items():
+        assert json.loads(spec.usage)["status"] == "Error", name
+
+def test_load_and_dump_commands(mock_api):
+    """Test LOAD passes its JSON untouched, spaces included, and DUMP its cursor and limit."""
+    mock_api.load.return_value = Response("Ok", result="1")
+    mock_api.dump.return_value = Response("Ok", result=[None, []])
+    parser = CommandParser()
+    assert json.loads(parser.parse('LOAD [["key1", "a value", null]]')) == {"status": "Ok", "result": "1"}
+    mock_api.load.assert_called_once_with('[["key1", "a value", null]]')
+    parser.parse("DUMP key1 LIMIT 10")
+    parser.parse("DUMP -")
+    assert mock_api.dump.call_args_list[0].args == ("key1", "10")
+    assert mock_api.dump.call_args_list[1].args == ("-", 1000)
+    assert json.loads(parser.parse("LOAD"))["mesg"].startswith("LOAD requires records.")
+    assert json.loads(parser.parse("DUMP - LIMIT"))["mesg"] == "DUMP requires a cursor. Usage: DUMP <cursor|-> [LIMIT <n>]"
@@ -0,0 +1,76 @@
+import json
+import pytest
+from unittest.mock import MagicMock
+from src.handler.binary_protocol import HANDSHAKE, OP_GET, BinaryProtocol, decode_response, encode_request
+from src.handler.protocol import NegotiatedProtocol, TextProtocol
+from src.model.response import Response
+
+@pytest.fixture
+def parser():
+    """Fixture to provide a parser echoing back the command it received."""
+    mock_parser = MagicMock()
+    mock_parser.execute.side_effect = lambda cmd: Response("Ok", result=cmd.strip()).encode()
+    return mock_parser
+
+def results(data: bytes):
+    return [json.loads(line).get("result") for line in data.decode("utf-8").splitlines()]
+
+def test_multiple_commands_in_one_feed(parser):
+    """Test every complete command of a read is answered, in order."""
+    protocol = TextProtocol(parser)
+    assert results(protocol.feed(b"GET a\nGET b\nGET c\n")) == ["GET a", "GET b", "GET c"]
+
+def test_command_split_across_feeds(parser):
+    """Test a partial command waits for the rest of its bytes."""
+    protocol = TextProtocol(parser)
+    assert protocol.feed(b"PUT key ") == b""
+    assert protocol.feed(b"some ") == b""
+    assert results(protocol.feed(b"value\r\nGET")) == ["PUT key some value"]
+    assert results(protocol.feed(b" key\n")) == ["GET key"]
+
+def test_large_values(parser):
+    """Test values way bigger than a single read are accepted."""
+    protocol = TextProtocol(parser)
+    value = "x" * 1_000_000
+    data = f"PUT big {value}\n".encode("utf-8")
+    chunks = [protocol.feed(data[i:i + 65536]) for i in range(0, len(data), 65536)]
+    assert results(b"".join(chunks)) == [f"PUT big {value}"]
+
+def test_exit_stops_processing(parser):
+    """Test nothing after exit is executed."""
+    protocol = TextProtocol(parser)
+    assert results(protocol.feed(b"GET a\nexit\nGET b\n")) == ["GET a", "exit"]
+    assert protocol.closed
+    assert parser.execute.call_count == 2
+
+def test_line_too_long(parser):
+    """Test a command bigger than the limit is rejected and the connection closed."""
+    protocol = TextProtocol(parser, max_line_size=10)
+    response = json.loads(protocol.feed(b"PUT key 0123456789"))
+    assert response == {"status": "Error", "mesg": "Command exceeds 10 bytes."}
+    assert protocol.closed
+    parser.execute.assert_not_called()
+
+def test_invalid_utf8(parser):
+    """Test undecodable bytes produce an error instead of killing the connection."""
+    protocol = TextProtocol(parser)
+    response = json.loads(protocol.feed(b"GET \xff\n"))
+    assert response == {"status": "Error", "mesg": "Commands must be valid UTF-8."}
+    assert not protocol.closed
+
+def test_negotiates_text(parser):
+    """Test plain commands pick the text protocol."""
+    protocol = NegotiatedProtocol(parser)
+    assert results(protocol.feed(b"GET a\n")) == ["GET a"]
+    assert isinstance(protocol.protocol, TextProtocol)
+
+def test_negotiates_binary(parser):
+    """Test the handshake, even split in pieces, picks the binary protocol and is echoed back."""
+    parser.api.get.return_value = Response("Ok", result="value")
+    protocol = NegotiatedProtocol(parser)
+    assert protocol.feed(HANDSHAKE[:2]) == b""
+    response = protocol.feed(HANDSHAKE[2:] + encode_request(OP_GET, b"key"))
+    assert isinstance(protocol.protocol, BinaryProtocol)
+    assert response.startswith(HANDSHAKE)
+    assert decode_response(response[len(HANDSHAKE) + 4:]) == ("Ok", b"value", None)
+    parser.execute.assert_not_called()
@@ -0,0 +1,55 @@
+import threading
+import time
+
+from src.metrics.metrics import Histogram, InstrumentedLock, Metrics, bucket_of, bucket_start, instrumented
+from src.model.response import Response
+
+def test_buckets_are_log_linear():
+    """Test small values get exact buckets and big ones stay within 12.5%."""
+    assert [bucket_of(v) for v in range(16)] == list(range(16))
+    for value in (16, 17, 100, 1000, 123_456_789):
+        bucket = bucket_of(value)
+        assert bucket_start(bucket) <= value < bucket_start(bucket + 1)
+        assert bucket_start(bucket + 1) - bucket_start(bucket) <= value / 8
+
+def test_histogram_percentiles():
+    """Test percentiles land in the right bucket."""
+    histogram = Histogram()
+    for us in range(1, 1001):
+        histogram.record(us / 1e6)
+    assert 450e-6 <= histogram.percentile(0.5) <= 560e-6
+    assert 940e-6 <= histogram.percentile(0.99) <= 1000e-6
+    assert histogram.summary()["max_us"] == 1000.0
+    assert histogram.cumulative([1, 2, 1024]) == [0, 1, 1000]
+
+def test_instrumented_counts_calls_and_errors(monkeypatch):
+    """Test decorated API methods are counted per name, Error responses as errors."""
+    metrics = Metrics()
+    monkeypatch.setattr("src.metrics.metrics.METRICS", metrics)
+
+    @instrumented
+    def get(ok):
+        return Response("Ok" if ok else "Error")
+
+    get(True)
+    get(False)
+    snapshot = metrics.snapshot()["commands"]["get"]
+    assert (snapshot["calls"], snapshot["errors"], snapshot["count"]) == (2, 1, 2)
+
+def test_instrumented_lock_measures_waits():
+    """Test only contended acquisitions are timed."""
+    metrics = Metrics()
+    lock = InstrumentedLock(threading.RLock(), metrics)
+    with lock:
+        with lock:  # reentrant, not contended
+            pass
+    assert (metrics.lock_acquisitions, metrics.lock_contended) == (2, 0)
+
+    lock.acquire()
+    waiter = threading.Thread(target=lambda: (lock.acquire(), lock.release()))
+    waiter.start()
+    time.sleep(0.05)
+    lock.release()
+    waiter.join()
+    assert metrics.lock_contended == 1
+    assert metrics.lock_wait.max >= 0.04
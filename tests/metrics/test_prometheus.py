@@ -0,0 +1,28 @@
+import urllib.request
+
+from src.metrics.metrics import Metrics
+from src.metrics.prometheus import render, start_metrics_server
+
+def test_render():
+    """Test counters and cumulative histogram buckets in the text format."""
+    metrics = Metrics()
+    metrics.record_command("get", 3e-6, True)
+    metrics.record_command("get", 0.5, False)
+    metrics.connection_opened()
+    text = render(metrics)
+    assert 'hkv_commands_total{command="get"} 2' in text
+    assert 'hkv_command_errors_total{command="get"} 1' in text
+    assert 'hkv_command_duration_seconds_bucket{command="get",le="4e-06"} 1' in text
+    assert 'hkv_command_duration_seconds_bucket{command="get",le="+Inf"} 2' in text
+    assert "hkv_connections 1" in text
+    assert "hkv_lock_wait_seconds_count 0" in text
+
+def test_endpoint():
+    """Test /metrics is served over HTTP."""
+    server = start_metrics_server(0)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+            assert response.status == 200
+            assert b"hkv_connections_total" in response.read()
+    finally:
+        server.shutdown()
@@ -22,3 +22,19 @@ def test_error_response_without_message():
     expected_output = json.dumps({"status": "Error"})
     assert str(response) == expected_output
 
+
+@pytest.mark.parametrize("response", [
+    Response("Ok"),
+    Response("Error"),
+    Response("Ok", result="some value"),
+    Response("Ok", result="quotes \" and \\ and é and \udcff"),
+    Response("Ok", result=["v1", None]),
+    Response("Ok", result={"epoch": 1, "nodes": ["a:1"]}),
+    Response("Moved", "127.0.0.1:4001", mesg="Owned by 127.0.0.1:4001."),
+    Response("Error", mesg="Unexpected error!"),
+])
+def test_encode_matches_str(response):
+    assert response.encode() == (str(response) + "\n").encode("utf-8")
+
+def test_status_only_lines_are_shared():
+    assert Response("Ok").encode() is Response("Ok").encode()
@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+from src.handler.binary_protocol import HANDSHAKE, LENGTH, OP_GET, OP_PUT, decode_response, encode_request
+from src.server.async_server import AsyncTCPServer
+
+async def send(reader, writer, command):
+    writer.write((command + "\n").encode("utf-8"))
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+def run_with_server(scenario):
+    async def main():
+        server = AsyncTCPServer(host="127.0.0.1", port=0)
+        await server.start_serving()
+        try:
+            await scenario(server.port)
+        finally:
+            server.stop()
+    asyncio.run(main())
+
+def test_put_get_over_asyncio():
+    """Test the basic protocol is served by the asyncio server."""
+    async def scenario(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        assert await send(reader, writer, "PUT async_key1 some value") == {"status": "Ok"}
+        assert await send(reader, writer, "GET async_key1") == {"status": "Ok", "result": "some value"}
+        assert (await send(reader, writer, "exit"))["status"] == "Error"
+        assert await reader.read() == b""  # server closed the connection
+        writer.close()
+    run_with_server(scenario)
+
+def test_transactions_are_per_connection():
+    """Test a transaction started on one connection is invisible to another one."""
+    async def scenario(port):
+        r1, w1 = await asyncio.open_connection("127.0.0.1", port)
+        r2, w2 = await asyncio.open_connection("127.0.0.1", port)
+        await send(r1, w1, "START")
+        await send(r1, w1, "PUT async_txn_key inside")
+        assert await send(r1, w1, "GET async_txn_key") == {"status": "Ok", "result": "inside"}
+        assert await send(r2, w2, "GET async_txn_key") == {"status": "Ok", "result": "async_txn_key was not found."}
+        assert await send(r2, w2, "COMMIT") == {"status": "Error", "mesg": "No active transaction to commit."}
+        await send(r1, w1, "COMMIT")
+        assert await send(r2, w2, "GET async_txn_key") == {"status": "Ok", "result": "inside"}
+        w1.close()
+        w2.close()
+    run_with_server(scenario)
+
+def test_many_concurrent_connections():
+    """Test lots of idle connections can be held open while others are served."""
+    async def scenario(port):
+        connections = await asyncio.gather(*(asyncio.open_connection("127.0.0.1", port) for _ in range(200)))
+        responses = await asyncio.gather(*(send(r, w, f"PUT async_many_{i} {i}") for i, (r, w) in enumerate(connections)))
+        assert all(response == {"status": "Ok"} for response in responses)
+        reader, writer = connections[-1]
+        assert await send(reader, writer, "GET async_many_42") == {"status": "Ok", "result": "42"}
+        for _, writer in connections:
+            writer.close()
+    run_with_server(scenario)
+
+def test_pipelined_commands():
+    """Test commands sent back to back in one write are all answered in order."""
+    async def scenario(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=1024 * 1024)
+        big = "v" * 100_000
+        writer.write(f"PUT async_pipe_1 {big}\nPUT async_pipe_2 two\nGET async_pipe_1\nGET async_pipe_2\n".encode("utf-8"))
+        await writer.drain()
+        responses = [json.loads(await reader.readline()) for _ in range(4)]
+        assert responses == [
+            {"status": "Ok"}, {"status": "Ok"},
+            {"status": "Ok", "result": big}, {"status": "Ok", "result": "two"},
+        ]
+        writer.close()
+    run_with_server(scenario)
+
+def test_binary_protocol():
+    """Test a connection opening with the handshake is served the binary protocol."""
+    async def scenario(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(HANDSHAKE + encode_request(OP_PUT, b"async_bin\x00", b"\xff\xfe") + encode_request(OP_GET, b"async_bin\x00"))
+        await writer.drain()
+        assert await reader.readexactly(len(HANDSHAKE)) == HANDSHAKE
+        responses = []
+        for _ in range(2):
+            (size,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+            responses.append(decode_response(await reader.readexactly(size)))
+        assert responses == [("Ok", None, None), ("Ok", b"\xff\xfe", None)]
+        writer.close()
+    run_with_server(scenario)
@@ -0,0 +1,35 @@
+import logging
+
+from logging.handlers import QueueHandler
+
+from src.server import logs
+from src.server.logs import RequestLog, configure_logging
+
+def test_request_log_is_off_by_default(caplog):
+    """Test nothing is sampled without a sample rate."""
+    request_log = RequestLog()
+    assert not any(request_log.sampled() for _ in range(1000))
+
+def test_request_log_is_structured(caplog):
+    """Test sampled reads are logged as key=value pairs, long commands cut."""
+    request_log = RequestLog(sample_rate=1.0, max_command_size=8)
+    assert request_log.sampled()
+    with caplog.at_level(logging.INFO, logger="hkv.requests"):
+        request_log.log(("127.0.0.1", 5000), b"PUT key1 value1\nGET key1\n")
+    assert caplog.messages == ["request client=127.0.0.1:5000 bytes=25 commands=2 first='PUT key1'"]
+
+def test_configure_logging_writes_from_a_thread(capsys):
+    """Test records go through a queue and are written by the listener thread."""
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    try:
+        configure_logging("WARNING")
+        assert [type(handler) for handler in root.handlers] == [QueueHandler]
+        logging.info("dropped")
+        logging.warning("through the queue")
+        logs._listener.stop()  # flushes what's queued
+        logs._listener = None
+        assert capsys.readouterr().err.endswith("WARNING - through the queue\n")
+    finally:
+        root.handlers[:] = handlers
+        root.setLevel(level)
@@ -0,0 +1,117 @@
+import json
+import socket
+import time
+
+import pytest
+
+from src.api.kv_api import KeyValueAPI
+from src.datastore.key_value_store import KeyValueStore
+from src.metrics.metrics import METRICS
+from src.server.pooled_server import PooledTCPServer
+
+def connect(port):
+    client = socket.create_connection(("127.0.0.1", port), timeout=5)
+    return client, client.makefile("rb")
+
+def send(connection, command):
+    client, reader = connection
+    client.sendall((command + "\n").encode("utf-8"))
+    return json.loads(reader.readline())
+
+@pytest.fixture
+def store():
+    """Fixture serving a fresh store, the previous one is put back afterwards."""
+    store = KeyValueStore()
+    KeyValueAPI.configure(store)
+    yield store
+    KeyValueAPI.configure(KeyValueStore())
+
+def serve(**options):
+    server = PooledTCPServer(host="127.0.0.1", port=0, **options)
+    server.start_serving()
+    return server
+
+def test_put_get_and_transactions(store):
+    """Test commands are served by the pool and every connection keeps its own session."""
+    server = serve(workers=2)
+    try:
+        first, second = connect(server.port), connect(server.port)
+        assert send(first, "START") == {"status": "Ok"}
+        assert send(first, "PUT pool_key inside") == {"status": "Ok"}
+        assert send(second, "GET pool_key") == {"status": "Ok", "result": "pool_key was not found."}
+        assert send(second, "COMMIT") == {"status": "Error", "mesg": "No active transaction to commit."}
+        assert send(first, "COMMIT") == {"status": "Ok"}
+        assert send(second, "GET pool_key") == {"status": "Ok", "result": "inside"}
+        assert send(first, "exit")["status"] == "Error"
+        assert first[1].read() == b""  # server closed the connection
+    finally:
+        server.stop()
+
+def test_pipelined_commands_stay_in_order(store):
+    """Test many pipelined commands of one client are answered in order, past the per connection queue."""
+    server = serve(workers=4, connection_queue=2)
+    try:
+        client, reader = connect(server.port)
+        client.sendall(b"".join(b"INCR pool_counter\n" for _ in range(2000)))
+        results = [json.loads(reader.readline())["result"] for _ in range(2000)]
+        assert results == [str(i) for i in range(1, 2001)]
+    finally:
+        server.stop()
+
+def test_max_connections(store):
+    """Test clients past max_connections are answered Busy and disconnected."""
+    METRICS.reset()
+    server = serve(workers=1, max_connections=1)
+    try:
+        first = connect(server.port)
+        assert send(first, "PUT pool_key value") == {"status": "Ok"}
+        _, reader = connect(server.port)
+        assert json.loads(reader.readline())["status"] == "Busy"
+        assert reader.read() == b""
+        assert send(first, "GET pool_key") == {"status": "Ok", "result": "value"}
+        assert METRICS.snapshot()["overload"]["rejected_connections"] == 1
+    finally:
+        server.stop()
+
+def test_busy_when_every_worker_is_taken(store):
+    """Test reads arriving while the worker and the queue are full are answered Busy without running."""
+    server = serve(workers=1, queue_size=1)
+    try:
+        first, second, third = connect(server.port), connect(server.port), connect(server.port)
+        with store._lock:  # the worker blocks on the first GET
+            first[0].sendall(b"GET pool_key\n")
+            wait_until(lambda: server._queue.empty() and any(c.scheduled for c in server._connections.values()))
+            second[0].sendall(b"GET pool_key\n")
+            wait_until(server._queue.full)
+            assert send(third, "PUT pool_key busy") == {"status": "Busy", "mesg": "Server busy, try again later."}
+        assert json.loads(first[1].readline())["status"] == "Ok"
+        assert json.loads(second[1].readline())["status"] == "Ok"
+        assert send(third, "GET pool_key") == {"status": "Ok", "result": "pool_key was not found."}
+    finally:
+        server.stop()
+
+def test_subscribe(store):
+    """Test events are pushed to subscribed connections, and a subscriber not reading them is dropped."""
+    server = serve(workers=2)
+    KeyValueAPI().pubsub.max_pending = 100
+    try:
+        subscriber, slow, writer = connect(server.port), connect(server.port), connect(server.port)
+        assert send(subscriber, "SUBSCRIBE pool_*") == {"status": "Ok", "result": "1"}
+        assert send(slow, "SUBSCRIBE pool_key") == {"status": "Ok", "result": "1"}
+        assert send(writer, "PUT pool_key value") == {"status": "Ok"}
+        assert json.loads(subscriber[1].readline()) == {"status": "Event", "result": {"pool_key": "value"}}
+        assert send(writer, "DEL pool_key") == {"status": "Ok", "result": "True"}
+        assert json.loads(subscriber[1].readline()) == {"status": "Event", "result": {"pool_key": None}}
+        assert send(subscriber, "UNSUBSCRIBE") == {"status": "Ok", "result": "0"}
+        for i in range(200):  # slow never reads
+            store.put("pool_key", str(i) * 100_000)
+        wait_until(lambda: len(server._connections) == 2)
+        assert send(subscriber, "GET pool_key")["result"] == "199" * 100_000
+    finally:
+        server.stop()
+
+def wait_until(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
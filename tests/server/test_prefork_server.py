@@ -0,0 +1,70 @@
+import json
+import multiprocessing
+import socket
+import time
+import pytest
+
+from src.datastore.key_value_store import KeyValueStore
+from src.server.prefork_server import PreforkServer
+from src.server.tcp_server import TCPServer
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def connect(port, attempts=50):
+    for _ in range(attempts):
+        try:
+            return socket.create_connection(("127.0.0.1", port))
+        except ConnectionRefusedError:
+            time.sleep(0.05)
+    raise ConnectionRefusedError(port)
+
+def request(sock, command):
+    sock.sendall((command + "\n").encode("utf-8"))
+    return json.loads(sock.makefile().readline())
+
+def test_invalid_worker_count():
+    """Test a prefork server needs workers."""
+    with pytest.raises(ValueError):
+        PreforkServer(KeyValueStore, lambda: None, workers=0)
+
+def test_workers_share_one_store():
+    """Test every connection sees the same data, whichever worker accepted it."""
+    port = free_port()
+    server = PreforkServer(KeyValueStore, lambda: TCPServer("127.0.0.1", port, reuse_port=True), workers=2)
+    process = multiprocessing.get_context("fork").Process(target=server.start)
+    process.start()
+    try:
+        writer = connect(port)
+        assert request(writer, "PUT prefork_key shared") == {"status": "Ok"}
+        for _ in range(6):  # new connections get spread over both workers
+            with connect(port) as reader:
+                assert request(reader, "GET prefork_key") == {"status": "Ok", "result": "shared"}
+        writer.close()
+    finally:
+        process.terminate()
+        process.join()
+
+def test_store_is_built_in_the_store_process():
+    """Test the store is made after the fork, so threads it starts run where the data is."""
+    context = multiprocessing.get_context("fork")
+    built_in = context.Queue()
+
+    def make_store():
+        built_in.put(multiprocessing.current_process().name)
+        return KeyValueStore()
+
+    port = free_port()
+    server = PreforkServer(make_store, lambda: TCPServer("127.0.0.1", port, reuse_port=True), workers=1)
+    process = context.Process(target=server.start)
+    process.start()
+    try:
+        with connect(port) as client:
+            assert request(client, "PUT prefork_key built") == {"status": "Ok"}
+        assert built_in.get(timeout=5) == "kv-store"
+        assert built_in.empty()
+    finally:
+        process.terminate()
+        process.join()
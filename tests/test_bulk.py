@@ -0,0 +1,59 @@
+import io
+import time
+
+import pytest
+
+from src.api.kv_api import KeyValueAPI
+from src.bulk import dump, load
+from src.client.client import Client
+from src.datastore.key_value_store import KeyValueStore
+from src.server.pooled_server import PooledTCPServer
+
+@pytest.fixture
+def client():
+    """Fixture serving a fresh store from a pooled server."""
+    KeyValueAPI.configure(KeyValueStore())
+    server = PooledTCPServer(host="127.0.0.1", port=0, workers=2)
+    server.start_serving()
+    client = Client(f"127.0.0.1:{server.port}", pool_size=1)
+    yield client
+    client.close()
+    server.stop()
+    KeyValueAPI.configure(KeyValueStore())
+
+@pytest.mark.parametrize("format", ["jsonl", "binary"])
+def test_dump_then_load(client, format):
+    """Test a dump loaded back restores values with spaces, newlines and odd bytes, and deadlines."""
+    client.load([(f"key{i:04}", f"value {i}", None) for i in range(2500)])
+    client.put("expiring", "soon", ex=100)
+    client.load([("multi_line", "a\nb", None), ("odd", "\udcff bytes", None)])
+    stream = io.StringIO() if format == "jsonl" else io.BytesIO()
+    assert dump(client, stream, format, chunk_size=1000) == 2503
+
+    KeyValueAPI.configure(KeyValueStore())
+    stream.seek(0)
+    assert load(client, stream, format, chunk_size=300, window=2) == 2503
+    assert client.get("key2499") == "value 2499"
+    assert client.mget(["multi_line", "odd"]) == ["a\nb", "\udcff bytes"]
+    assert 0 < client.ttl("expiring") <= 100
+
+def test_load_skips_expired_records(client):
+    stream = io.StringIO('["fresh", "value", null]\n\n["stale", "value", %f]\n' % (time.time() - 1))
+    assert load(client, stream) == 1
+    assert client.mget(["fresh", "stale"]) == ["value", None]
+
+def test_load_reads_records_without_deadline_and_reports_bad_lines(client):
+    """Test jsonl records may leave the deadline out, like LOAD, and a malformed line is reported by number."""
+    assert load(client, io.StringIO('["short", "value"]\n["full", "value", null]\n')) == 2
+    assert client.mget(["short", "full"]) == ["value", "value"]
+    with pytest.raises(ValueError, match="Line 2 is not a"):
+        load(client, io.StringIO('["a", "x"]\n["b"]\n'))
+
+def test_load_refuses_keys_dump_cannot_page_past(client):
+    """Test LOAD refuses keys with whitespace, so a dump one record per chunk round trips what was loaded."""
+    with pytest.raises(RuntimeError, match="Keys can't be empty or contain whitespace"):
+        client.load([("a", "x", None), ("b c", "y", None), ("d", "z", None)])
+    client.load([("a", "x", None), ("b_c", "y", None), ("d", "z", None)])
+    stream = io.StringIO()
+    assert dump(client, stream, chunk_size=1) == 3
+    assert stream.getvalue().splitlines() == ['["a", "x", null]', '["b_c", "y", null]', '["d", "z", null]']